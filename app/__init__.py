@@ -1,19 +1,49 @@
+import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_migrate import Migrate
 from flask_cors import CORS
 from app.config import Config
 
-db = SQLAlchemy()
+# Rows keep their values after commit, so reading them later does not reopen a transaction
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 migrate = Migrate()
 
+
+def _configure_sqlite(app):
+    """Set the journal mode, sync level and busy timeout on each new SQLite connection."""
+    journal_mode = app.config['SQLITE_JOURNAL_MODE']
+    synchronous = app.config['SQLITE_SYNCHRONOUS']
+    busy_timeout = int(app.config['SQLITE_BUSY_TIMEOUT_MS'])
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', on_connect)
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Leveled logging; debug output such as generated code costs nothing unless enabled
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger('app').setLevel(app.config['LOG_LEVEL'])
+
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app)
+    migrate.init_app(app, db)
+    _configure_sqlite(app)
+
+    from app.services import metrics
+    metrics.init_app(app)
     
     # Configure CORS to allow Streamlit requests
     CORS(app, resources={
@@ -31,4 +61,19 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
     app.register_blueprint(diagram_bp, url_prefix='/api/diagrams')
 
-    return app 
\ No newline at end of file
+    if app.config['PREWARM']:
+        prewarm()
+
+    return app
+
+
+def prewarm():
+    """Load what the first request would otherwise wait for: the LLM SDK and the model clients.
+
+    Heavy dependencies are imported lazily so the app factory stays fast. Servers
+    that fork workers call this once in the parent (see gunicorn.conf.py), so the
+    loaded modules are shared copy-on-write. Nothing here opens a connection or
+    starts a thread, so it is safe to run before forking.
+    """
+    from app.routes.diagram_routes import get_pipeline
+    get_pipeline() 
\ No newline at end of file
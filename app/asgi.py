@@ -0,0 +1,199 @@
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from asgiref.wsgi import WsgiToAsgi
+from flask import g
+from app import create_app, db, prewarm
+from app.config import Config
+from app.models.diagram import DiagramRequest
+from app.routes.diagram_routes import _flag, _requested_format, _result_payload, _reused_payload, get_pipeline
+from app.services.metrics import server_timing_spans
+from app.services.render_limits import RenderRejected
+from app.services.resilience import LLMCallError
+
+GENERATE_PATH = '/api/diagrams/generate'
+
+
+def _environ(scope, body):
+    """Minimal WSGI environ for ``scope`` so Flask request contexts (url_for, args) work."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+class DiagramASGIApp:
+    """ASGI front for the Flask app built by ``create_app``.
+
+    ``POST /api/diagrams/generate`` is served natively on the event loop: the
+    Gemini call is awaited, so thousands of requests can wait on the model
+    without holding a thread each. Database work runs on a small thread pool and
+    renders on another. Every other route, and /generate with ``async=true``,
+    goes to the unchanged Flask app through asgiref's WSGI adapter.
+    """
+
+    def __init__(self, flask_app, sync_workers=32, render_workers=4):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.sync_executor = ThreadPoolExecutor(sync_workers, thread_name_prefix='asgi-sync')
+        self.render_executor = ThreadPoolExecutor(render_workers, thread_name_prefix='asgi-render')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == GENERATE_PATH:
+            return await self._generate(scope, receive, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Before accepting connections, so the first request does not load the SDK on the event loop
+                prewarm()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.sync_executor.shutdown(wait=False)
+                self.render_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _in_request_context(self, environ, spans, func, *args):
+        with self.flask_app.request_context(environ):
+            # Each call gets a fresh context, so point them all at the request's span list
+            g.server_timing = spans
+            return func(*args)
+
+    def _finish_response(self, started, payload, status):
+        """Build the response through Flask so after_request hooks (CORS, metrics, Server-Timing) apply."""
+        g.request_started = started
+        response = self.flask_app.make_response((payload, status))
+        return self.flask_app.process_response(response)
+
+    async def _generate(self, scope, receive, send):
+        started = time.perf_counter()
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or _is_true(data.get('async')):
+            # Queued generation and malformed bodies keep the Flask behaviour
+            return await self.wsgi(scope, _replay(body, receive), send)
+
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, body)
+        spans = []
+        server_timing_spans.set(spans)
+
+        def run_sync(func, *args):
+            return loop.run_in_executor(
+                self.sync_executor, partial(self._in_request_context, environ, spans, func, *args))
+
+        prompt = data.get('prompt')
+        if not prompt:
+            status, payload = 400, {'error': 'Prompt is required'}
+        else:
+            try:
+                payload = await run_sync(_reused_payload, prompt, data)
+                if payload is None:
+                    diagram_id, image_format = await run_sync(_create_request, prompt, data)
+                    image_bytes = await get_pipeline().process_async(
+                        diagram_id, prompt, run_sync, self.render_executor, image_format)
+                    payload = await run_sync(_completed_payload, diagram_id, data, image_bytes)
+                status = 200
+            except ValueError as e:
+                status, payload = 400, {'error': str(e)}
+            except RenderRejected as e:
+                status = 503 if e.reason == 'busy' else 422
+                payload = {'error': str(e), 'status': 'failed'}
+            except LLMCallError as e:
+                status = 504 if e.outcome == 'timeout' else 503
+                payload = {'error': str(e), 'status': 'failed'}
+            except Exception as e:
+                status, payload = 500, {'error': str(e), 'status': 'failed'}
+
+        response = await run_sync(self._finish_response, started, payload, status)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in response.headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+def _is_true(value):
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _replay(body, receive):
+    """A ``receive`` that hands back an already consumed request body first."""
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def replay():
+        if pending:
+            return pending.pop()
+        return await receive()
+    return replay
+
+
+def _create_request(prompt, data):
+    image_format = _requested_format(data)
+    diagram_request = DiagramRequest(prompt=prompt, status='pending', image_format=image_format)
+    db.session.add(diagram_request)
+    db.session.commit()
+    return diagram_request.id, image_format
+
+
+def _completed_payload(diagram_id, data, image_bytes):
+    diagram_request = db.session.get(DiagramRequest, diagram_id)
+    return _result_payload(diagram_request, _flag('include_image', data), image_bytes)
+
+
+def create_asgi_app(config_class=Config):
+    """Build the Flask app and wrap it for an ASGI server such as uvicorn."""
+    flask_app = create_app(config_class)
+    return DiagramASGIApp(
+        flask_app,
+        sync_workers=flask_app.config['ASGI_SYNC_WORKERS'],
+        render_workers=flask_app.config['ASGI_RENDER_WORKERS']
+    )
@@ -1,10 +1,183 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _engine_options(database_uri):
+    """Pool settings for ``database_uri``; in-memory SQLite uses a StaticPool, which has no size limits."""
+    options = {
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+    in_memory = database_uri.startswith('sqlite') and (
+        database_uri.rstrip('/') in ('sqlite:', 'sqlite:///:memory:') or 'mode=memory' in database_uri
+    )
+    if not in_memory:
+        options.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        })
+    return options
+
+
+def hedge_after(value):
+    """Check an LLM_HEDGE_AFTER setting: '' (off), 'p95', or a number of seconds."""
+    value = str(value).strip().lower()
+    if value in ('', 'p95'):
+        return value
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = -1
+    if not seconds > 0:
+        raise ValueError(f"LLM_HEDGE_AFTER must be empty, 'p95' or a positive number of seconds, got {value!r}")
+    return value
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY') 
\ No newline at end of file
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # Applied to every new SQLite connection; WAL lets readers run alongside the single writer
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+
+    # Pre-warmed renderer worker pool; set RENDERER_POOL_SIZE=0 to spawn one subprocess per render
+    RENDERER_POOL_SIZE = int(os.environ.get('RENDERER_POOL_SIZE', 2))
+    RENDERER_MAX_JOBS_PER_WORKER = int(os.environ.get('RENDERER_MAX_JOBS_PER_WORKER', 100))
+    RENDERER_MAX_RSS_MB = int(os.environ.get('RENDERER_MAX_RSS_MB', 512))
+    RENDERER_JOB_TIMEOUT = float(os.environ.get('RENDERER_JOB_TIMEOUT', 60))
+
+    # Content-addressed render cache (memory LRU in front of a size-bounded directory)
+    RENDER_CACHE_ENABLED = os.environ.get('RENDER_CACHE_ENABLED', 'true').lower() == 'true'
+    RENDER_CACHE_MEMORY_ITEMS = int(os.environ.get('RENDER_CACHE_MEMORY_ITEMS', 128))
+    RENDER_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'diagram-render-cache')
+    RENDER_CACHE_DISK_MAX_MB = int(os.environ.get('RENDER_CACHE_DISK_MAX_MB', 256))
+
+    # LLM client: 'gemini', 'fake' for an offline canned-response model, or 'module:factory'
+    LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+    FAKE_LLM_LATENCY = float(os.environ.get('FAKE_LLM_LATENCY', 0))
+    # Load the LLM SDK and model clients in create_app instead of on the first request
+    PREWARM = os.environ.get('PREWARM', 'false').lower() == 'true'
+    # System instructions need a Gemini 1.5+ model; with GEMINI_SYSTEM_INSTRUCTION=false
+    # they are sent at the start of every prompt instead
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash')
+    GEMINI_SYSTEM_INSTRUCTION = os.environ.get('GEMINI_SYSTEM_INSTRUCTION', 'true').lower() == 'true'
+
+    # Prompt-level cache of LLM responses (memory LRU backed by the llm_response table)
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_MEMORY_ITEMS = int(os.environ.get('LLM_CACHE_MEMORY_ITEMS', 256))
+    LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    LLM_CACHE_DB_MAX_ROWS = int(os.environ.get('LLM_CACHE_DB_MAX_ROWS', 10000))
+
+    # Background job queue for asynchronous /generate requests
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+    JOB_QUEUE_MAX_DEPTH = int(os.environ.get('JOB_QUEUE_MAX_DEPTH', 100))
+    JOB_LONG_POLL_MAX_SECONDS = float(os.environ.get('JOB_LONG_POLL_MAX_SECONDS', 30))
+
+    # Content-addressed storage for rendered diagram files
+    ARTIFACT_DIR = os.environ.get('ARTIFACT_DIR') or os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), 'artifacts')
+
+    # /history pagination; pages larger than the threshold are streamed row by row
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 1000))
+    HISTORY_STREAM_THRESHOLD = int(os.environ.get('HISTORY_STREAM_THRESHOLD', 200))
+
+    # /search and reuse of earlier diagrams on /generate (``reuse=true``)
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    SEARCH_MAX_PAGE_SIZE = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', 100))
+    # Minimum Jaccard similarity of prompt terms for an earlier diagram to be returned
+    SEARCH_REUSE_THRESHOLD = float(os.environ.get('SEARCH_REUSE_THRESHOLD', 0.8))
+    SEARCH_REUSE_CANDIDATES = int(os.environ.get('SEARCH_REUSE_CANDIDATES', 20))
+
+    # /batch fan-out limits
+    BATCH_MAX_PROMPTS = int(os.environ.get('BATCH_MAX_PROMPTS', 500))
+    BATCH_LLM_CONCURRENCY = int(os.environ.get('BATCH_LLM_CONCURRENCY', 8))
+    BATCH_RENDER_CONCURRENCY = int(os.environ.get('BATCH_RENDER_CONCURRENCY', 2))
+    BATCH_UPDATE_SIZE = int(os.environ.get('BATCH_UPDATE_SIZE', 50))
+
+    # Build diagram code locally for prompts made only of the stock components
+    FAST_PATH_ENABLED = os.environ.get('FAST_PATH_ENABLED', 'true').lower() == 'true'
+
+    # 'auto' draws parsed diagram models straight from DOT and only executes code it cannot parse;
+    # 'model' rejects unparseable code, 'exec' always executes the generated code
+    DIAGRAM_RENDERER = os.environ.get('DIAGRAM_RENDERER', 'auto')
+
+    # Logging and request timing
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+    # Pre-forked workers publish their metrics here every METRICS_SHARE_SECONDS, so /metrics
+    # answered by any of them covers the whole server (gunicorn.conf.py sets one)
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_SHARE_SECONDS = float(os.environ.get('METRICS_SHARE_SECONDS', 5))
+
+    # ASGI server (asgi.py): threads for database work and for renders; LLM waits use no thread
+    ASGI_SYNC_WORKERS = int(os.environ.get('ASGI_SYNC_WORKERS', 32))
+    ASGI_RENDER_WORKERS = int(os.environ.get('ASGI_RENDER_WORKERS', 4))
+
+    # Output format: diagrams with at least this many nodes default to SVG instead of PNG
+    SVG_DEFAULT_MIN_NODES = int(os.environ.get('SVG_DEFAULT_MIN_NODES', 25))
+    # Default backend when a request names neither format nor backend: 'graphviz' renders
+    # images on the server, 'mermaid' returns flowchart text (format mmd) the browser draws
+    DIAGRAM_BACKEND = os.environ.get('DIAGRAM_BACKEND', 'graphviz')
+
+    # Render admission control and limits: concurrent renders default to the core count,
+    # renderer processes get RLIMIT address-space/CPU caps (0 disables), and graphs past
+    # the downgrade thresholds use a cheaper layout engine while larger ones are refused
+    RENDER_CONCURRENCY = int(os.environ.get('RENDER_CONCURRENCY', os.cpu_count() or 1))
+    RENDER_ADMISSION_TIMEOUT = float(os.environ.get('RENDER_ADMISSION_TIMEOUT', 30))
+    RENDER_MAX_MEMORY_MB = int(os.environ.get('RENDER_MAX_MEMORY_MB', 1024))
+    RENDER_MAX_CPU_SECONDS = int(os.environ.get('RENDER_MAX_CPU_SECONDS', 30))
+    RENDER_MAX_NODES = int(os.environ.get('RENDER_MAX_NODES', 1000))
+    RENDER_MAX_EDGES = int(os.environ.get('RENDER_MAX_EDGES', 5000))
+    RENDER_DOWNGRADE_NODES = int(os.environ.get('RENDER_DOWNGRADE_NODES', 200))
+    RENDER_DOWNGRADE_EDGES = int(os.environ.get('RENDER_DOWNGRADE_EDGES', 1000))
+    RENDER_LARGE_GRAPH_ENGINE = os.environ.get('RENDER_LARGE_GRAPH_ENGINE', 'sfdp')
+
+    # Gemini call resilience: per-attempt timeout, retries with exponential backoff, an optional
+    # hedged second request (after N seconds, or 'p95' of recent calls) and a circuit breaker.
+    # With GEMINI_FALLBACK_TO_TEMPLATE=false a failed call fails the request instead of
+    # returning the default template.
+    LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 30))
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+    LLM_BACKOFF_BASE_SECONDS = float(os.environ.get('LLM_BACKOFF_BASE_SECONDS', 0.5))
+    LLM_BACKOFF_MAX_SECONDS = float(os.environ.get('LLM_BACKOFF_MAX_SECONDS', 8))
+    LLM_HEDGE_AFTER = hedge_after(os.environ.get('LLM_HEDGE_AFTER', ''))
+    LLM_CIRCUIT_FAILURES = int(os.environ.get('LLM_CIRCUIT_FAILURES', 5))
+    LLM_CIRCUIT_RESET_SECONDS = float(os.environ.get('LLM_CIRCUIT_RESET_SECONDS', 30))
+    LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 32))
+    GEMINI_FALLBACK_TO_TEMPLATE = os.environ.get('GEMINI_FALLBACK_TO_TEMPLATE', 'true').lower() == 'true'
+
+    # Fault injection for the fake model
+    FAKE_LLM_ERROR_RATE = float(os.environ.get('FAKE_LLM_ERROR_RATE', 0))
+    FAKE_LLM_SLOW_RATE = float(os.environ.get('FAKE_LLM_SLOW_RATE', 0))
+    FAKE_LLM_SLOW_LATENCY = float(os.environ.get('FAKE_LLM_SLOW_LATENCY', 10))
+
+    # Background post-processing of finished renders (needs Pillow): lossless PNG
+    # recompression, optional palette quantization (lossy) and a fixed-size thumbnail
+    IMAGE_POSTPROCESS_ENABLED = os.environ.get('IMAGE_POSTPROCESS_ENABLED', 'true').lower() == 'true'
+    IMAGE_POSTPROCESS_WORKERS = int(os.environ.get('IMAGE_POSTPROCESS_WORKERS', 2))
+    PNG_OPTIMIZE = os.environ.get('PNG_OPTIMIZE', 'true').lower() == 'true'
+    PNG_QUANTIZE = os.environ.get('PNG_QUANTIZE', 'false').lower() == 'true'
+    THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 320))
+    THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'webp')  # 'webp' or 'png'
+
+
+def share_render_limits(workers):
+    """Give this process its share of the host-wide render limits when ``workers`` processes serve the app.
+
+    RENDER_CONCURRENCY and RENDERER_POOL_SIZE are configured per host; each
+    worker gets an equal part, and at least one render slot and pool process.
+    Called in every worker after the fork, before the first render.
+    """
+    if workers <= 1:
+        return
+    Config.RENDER_CONCURRENCY = max(Config.RENDER_CONCURRENCY // workers, 1)
+    if Config.RENDERER_POOL_SIZE > 0:
+        Config.RENDERER_POOL_SIZE = max(Config.RENDERER_POOL_SIZE // workers, 1)
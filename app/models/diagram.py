@@ -1,11 +1,47 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import DDL, event
 
 class DiagramRequest(db.Model):
+    __table_args__ = (
+        # Supports keyset pagination of the history in (created_at, id) order
+        db.Index('ix_diagram_request_created_at_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     prompt = db.Column(db.Text, nullable=False)
     diagram_code = db.Column(db.Text)
     diagram_type = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='pending')
-    error_message = db.Column(db.Text) 
\ No newline at end of file
+    status = db.Column(db.String(20), default='pending', index=True)
+    error_message = db.Column(db.Text)
+    image_sha256 = db.Column(db.String(64))
+    image_format = db.Column(db.String(10))
+    thumbnail_sha256 = db.Column(db.String(64))
+    thumbnail_format = db.Column(db.String(10))
+    # The diagram this one was edited from, if any
+    parent_id = db.Column(db.Integer, db.ForeignKey('diagram_request.id'), index=True)
+
+
+# Full-text index over prompt and code for /search (SQLite FTS5). It reads its text
+# from diagram_request (external content), and the triggers keep it in step.
+# Keep in sync with migration c2f9a4d7b813, and recreate the triggers after any
+# batch migration that rebuilds diagram_request.
+SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS diagram_search USING fts5("
+    "prompt, diagram_code, content='diagram_request', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS diagram_search_ai AFTER INSERT ON diagram_request BEGIN "
+    "INSERT INTO diagram_search(rowid, prompt, diagram_code) VALUES (new.id, new.prompt, new.diagram_code); END",
+    "CREATE TRIGGER IF NOT EXISTS diagram_search_ad AFTER DELETE ON diagram_request BEGIN "
+    "INSERT INTO diagram_search(diagram_search, rowid, prompt, diagram_code) "
+    "VALUES ('delete', old.id, old.prompt, old.diagram_code); END",
+    "CREATE TRIGGER IF NOT EXISTS diagram_search_au AFTER UPDATE OF prompt, diagram_code ON diagram_request BEGIN "
+    "INSERT INTO diagram_search(diagram_search, rowid, prompt, diagram_code) "
+    "VALUES ('delete', old.id, old.prompt, old.diagram_code); "
+    "INSERT INTO diagram_search(rowid, prompt, diagram_code) VALUES (new.id, new.prompt, new.diagram_code); END",
+)
+
+for _statement in SEARCH_DDL:
+    event.listen(DiagramRequest.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(DiagramRequest.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS diagram_search').execute_if(dialect='sqlite'))
@@ -0,0 +1,8 @@
+from app import db
+from datetime import datetime
+
+class LLMResponse(db.Model):
+    prompt_key = db.Column(db.String(64), primary_key=True)
+    prompt = db.Column(db.Text, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
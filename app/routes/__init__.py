@@ -1,7 +1,41 @@
-from flask import Blueprint, jsonify
+import os
+from flask import Blueprint, Response, jsonify, render_template
+from sqlalchemy import text
+from app import db
+from app.services.artifact_store import get_artifact_store
+from app.services.metrics import metrics
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
-    return jsonify({"message": "Welcome to the Flask API!"}) 
\ No newline at end of file
+    return jsonify({"message": "Welcome to the Flask API!"})
+
+@main_bp.route('/ui')
+def ui():
+    return render_template('index.html')
+
+@main_bp.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@main_bp.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and answering. Touches nothing else."""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@main_bp.route('/readyz')
+def readyz():
+    """Readiness: the database answers and the artifact store is writable."""
+    checks = {}
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks['database'] = 'ok'
+    except Exception as e:
+        checks['database'] = str(e)
+
+    root = get_artifact_store().root
+    checks['artifacts'] = 'ok' if os.access(root, os.W_OK) else f"{root} is not writable"
+
+    ready = all(result == 'ok' for result in checks.values())
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
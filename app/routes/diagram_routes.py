@@ -1,69 +1,687 @@
-from flask import Blueprint, jsonify, request
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from flask import Blueprint, abort, current_app, jsonify, request, send_file, stream_with_context, url_for
 from app import db
 from app.models.diagram import DiagramRequest
 from app.services.gemini_service import GeminiService
-from app.services.diagram_service import DiagramService
+from app.services.image_processing import get_image_postprocessor
+from app.services.diagram_model import DiagramParseError
+from app.services.diagram_service import FORMATS, DiagramService
+from app.services.artifact_store import MIMETYPES, get_artifact_store
+from app.services.batch_runner import BatchRunner
+from app.services.job_queue import JobQueue, JobQueueFull
+from app.services.llm_cache import normalize_prompt
+from app.services.metrics import SEARCH_REUSE_TOTAL, metrics, timed
+from app.services.pipeline import DiagramPipeline
+from app.services.render_limits import RenderRejected
+from app.services.resilience import LLMCallError
+from app.services.search import get_search
 
 diagram_bp = Blueprint('diagram', __name__)
-gemini_service = GeminiService()
 diagram_service = DiagramService()
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """Return the shared pipeline, creating the model clients on first use.
+
+    Building GeminiService loads the LLM SDK, so it waits for the first request
+    (or ``app.prewarm()``) instead of slowing down every import of this module.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = DiagramPipeline(GeminiService(), diagram_service)
+        return _pipeline
+
+
+def _collect_cache_metrics():
+    """Expose the cache and fast-path counters the services already keep.
+
+    The model-side counters are only reported once the pipeline exists, so a
+    scrape never builds it (and loads the LLM SDK) by itself.
+    """
+    samples = {'hits': [], 'misses': []}
+    render_stats = diagram_service.cache_stats()
+    if render_stats:
+        samples['hits'] += [({'cache': 'render', 'tier': 'memory'}, render_stats['memory_hits']),
+                            ({'cache': 'render', 'tier': 'disk'}, render_stats['disk_hits'])]
+        samples['misses'].append(({'cache': 'render'}, render_stats['misses']))
+    families = [
+        ('diagram_cache_hits_total', 'counter', 'Cache hits by cache and tier.', samples['hits']),
+        ('diagram_cache_misses_total', 'counter', 'Cache misses by cache.', samples['misses']),
+    ]
+    pipeline = _pipeline
+    if pipeline is None:
+        return families
+
+    gemini_service = pipeline.gemini_service
+    llm_stats = gemini_service.cache_stats()
+    if llm_stats:
+        samples['hits'] += [({'cache': 'llm', 'tier': 'memory'}, llm_stats['memory_hits']),
+                            ({'cache': 'llm', 'tier': 'db'}, llm_stats['db_hits'])]
+        samples['misses'].append(({'cache': 'llm'}, llm_stats['misses']))
+    fast_path = gemini_service.fast_path_stats()
+    if fast_path:
+        samples['hits'].append(({'cache': 'fast_path', 'tier': 'template'}, fast_path['hits']))
+        samples['misses'].append(({'cache': 'fast_path'}, fast_path['misses']))
+    circuit_state = gemini_service.resilience_stats()['circuit_state']
+    families.append(('diagram_llm_circuit_open', 'gauge', 'Whether model calls are being refused (1) or allowed (0).',
+                     [({}, 0 if circuit_state == 'closed' else 1)]))
+    return families
+
+
+metrics.register_collector(_collect_cache_metrics)
+
+
+def _run_job(diagram_request_id):
+    diagram_request = db.session.get(DiagramRequest, diagram_request_id)
+    diagram_request.status = 'processing'
+    db.session.commit()
+    get_pipeline().process(diagram_request)
+
+
+def get_job_queue():
+    """Return the app's background job queue, starting its workers on first use."""
+    app = current_app._get_current_object()
+    job_queue = app.extensions.get('diagram_jobs')
+    if job_queue is None:
+        job_queue = JobQueue(
+            app,
+            _run_job,
+            workers=app.config['JOB_WORKERS'],
+            max_depth=app.config['JOB_QUEUE_MAX_DEPTH']
+        )
+        app.extensions['diagram_jobs'] = job_queue
+    return job_queue
+
+
+def _flag(name, data=None):
+    """Read a boolean option from the JSON body, falling back to the query string."""
+    value = (data or {}).get(name, request.args.get(name, False))
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+# Rendering backends and the formats each produces; the first is used when only the backend is named
+BACKENDS = {
+    'graphviz': ('png', 'svg', 'pdf', 'dot'),
+    'mermaid': ('mmd',),
+}
+
+
+def _requested_format(data=None):
+    """The ``format`` option from the body or query string, or None to let the service pick.
+
+    ``backend`` overrides ``Config.DIAGRAM_BACKEND``: ``mermaid`` returns Mermaid
+    text for the client to draw, ``graphviz`` an image rendered on the server
+    (PNG unless ``format`` names another one).
+    """
+    value = (data or {}).get('format', request.args.get('format'))
+    backend = (data or {}).get('backend', request.args.get('backend'))
+    value = str(value).lower() if value else None
+    if value and value not in FORMATS:
+        raise ValueError(f"Unsupported format '{value}', expected one of: {', '.join(FORMATS)}")
+    if not backend:
+        return value
+
+    backend = str(backend).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    formats = BACKENDS[backend]
+    if value and value not in formats:
+        raise ValueError(f"The {backend} backend does not produce format '{value}'")
+    return value or formats[0]
+
+
+def _result_payload(diagram_request, include_image=False, image_bytes=None):
+    payload = {
+        'id': diagram_request.id,
+        'status': diagram_request.status,
+        'diagram_code': diagram_request.diagram_code,
+        'image_format': diagram_request.image_format,
+        'image_url': url_for('diagram.get_diagram_image', diagram_id=diagram_request.id),
+        'parent_id': diagram_request.parent_id
+    }
+    # Mermaid text is a few KB and is drawn by the client, so it is always inline
+    if diagram_request.image_format == 'mmd':
+        if image_bytes is None:
+            image_bytes = get_artifact_store().read(diagram_request.image_sha256, 'mmd')
+        payload['mermaid'] = image_bytes.decode('utf-8')
+    # Inline base64 images are opt-in; clients should stream image_url instead
+    elif include_image:
+        if image_bytes is None:
+            image_bytes = get_artifact_store().read(diagram_request.image_sha256, diagram_request.image_format)
+        with timed('encode'):
+            payload['diagram_image'] = base64.b64encode(image_bytes).decode()
+    return payload
+
+
+def _reused_payload(prompt, data):
+    """Result of an earlier completed diagram close enough to ``prompt``, when ``reuse`` is set.
+
+    Returns None when reuse was not asked for or nothing is similar enough, and
+    the caller generates as usual. Neither the model nor the renderer runs on a hit.
+    """
+    if not _flag('reuse', data):
+        return None
+    with timed('reuse_lookup'):
+        match = get_search().find_reusable(prompt, _requested_format(data))
+    SEARCH_REUSE_TOTAL.inc(result='hit' if match else 'miss')
+    if match is None:
+        return None
+    previous, similarity = match
+    payload = _result_payload(previous, _flag('include_image', data))
+    payload.update({'reused': True, 'similarity': round(similarity, 3)})
+    return payload
+
+
+def _status_payload(diagram_request):
+    return {
+        'id': diagram_request.id,
+        'status': diagram_request.status,
+        'created_at': diagram_request.created_at.isoformat(),
+        'error_message': diagram_request.error_message,
+        'parent_id': diagram_request.parent_id,
+        'status_url': url_for('diagram.get_diagram_status', diagram_id=diagram_request.id),
+        'result_url': url_for('diagram.get_diagram_result', diagram_id=diagram_request.id)
+    }
+
+
+def _failure_response(error):
+    if isinstance(error, RenderRejected):
+        # Too large to ever render vs. try again once the renderers free up
+        return jsonify({'error': str(error), 'status': 'failed'}), 503 if error.reason == 'busy' else 422
+    if isinstance(error, LLMCallError):
+        # Model outages: only reached for edits, or with GEMINI_FALLBACK_TO_TEMPLATE off
+        return jsonify({'error': str(error), 'status': 'failed'}), 504 if error.outcome == 'timeout' else 503
+    return jsonify({
+        'error': str(error),
+        'status': 'failed'
+    }), 500
+
 
 @diagram_bp.route('/generate', methods=['POST'])
 def generate_diagram():
-    diagram_request = None
     try:
         data = request.get_json()
         prompt = data.get('prompt')
         
         if not prompt:
             return jsonify({'error': 'Prompt is required'}), 400
+
+        try:
+            image_format = _requested_format(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        reused = _reused_payload(prompt, data)
+        if reused is not None:
+            return jsonify(reused)
         
         # Create new diagram request
-        diagram_request = DiagramRequest(prompt=prompt)
-        db.session.add(diagram_request)
-        db.session.commit()
+        with timed('db_insert'):
+            diagram_request = DiagramRequest(prompt=prompt, status='pending', image_format=image_format)
+            db.session.add(diagram_request)
+            db.session.commit()
+
+        if _flag('async', data):
+            try:
+                get_job_queue().submit(diagram_request.id)
+            except JobQueueFull as e:
+                db.session.delete(diagram_request)
+                db.session.commit()
+                return jsonify({'error': str(e), 'status': 'rejected'}), 429
+            return jsonify(_status_payload(diagram_request)), 202
         
-        # Generate diagram code using Gemini
-        try:
-            diagram_code = gemini_service.generate_diagram_code(prompt)
-        except Exception as e:
-            raise Exception(f"Code generation failed: {str(e)}")
+        diagram_code, image_bytes = get_pipeline().process(diagram_request)
         
-        # Generate the actual diagram
+        return jsonify(_result_payload(diagram_request, _flag('include_image', data), image_bytes))
+
+    except Exception as e:
+        return _failure_response(e)
+
+
+@diagram_bp.route('/<int:diagram_id>/edit', methods=['POST'])
+def edit_diagram(diagram_id):
+    """Apply a change instruction to a finished diagram, saved as a new request linked to it.
+
+    Only a small patch is asked of the model (see ``GeminiService.edit_diagram_code``),
+    and only the requested format of the result is rendered.
+    """
+    parent = DiagramRequest.query.get_or_404(diagram_id)
+    data = request.get_json(silent=True) or {}
+    instruction = data.get('instruction') or data.get('prompt')
+    if not instruction:
+        return jsonify({'error': 'Instruction is required'}), 400
+    if parent.status != 'completed' or not parent.diagram_code:
+        return jsonify({'error': 'Only completed diagrams can be edited'}), 409
+
+    try:
+        image_format = _requested_format(data) or parent.image_format
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with timed('db_insert'):
+            diagram_request = DiagramRequest(
+                prompt=instruction, status='pending', image_format=image_format, parent_id=parent.id)
+            db.session.add(diagram_request)
+            db.session.commit()
+
+        diagram_code, image_bytes = get_pipeline().process(diagram_request, parent)
+
+        return jsonify(_result_payload(diagram_request, _flag('include_image', data), image_bytes))
+
+    except Exception as e:
+        return _failure_response(e)
+
+
+@diagram_bp.route('/generate/stream', methods=['GET', 'POST'])
+def generate_diagram_stream():
+    """Server-Sent Events version of /generate that reports each stage as it happens."""
+    data = request.get_json(silent=True) or {}
+    prompt = data.get('prompt') or request.args.get('prompt')
+    if not prompt:
+        return jsonify({'error': 'Prompt is required'}), 400
+    try:
+        image_format = _requested_format(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    diagram_request = DiagramRequest(prompt=prompt, status='processing', image_format=image_format)
+    db.session.add(diagram_request)
+    db.session.commit()
+    diagram_id = diagram_request.id
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def generate():
+        # The streamed body runs under a fresh session, so load the row again
+        diagram_request = db.session.get(DiagramRequest, diagram_id)
+        events = get_pipeline().process_stream(diagram_request)
         try:
-            diagram_image = diagram_service.generate_diagram(diagram_code, diagram_request.id)
-        except Exception as e:
-            raise Exception(f"Diagram rendering failed: {str(e)}")
-        
-        # Update the diagram request
-        diagram_request.diagram_code = diagram_code
-        diagram_request.status = 'completed'
+            for event, payload in events:
+                yield sse(event, payload)
+        finally:
+            # On a disconnect, let the pipeline record the failure while the request context is still up
+            events.close()
+        if diagram_request.status == 'completed':
+            yield sse('image', {
+                'id': diagram_request.id,
+                'status': diagram_request.status,
+                'image_url': url_for('diagram.get_diagram_image', diagram_id=diagram_request.id),
+                'etag': diagram_request.image_sha256
+            })
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop proxies from buffering the stream
+    return response
+
+
+def _save_batch_updates(updates):
+    db.session.bulk_update_mappings(DiagramRequest, updates)
+    db.session.commit()
+    for update in updates:
+        if update['status'] == 'completed':
+            DiagramPipeline.postprocess(update['id'])
+
+
+@diagram_bp.route('/batch', methods=['POST'])
+def generate_batch():
+    """Generate many diagrams at once, streaming one NDJSON line per distinct prompt as it finishes."""
+    data = request.get_json() or {}
+    prompts = data.get('prompts')
+    config = current_app.config
+
+    if not isinstance(prompts, list) or not prompts:
+        return jsonify({'error': 'prompts must be a non-empty list'}), 400
+    if len(prompts) > config['BATCH_MAX_PROMPTS']:
+        return jsonify({'error': f"At most {config['BATCH_MAX_PROMPTS']} prompts per batch"}), 400
+    if not all(isinstance(p, str) and p.strip() for p in prompts):
+        return jsonify({'error': 'Every prompt must be a non-empty string'}), 400
+    try:
+        image_format = _requested_format(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Deduplicate on the normalized prompt, remembering every position it was submitted at
+    unique = {}
+    for index, prompt in enumerate(prompts):
+        entry = unique.setdefault(normalize_prompt(prompt), {'prompt': prompt, 'indexes': []})
+        entry['indexes'].append(index)
+    entries = list(unique.values())
+
+    # One bulk insert for the whole batch
+    rows = [{'prompt': e['prompt'], 'status': 'processing'} for e in entries]
+    db.session.bulk_insert_mappings(DiagramRequest, rows, return_defaults=True)
+    db.session.commit()
+    by_id = {}
+    for entry, row in zip(entries, rows):
+        by_id[row['id']] = entry
+
+    runner = BatchRunner(
+        get_pipeline(),
+        llm_concurrency=config['BATCH_LLM_CONCURRENCY'],
+        render_concurrency=config['BATCH_RENDER_CONCURRENCY']
+    )
+    app = current_app._get_current_object()
+    update_size = config['BATCH_UPDATE_SIZE']
+
+    def generate():
+        updates = []
+        finished = set()
+        jobs = [(row_id, e['prompt']) for row_id, e in by_id.items()]
+        results = runner.run(app, jobs, image_format)
+        try:
+            for result in results:
+                finished.add(result['id'])
+                entry = by_id[result['id']]
+                line = {'id': result['id'], 'indexes': entry['indexes'], 'prompt': entry['prompt'], 'status': result['status']}
+                if result['status'] == 'completed':
+                    updates.append({
+                        'id': result['id'],
+                        'status': 'completed',
+                        'diagram_code': result['diagram_code'],
+                        'image_sha256': result['image_sha256'],
+                        'image_format': result['image_format']
+                    })
+                    line['diagram_code'] = result['diagram_code']
+                    line['image_url'] = url_for('diagram.get_diagram_image', diagram_id=result['id'])
+                else:
+                    updates.append({'id': result['id'], 'status': 'failed', 'error_message': result['error']})
+                    line['error'] = result['error']
+
+                # Statuses are written back in bulk rather than one commit per item
+                if len(updates) >= update_size:
+                    _save_batch_updates(updates)
+                    updates = []
+
+                yield json.dumps(line) + '\n'
+        finally:
+            # Closing the runner cancels prompts that have not started yet
+            results.close()
+            # If the client went away mid-stream, fail what never finished so no row stays 'processing'
+            updates.extend(
+                {'id': row_id, 'status': 'failed', 'error_message': 'Batch stream closed before this prompt finished'}
+                for row_id in by_id if row_id not in finished
+            )
+            if updates:
+                _save_batch_updates(updates)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@diagram_bp.route('/<int:diagram_id>', methods=['GET'])
+def get_diagram_status(diagram_id):
+    diagram_request = DiagramRequest.query.get_or_404(diagram_id)
+    return jsonify(_status_payload(diagram_request))
+
+
+@diagram_bp.route('/<int:diagram_id>/result', methods=['GET'])
+def get_diagram_result(diagram_id):
+    """Return a finished diagram, long-polling up to ``?wait=`` seconds while it runs."""
+    diagram_request = DiagramRequest.query.get_or_404(diagram_id)
+    wait = min(request.args.get('wait', 0, type=float), current_app.config['JOB_LONG_POLL_MAX_SECONDS'])
+    deadline = time.monotonic() + wait
+    job_queue = None
+
+    while diagram_request.status in ('pending', 'processing'):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return jsonify(_status_payload(diagram_request)), 202
+        # Only rows that are still running need the queue; looking it up starts its workers
+        if job_queue is None:
+            job_queue = get_job_queue()
+        # Don't hold a pooled connection while waiting
         db.session.commit()
-        
+        # Jobs queued by another worker process have no local event, so poll the row instead
+        if job_queue.wait(diagram_id, min(remaining, 0.5)) is None:
+            time.sleep(min(remaining, 0.1))
+        db.session.refresh(diagram_request)
+
+    if diagram_request.status == 'failed':
         return jsonify({
             'id': diagram_request.id,
-            'diagram_code': diagram_code,
-            'diagram_image': diagram_image
-        })
-    
-    except Exception as e:
-        error_message = str(e)
-        if diagram_request:
-            diagram_request.status = 'failed'
-            diagram_request.error_message = error_message
-            db.session.commit()
-        return jsonify({
-            'error': error_message,
+            'error': diagram_request.error_message,
             'status': 'failed'
         }), 500
 
+    return jsonify(_result_payload(diagram_request, _flag('include_image')))
+
+
+@diagram_bp.route('/<int:diagram_id>/image', methods=['GET'])
+def get_diagram_image(diagram_id):
+    """Stream the stored image with ETag, conditional GET and Range support.
+
+    ``?format=svg|pdf|dot|png`` returns another format of the same diagram. It is
+    drawn from the cached layout, so neither the model nor the diagram code runs again.
+    """
+    diagram_request = DiagramRequest.query.get_or_404(diagram_id)
+    if not diagram_request.image_sha256:
+        abort(404)
+    try:
+        fmt = _requested_format() or diagram_request.image_format
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    store = get_artifact_store()
+    if fmt == diagram_request.image_format:
+        image_sha256 = diagram_request.image_sha256
+        if not store.exists(image_sha256, fmt):
+            abort(404)
+    else:
+        try:
+            with timed('transcode'):
+                image_bytes = diagram_service.render_diagram(diagram_request.diagram_code, diagram_id, fmt)
+        except DiagramParseError as e:
+            # Only Mermaid output needs parseable code; images can always be drawn
+            return jsonify({'error': str(e), 'status': 'failed'}), 422
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'failed'}), 500
+        image_sha256 = store.put(image_bytes, fmt)
+
+    return send_file(
+        store.path(image_sha256, fmt),
+        mimetype=MIMETYPES.get(fmt, 'application/octet-stream'),
+        download_name=f"diagram-{diagram_id}.{fmt}",
+        conditional=True,
+        etag=image_sha256,
+        max_age=0
+    )
+
+@diagram_bp.route('/<int:diagram_id>/thumbnail', methods=['GET'])
+def get_diagram_thumbnail(diagram_id):
+    """Serve the precomputed thumbnail, making it now for diagrams rendered before thumbnails existed."""
+    diagram_request = DiagramRequest.query.get_or_404(diagram_id)
+    if not diagram_request.image_sha256:
+        abort(404)
+
+    if not diagram_request.thumbnail_sha256:
+        postprocessor = get_image_postprocessor()
+        if postprocessor is None:
+            abort(404)
+        try:
+            postprocessor.process(diagram_id)
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'failed'}), 500
+        diagram_request = db.session.get(DiagramRequest, diagram_id, populate_existing=True)
+        if not diagram_request.thumbnail_sha256:
+            abort(404)
+
+    store = get_artifact_store()
+    fmt = diagram_request.thumbnail_format
+    return send_file(
+        store.path(diagram_request.thumbnail_sha256, fmt),
+        mimetype=MIMETYPES.get(fmt, 'application/octet-stream'),
+        download_name=f"diagram-{diagram_id}-thumbnail.{fmt}",
+        conditional=True,
+        etag=diagram_request.thumbnail_sha256,
+        # Content addressed, so a thumbnail never changes once it exists
+        max_age=86400
+    )
+
+# Projectable /history fields and the columns each one needs
+HISTORY_FIELDS = {
+    'id': ('id',),
+    'prompt': ('prompt',),
+    'status': ('status',),
+    'created_at': ('created_at',),
+    'error_message': ('error_message',),
+    'diagram_code': ('diagram_code',),
+    'diagram_type': ('diagram_type',),
+    'image_url': ('image_sha256',),
+    'thumbnail_url': ('image_sha256', 'image_format'),
+    'parent_id': ('parent_id',)
+}
+DEFAULT_HISTORY_FIELDS = ('id', 'prompt', 'status', 'created_at', 'error_message')
+
+
+def _encode_cursor(row):
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+def _history_item(row, fields):
+    item = {}
+    for field in fields:
+        if field == 'created_at':
+            item[field] = row.created_at.isoformat()
+        elif field == 'image_url':
+            item[field] = url_for('diagram.get_diagram_image', diagram_id=row.id) if row.image_sha256 else None
+        elif field == 'thumbnail_url':
+            # Missing thumbnails are made on first request, so any rendered image has one;
+            # Mermaid diagrams are drawn by the client and have none
+            has_thumbnail = row.image_sha256 and row.image_format != 'mmd'
+            item[field] = url_for('diagram.get_diagram_thumbnail', diagram_id=row.id) if has_thumbnail else None
+        else:
+            item[field] = getattr(row, field)
+    return item
+
+
 @diagram_bp.route('/history', methods=['GET'])
 def get_diagram_history():
-    diagrams = DiagramRequest.query.order_by(DiagramRequest.created_at.desc()).all()
-    return jsonify([{
-        'id': d.id,
-        'prompt': d.prompt,
-        'status': d.status,
-        'created_at': d.created_at.isoformat(),
-        'error_message': d.error_message
-    } for d in diagrams]) 
\ No newline at end of file
+    """Keyset-paginated history, newest first.
+
+    Query parameters: ``limit``, ``cursor`` (the ``next_cursor`` of the previous
+    page), ``status`` and ``fields`` (comma separated projection).
+    """
+    config = current_app.config
+    limit = max(1, min(request.args.get('limit', config['HISTORY_PAGE_SIZE'], type=int), config['HISTORY_MAX_PAGE_SIZE']))
+
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(DEFAULT_HISTORY_FIELDS)
+    unknown = [f for f in fields if f not in HISTORY_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    # Only load the columns that were asked for, plus the cursor columns
+    columns = {'id', 'created_at'}
+    for field in fields:
+        columns.update(HISTORY_FIELDS[field])
+    query = db.session.query(*[getattr(DiagramRequest, c) for c in sorted(columns)])
+
+    status = request.args.get('status')
+    if status:
+        query = query.filter(DiagramRequest.status == status)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, row_id = _decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.or_(
+            DiagramRequest.created_at < created_at,
+            db.and_(DiagramRequest.created_at == created_at, DiagramRequest.id < row_id)
+        ))
+
+    # Fetch one extra row to find out whether there is a next page
+    query = query.order_by(DiagramRequest.created_at.desc(), DiagramRequest.id.desc()).limit(limit + 1)
+
+    if limit <= config['HISTORY_STREAM_THRESHOLD']:
+        rows = query.all()
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return jsonify({
+            'items': [_history_item(row, fields) for row in rows[:limit]],
+            'next_cursor': next_cursor
+        })
+
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{"items": ['
+        last = None
+        has_more = False
+        for count, row in enumerate(query.yield_per(500)):
+            if count == limit:
+                has_more = True
+                break
+            yield (',' if count else '') + dumps(_history_item(row, fields))
+            last = row
+        next_cursor = _encode_cursor(last) if has_more else None
+        yield '], "next_cursor": ' + dumps(next_cursor) + '}'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
+@diagram_bp.route('/search', methods=['GET'])
+def search_diagrams():
+    """Full-text search over prompts and diagram code, best match first.
+
+    Query parameters: ``q``, ``limit``, ``offset`` (the ``next_offset`` of the
+    previous page) and ``status``.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+
+    config = current_app.config
+    limit = max(1, min(request.args.get('limit', config['SEARCH_PAGE_SIZE'], type=int), config['SEARCH_MAX_PAGE_SIZE']))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    with timed('search'):
+        rows, has_more = get_search().search(query, limit, offset, request.args.get('status'))
+
+    items = []
+    for row in rows:
+        rendered = row['image_sha256'] is not None
+        has_thumbnail = rendered and row['image_format'] != 'mmd'
+        items.append({
+            'id': row['id'],
+            'prompt': row['prompt'],
+            'status': row['status'],
+            'created_at': row['created_at'].isoformat(),
+            'parent_id': row['parent_id'],
+            'score': row['score'],
+            'snippet': row['snippet'],
+            'image_url': url_for('diagram.get_diagram_image', diagram_id=row['id']) if rendered else None,
+            'thumbnail_url': url_for('diagram.get_diagram_thumbnail', diagram_id=row['id']) if has_thumbnail else None
+        })
+    return jsonify({'items': items, 'next_offset': offset + limit if has_more else None})
+
+
+@diagram_bp.route('/stats', methods=['GET'])
+def get_stats():
+    gemini_service = get_pipeline().gemini_service
+    postprocessor = get_image_postprocessor()
+    return jsonify({
+        'render_cache': diagram_service.cache_stats(),
+        'llm_cache': gemini_service.cache_stats(),
+        'fast_path': gemini_service.fast_path_stats(),
+        'llm': gemini_service.resilience_stats(),
+        'postprocess': postprocessor.stats() if postprocessor else None,
+        'jobs': get_job_queue().stats()
+    })
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import threading
+from app.config import Config
+
+MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+    'dot': 'text/vnd.graphviz',
+    'mmd': 'text/vnd.mermaid',
+    'webp': 'image/webp'
+}
+
+
+class ArtifactStore:
+    """Content-addressed file store for rendered diagrams.
+
+    Files live at ``<root>/<sha[:2]>/<sha>.<format>``, so identical renders are
+    stored once and a file never changes once written.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, sha256, fmt):
+        return os.path.join(self.root, sha256[:2], f"{sha256}.{fmt}")
+
+    def exists(self, sha256, fmt):
+        return os.path.exists(self.path(sha256, fmt))
+
+    def put(self, data, fmt):
+        """Store ``data`` and return its sha256 hex digest."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256, fmt)
+        if os.path.exists(path):
+            return sha256
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return sha256
+
+    def read(self, sha256, fmt):
+        with open(self.path(sha256, fmt), 'rb') as f:
+            return f.read()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """Return the process-wide artifact store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(Config.ARTIFACT_DIR)
+        return _store
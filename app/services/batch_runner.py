@@ -0,0 +1,66 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BatchRunner:
+    """Fans a batch of prompts out over the two pipeline stages.
+
+    Code generation runs on up to ``llm_concurrency`` threads; each finished
+    prompt is handed straight to a separate render pool, so LLM calls and
+    renders overlap instead of running stage by stage.
+    """
+
+    def __init__(self, pipeline, llm_concurrency=8, render_concurrency=2):
+        self.pipeline = pipeline
+        self.llm_concurrency = llm_concurrency
+        self.render_concurrency = render_concurrency
+
+    def run(self, app, jobs, image_format=None):
+        """Process ``[(diagram_id, prompt), ...]`` and yield one result dict per job as it finishes."""
+        results = queue.Queue()
+        llm_pool = ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix='batch-llm')
+        render_pool = ThreadPoolExecutor(max_workers=self.render_concurrency, thread_name_prefix='batch-render')
+
+        def generate(prompt):
+            # The LLM response cache needs an app context for its database tier
+            with app.app_context():
+                return self.pipeline.generate_code(prompt)
+
+        def render(diagram_id, prompt, diagram_code):
+            # Needed to drop code that will not render from the LLM cache's database tier
+            with app.app_context():
+                return self.pipeline.render_generated(prompt, diagram_code, diagram_id, image_format)
+
+        def rendered(diagram_id, diagram_code, future):
+            try:
+                image_sha256, output_format, _ = future.result()
+            except Exception as e:
+                results.put({'id': diagram_id, 'status': 'failed', 'error': str(e)})
+                return
+            results.put({
+                'id': diagram_id,
+                'status': 'completed',
+                'diagram_code': diagram_code,
+                'image_sha256': image_sha256,
+                'image_format': output_format
+            })
+
+        def generated(diagram_id, prompt, future):
+            try:
+                diagram_code = future.result()
+                render_future = render_pool.submit(render, diagram_id, prompt, diagram_code)
+            except Exception as e:
+                results.put({'id': diagram_id, 'status': 'failed', 'error': str(e)})
+                return
+            render_future.add_done_callback(lambda f: rendered(diagram_id, diagram_code, f))
+
+        try:
+            for diagram_id, prompt in jobs:
+                future = llm_pool.submit(generate, prompt)
+                future.add_done_callback(lambda f, diagram_id=diagram_id, prompt=prompt: generated(diagram_id, prompt, f))
+
+            for _ in range(len(jobs)):
+                yield results.get()
+        finally:
+            llm_pool.shutdown(wait=False, cancel_futures=True)
+            render_pool.shutdown(wait=False, cancel_futures=True)
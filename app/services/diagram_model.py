@@ -0,0 +1,640 @@
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+
+# Node classes the generated code may use, with their icons under the diagrams resources dir
+NODE_ICONS = {
+    'EC2': 'aws/compute/ec2.png',
+    'RDS': 'aws/database/rds.png',
+    'ElastiCache': 'aws/database/elasticache.png',
+    'ELB': 'aws/network/elastic-load-balancing.png',
+    'ALB': 'aws/network/elb-application-load-balancer.png',
+    'VPC': 'aws/network/vpc.png',
+    'PrivateSubnet': 'aws/network/private-subnet.png',
+    'PublicSubnet': 'aws/network/public-subnet.png',
+}
+
+# Where each node class is imported from when a model is turned back into code
+NODE_MODULES = {
+    'EC2': 'diagrams.aws.compute',
+    'RDS': 'diagrams.aws.database',
+    'ElastiCache': 'diagrams.aws.database',
+    'ELB': 'diagrams.aws.network',
+    'ALB': 'diagrams.aws.network',
+    'VPC': 'diagrams.aws.network',
+    'PrivateSubnet': 'diagrams.aws.network',
+    'PublicSubnet': 'diagrams.aws.network',
+}
+
+DIRECTIONS = ('TB', 'BT', 'LR', 'RL')
+
+
+def node_imports(kinds=NODE_ICONS):
+    """``from ... import ...`` lines for the node classes ``kinds``, one per module."""
+    modules = {}
+    for kind in sorted(kinds):
+        modules.setdefault(NODE_MODULES[kind], []).append(kind)
+    return [f"from {module} import {', '.join(names)}" for module, names in sorted(modules.items())]
+
+# Same look as the diagrams package defaults
+GRAPH_ATTRS = {
+    'pad': '2.0',
+    'splines': 'ortho',
+    'nodesep': '0.60',
+    'ranksep': '0.75',
+    'fontname': 'Sans-Serif',
+    'fontsize': '15',
+    'fontcolor': '#2D3436',
+}
+NODE_ATTRS = {
+    'shape': 'box',
+    'style': 'rounded',
+    'fixedsize': 'true',
+    'width': '1.4',
+    'height': '1.4',
+    'labelloc': 'b',
+    'imagescale': 'true',
+    'fontname': 'Sans-Serif',
+    'fontsize': '13',
+    'fontcolor': '#2D3436',
+}
+EDGE_ATTRS = {
+    'color': '#7B8894',
+}
+CLUSTER_ATTRS = {
+    'shape': 'box',
+    'style': 'rounded',
+    'labeljust': 'l',
+    'pencolor': '#AEB6BE',
+    'fontname': 'Sans-Serif',
+    'fontsize': '12',
+}
+CLUSTER_BGCOLORS = ('#E5F5FD', '#EBF3E7', '#ECE8F6', '#FDF7E3')
+LABELED_EDGE_ATTRS = {
+    'fontcolor': '#2D3436',
+    'fontname': 'Sans-Serif',
+    'fontsize': '13',
+}
+
+
+# Mermaid node colours by service family, close to the AWS icon colours
+MERMAID_CLASSES = {
+    'compute': 'fill:#FDEBD0,stroke:#ED7100,color:#2D3436',
+    'database': 'fill:#DCE6F7,stroke:#3B48CC,color:#2D3436',
+    'network': 'fill:#EDE3F7,stroke:#8C4FFF,color:#2D3436',
+}
+
+
+class DiagramParseError(ValueError):
+    pass
+
+
+class DiagramTooLarge(Exception):
+    """The code builds more nodes or edges than the caller allowed."""
+
+
+class DiagramPatchError(ValueError):
+    """An edit operation that does not apply to the diagram."""
+
+
+class DiagramNode:
+    def __init__(self, node_id, kind, label, cluster):
+        self.id = node_id
+        self.kind = kind
+        self.label = label
+        self.cluster = cluster
+
+
+class DiagramCluster:
+    def __init__(self, cluster_id, label, parent):
+        self.id = cluster_id
+        self.label = label
+        self.parent = parent
+
+
+class DiagramEdge:
+    def __init__(self, source, target, forward=False, reverse=False, attrs=None):
+        self.source = source
+        self.target = target
+        self.forward = forward
+        self.reverse = reverse
+        self.attrs = attrs or {}
+
+    @property
+    def dir(self):
+        if self.forward and self.reverse:
+            return 'both'
+        if self.forward:
+            return 'forward'
+        if self.reverse:
+            return 'back'
+        return 'none'
+
+
+class DiagramModel:
+    """Nodes, clusters and edges of one diagram, independent of any rendering backend."""
+
+    def __init__(self, name='AWS Architecture', direction='LR'):
+        self.name = name
+        self.direction = direction
+        self.nodes = {}
+        self.clusters = {}
+        self.edges = []
+        # Ids are never reused, even after a node is removed
+        self._next_node = 0
+        self._next_cluster = 0
+
+    def add_cluster(self, label, parent):
+        cluster = DiagramCluster(f"cluster_{self._next_cluster}", label, parent)
+        self._next_cluster += 1
+        self.clusters[cluster.id] = cluster
+        return cluster.id
+
+    def add_node(self, kind, label, cluster):
+        node = DiagramNode(f"n{self._next_node}", kind, label, cluster)
+        self._next_node += 1
+        self.nodes[node.id] = node
+        return node.id
+
+    def add_edge(self, source, target, forward=False, reverse=False, attrs=None):
+        self.edges.append(DiagramEdge(source, target, forward, reverse, attrs))
+
+    def remove_node(self, node_id):
+        del self.nodes[node_id]
+        self.edges = [e for e in self.edges if node_id not in (e.source, e.target)]
+
+    def copy(self):
+        model = DiagramModel(self.name, self.direction)
+        model.clusters = {c.id: DiagramCluster(c.id, c.label, c.parent) for c in self.clusters.values()}
+        model.nodes = {n.id: DiagramNode(n.id, n.kind, n.label, n.cluster) for n in self.nodes.values()}
+        model.edges = [DiagramEdge(e.source, e.target, e.forward, e.reverse, dict(e.attrs)) for e in self.edges]
+        model._next_node = self._next_node
+        model._next_cluster = self._next_cluster
+        return model
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'direction': self.direction,
+            'clusters': [[c.id, c.label, c.parent] for c in self.clusters.values()],
+            'nodes': [[n.id, n.kind, n.label, n.cluster] for n in self.nodes.values()],
+            'edges': [[e.source, e.target, e.dir, sorted(e.attrs.items())] for e in self.edges],
+        }
+
+    def signature(self):
+        """Stable hash of the graph, used as a render cache key."""
+        canonical = json.dumps(self.to_dict(), separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _cluster_depth(self, cluster_id):
+        depth = 0
+        while self.clusters[cluster_id].parent is not None:
+            cluster_id = self.clusters[cluster_id].parent
+            depth += 1
+        return depth
+
+    def to_dot(self):
+        """Emit Graphviz DOT source styled like the diagrams package output."""
+        lines = [f"digraph {_quote(self.name)} {{"]
+        lines.append(f"\tgraph {_attrs({**GRAPH_ATTRS, 'label': self.name, 'rankdir': self.direction})}")
+        lines.append(f"\tnode {_attrs(NODE_ATTRS)}")
+        lines.append(f"\tedge {_attrs(EDGE_ATTRS)}")
+
+        children = {}
+        for cluster in self.clusters.values():
+            children.setdefault(cluster.parent, []).append(cluster.id)
+        members = {}
+        for node in self.nodes.values():
+            members.setdefault(node.cluster, []).append(node)
+
+        def emit(cluster_id, indent):
+            for node in members.get(cluster_id, []):
+                lines.append(f"{indent}{node.id} {_attrs(_node_attrs(node))}")
+            for child_id in children.get(cluster_id, []):
+                cluster = self.clusters[child_id]
+                bgcolor = CLUSTER_BGCOLORS[self._cluster_depth(child_id) % len(CLUSTER_BGCOLORS)]
+                lines.append(f"{indent}subgraph {child_id} {{")
+                lines.append(f"{indent}\tgraph {_attrs({**CLUSTER_ATTRS, 'label': cluster.label, 'bgcolor': bgcolor})}")
+                emit(child_id, indent + '\t')
+                lines.append(f"{indent}}}")
+
+        emit(None, '\t')
+
+        for edge in self.edges:
+            attrs = {**edge.attrs, 'dir': edge.dir}
+            if edge.attrs:
+                attrs = {**LABELED_EDGE_ATTRS, **attrs}
+            lines.append(f"\t{edge.source} -> {edge.target} {_attrs(attrs)}")
+
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def to_mermaid(self):
+        """Emit a Mermaid flowchart; clusters become subgraphs, for rendering in the browser."""
+        lines = ['---', f"title: {json.dumps(self.name)}", '---', f"flowchart {self.direction}"]
+
+        children = {}
+        for cluster in self.clusters.values():
+            children.setdefault(cluster.parent, []).append(cluster.id)
+        members = {}
+        for node in self.nodes.values():
+            members.setdefault(node.cluster, []).append(node)
+
+        def emit(cluster_id, indent):
+            for node in members.get(cluster_id, []):
+                family = NODE_MODULES[node.kind].rsplit('.', 1)[-1]
+                lines.append(f'{indent}{node.id}["{_mermaid_text(node.label)}"]:::{family}')
+            for child_id in children.get(cluster_id, []):
+                lines.append(f'{indent}subgraph {child_id}["{_mermaid_text(self.clusters[child_id].label)}"]')
+                emit(child_id, indent + '    ')
+                lines.append(f"{indent}end")
+
+        emit(None, '    ')
+
+        arrows = {'forward': '-->', 'back': '-->', 'both': '<-->', 'none': '---'}
+        dotted = {'forward': '-.->', 'back': '-.->', 'both': '<-.->', 'none': '-.-'}
+        link_styles = []
+        for index, edge in enumerate(self.edges):
+            arrow = (dotted if edge.attrs.get('style') in ('dashed', 'dotted') else arrows)[edge.dir]
+            if edge.attrs.get('label'):
+                arrow += f'|"{_mermaid_text(edge.attrs["label"])}"|'
+            # Mermaid has no back arrow, so point it the other way round
+            source, target = (edge.target, edge.source) if edge.dir == 'back' else (edge.source, edge.target)
+            lines.append(f"    {source} {arrow} {target}")
+            if edge.attrs.get('color'):
+                link_styles.append(f"    linkStyle {index} stroke:{edge.attrs['color']}")
+        lines += link_styles
+
+        for cluster in self.clusters.values():
+            bgcolor = CLUSTER_BGCOLORS[self._cluster_depth(cluster.id) % len(CLUSTER_BGCOLORS)]
+            lines.append(f"    style {cluster.id} fill:{bgcolor},stroke:{CLUSTER_ATTRS['pencolor']}")
+        lines += [f"    classDef {family} {style}" for family, style in MERMAID_CLASSES.items()]
+        return '\n'.join(lines) + '\n'
+
+    def to_code(self):
+        """Emit ``diagrams`` code that ``parse_diagram_code`` reads back as this model."""
+        lines = ['from diagrams import Diagram, Cluster' + (', Edge' if any(e.attrs or e.dir == 'both' for e in self.edges) else '')]
+        lines += node_imports({node.kind for node in self.nodes.values()})
+        lines += ['', 'def generate_diagram():',
+                  f"    with Diagram({_py(self.name)}, direction={_py(self.direction)}):"]
+
+        children = {}
+        for cluster in self.clusters.values():
+            children.setdefault(cluster.parent, []).append(cluster.id)
+        members = {}
+        for node in self.nodes.values():
+            members.setdefault(node.cluster, []).append(node)
+
+        def emit(cluster_id, indent):
+            start = len(lines)
+            for node in members.get(cluster_id, []):
+                lines.append(f"{indent}{node.id} = {node.kind}({_py(node.label)})")
+            for child_id in children.get(cluster_id, []):
+                lines.append(f"{indent}with Cluster({_py(self.clusters[child_id].label)}):")
+                emit(child_id, indent + '    ')
+            if len(lines) == start:
+                lines.append(f"{indent}pass")
+
+        emit(None, '        ')
+
+        operators = {'forward': ('>>', '>>'), 'back': ('<<', '<<'), 'none': ('-', '-'), 'both': ('>>', '<<')}
+        for edge in self.edges:
+            left, right = operators[edge.dir]
+            if edge.attrs or edge.dir == 'both':
+                args = ', '.join(f"{key}={_py(value)}" for key, value in sorted(edge.attrs.items()))
+                lines.append(f"        {edge.source} {left} Edge({args}) {right} {edge.target}")
+            else:
+                lines.append(f"        {edge.source} {left} {edge.target}")
+
+        lines += ['', 'if __name__ == "__main__":', '    generate_diagram()']
+        return '\n'.join(lines) + '\n'
+
+
+def apply_patch(model, operations):
+    """Return a copy of ``model`` with edit ``operations`` applied.
+
+    Each operation is a dict with an ``op`` of add_node, update_node,
+    remove_node, add_edge, remove_edge or add_cluster. New nodes and clusters
+    may be given any ``id``, which later operations can refer to; they get
+    fresh model ids. Raises DiagramPatchError for anything that does not apply.
+    """
+    model = model.copy()
+    aliases = {}
+
+    def ref(op, key, default=None):
+        # Ids come from model output, so anything but a plain string or number is refused
+        value = op.get(key, default)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int))):
+            raise DiagramPatchError(f"{op.get('op')}: {key} must be a string")
+        return value
+
+    def node_ref(op, key):
+        value = aliases.get(ref(op, key), op.get(key))
+        if value not in model.nodes:
+            raise DiagramPatchError(f"{op['op']}: unknown node {op.get(key)!r}")
+        return value
+
+    def cluster_ref(op, key):
+        value = ref(op, key)
+        if value is None:
+            return None
+        value = aliases.get(value, value)
+        if value not in model.clusters:
+            # Models often name a cluster by its label rather than its id
+            value = next((c.id for c in model.clusters.values() if c.label == op.get(key)), None)
+            if value is None:
+                raise DiagramPatchError(f"{op['op']}: unknown cluster {op.get(key)!r}")
+        return value
+
+    def label(op, default=''):
+        value = op.get('label', default)
+        if not isinstance(value, str):
+            raise DiagramPatchError(f"{op['op']}: label must be a string")
+        return value
+
+    if not isinstance(operations, list):
+        raise DiagramPatchError("patch must be a list of operations")
+    for op in operations:
+        if not isinstance(op, dict):
+            raise DiagramPatchError("each operation must be an object")
+        name = op.get('op')
+        if name == 'add_node':
+            if not isinstance(op.get('kind'), str) or op['kind'] not in NODE_ICONS:
+                raise DiagramPatchError(f"add_node: unknown node type {op.get('kind')!r}")
+            node_id = model.add_node(op['kind'], label(op), cluster_ref(op, 'cluster'))
+            aliases[ref(op, 'id', node_id)] = node_id
+        elif name == 'update_node':
+            node = model.nodes[node_ref(op, 'id')]
+            node.label = label(op, node.label)
+            if 'cluster' in op:
+                node.cluster = cluster_ref(op, 'cluster')
+            if 'kind' in op:
+                if not isinstance(op['kind'], str) or op['kind'] not in NODE_ICONS:
+                    raise DiagramPatchError(f"update_node: unknown node type {op['kind']!r}")
+                node.kind = op['kind']
+        elif name == 'remove_node':
+            model.remove_node(node_ref(op, 'id'))
+        elif name == 'add_edge':
+            attrs = {'label': label(op)} if op.get('label') else None
+            model.add_edge(node_ref(op, 'source'), node_ref(op, 'target'), forward=True, attrs=attrs)
+        elif name == 'remove_edge':
+            source, target = node_ref(op, 'source'), node_ref(op, 'target')
+            edges = [e for e in model.edges if {e.source, e.target} != {source, target}]
+            if len(edges) == len(model.edges):
+                raise DiagramPatchError(f"remove_edge: no edge between {op['source']!r} and {op['target']!r}")
+            model.edges = edges
+        elif name == 'add_cluster':
+            cluster_id = model.add_cluster(label(op, 'cluster'), cluster_ref(op, 'parent'))
+            aliases[ref(op, 'id', cluster_id)] = cluster_id
+        else:
+            raise DiagramPatchError(f"unknown operation {name!r}")
+
+    if not model.nodes:
+        raise DiagramPatchError("patch removes every node")
+    return model
+
+
+def _py(value):
+    """Python string literal for generated code."""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _quote(value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{value}"'
+
+
+def _mermaid_text(value):
+    """Mermaid label text; quotes and angle brackets become entity codes."""
+    value = str(value).replace('"', '#quot;').replace('<', '#lt;').replace('>', '#gt;')
+    return value.replace('\n', '<br/>')
+
+
+def _attrs(attrs):
+    return '[' + ' '.join(f"{key}={_quote(value)}" for key, value in attrs.items()) + ']'
+
+
+_resources_dir = None
+
+
+def _icon_path(kind):
+    """Absolute path of a node icon inside the installed diagrams package, if present."""
+    global _resources_dir
+    if _resources_dir is None:
+        # diagrams ships its icons in a top-level "resources" dir next to the package
+        spec = importlib.util.find_spec('diagrams')
+        package_dir = os.path.dirname(spec.origin) if spec and spec.origin else ''
+        _resources_dir = os.path.join(os.path.dirname(package_dir), 'resources')
+    path = os.path.join(_resources_dir, NODE_ICONS[kind])
+    return path if os.path.exists(path) else None
+
+
+def _node_attrs(node):
+    attrs = {'label': node.label}
+    icon = _icon_path(node.kind)
+    if icon:
+        attrs.update({
+            'shape': 'none',
+            'height': str(1.9 + 0.4 * node.label.count('\n')),
+            'image': icon,
+        })
+    return attrs
+
+
+class _EdgeSpec:
+    """An ``Edge(...)`` call, optionally already attached to source nodes."""
+
+    def __init__(self, attrs, sources=None, forward=False, reverse=False):
+        self.attrs = attrs
+        self.sources = sources
+        self.forward = forward
+        self.reverse = reverse
+
+
+class _Builder:
+    OPERATORS = {ast.RShift: 'forward', ast.LShift: 'reverse', ast.Sub: 'none'}
+
+    def __init__(self, model, max_nodes=None, max_edges=None):
+        self.model = model
+        self.env = {}
+        self.cluster = None
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+
+    def add_node(self, kind, label):
+        if self.max_nodes is not None and len(self.model.nodes) >= self.max_nodes:
+            raise DiagramTooLarge(f"Diagram has more than {self.max_nodes} nodes")
+        return self.model.add_node(kind, label, self.cluster)
+
+    def add_edge(self, *args):
+        # Checked per edge, so a huge fan-out stops early instead of filling memory
+        if self.max_edges is not None and len(self.model.edges) >= self.max_edges:
+            raise DiagramTooLarge(f"Diagram has more than {self.max_edges} edges")
+        self.model.add_edge(*args)
+
+    def fail(self, node, message):
+        raise DiagramParseError(f"line {getattr(node, 'lineno', '?')}: {message}")
+
+    def string_arg(self, call, keyword):
+        if call.args:
+            value = call.args[0]
+        else:
+            value = next((k.value for k in call.keywords if k.arg == keyword), None)
+        if value is None:
+            return ''
+        if not isinstance(value, ast.Constant) or not isinstance(value.value, str):
+            self.fail(call, f"{keyword} must be a string literal")
+        return value.value
+
+    def run(self, statements):
+        for stmt in statements:
+            if isinstance(stmt, ast.With):
+                self.with_block(stmt)
+            elif isinstance(stmt, ast.Assign):
+                if len(stmt.targets) != 1 or not isinstance(stmt.targets[0], ast.Name):
+                    self.fail(stmt, "only simple assignments are supported")
+                self.env[stmt.targets[0].id] = self.expr(stmt.value)
+            elif isinstance(stmt, ast.Expr):
+                self.expr(stmt.value)
+            elif isinstance(stmt, ast.For):
+                self.for_loop(stmt)
+            elif not isinstance(stmt, ast.Pass):
+                self.fail(stmt, f"unsupported statement {type(stmt).__name__}")
+
+    def with_block(self, stmt):
+        if len(stmt.items) != 1:
+            self.fail(stmt, "only one context manager per with statement")
+        call = stmt.items[0].context_expr
+        if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == 'Cluster'):
+            self.fail(stmt, "only Cluster(...) blocks are supported inside a diagram")
+        for keyword in call.keywords:
+            if keyword.arg not in ('label', 'direction'):
+                self.fail(stmt, f"unsupported Cluster argument {keyword.arg}")
+
+        parent = self.cluster
+        self.cluster = self.model.add_cluster(self.string_arg(call, 'label') or 'cluster', parent)
+        try:
+            self.run(stmt.body)
+        finally:
+            self.cluster = parent
+
+    def for_loop(self, stmt):
+        if not isinstance(stmt.target, ast.Name) or stmt.orelse:
+            self.fail(stmt, "only simple for loops are supported")
+        group = self.expr(stmt.iter)
+        if not isinstance(group, list):
+            self.fail(stmt, "can only loop over nodes")
+        for node_id in group:
+            self.env[stmt.target.id] = [node_id]
+            self.run(stmt.body)
+
+    def expr(self, node):
+        """Evaluate an expression to a node group (list of ids) or an _EdgeSpec."""
+        if isinstance(node, ast.Name):
+            if node.id not in self.env:
+                self.fail(node, f"undefined name {node.id}")
+            return self.env[node.id]
+
+        if isinstance(node, (ast.List, ast.Tuple)):
+            group = []
+            for element in node.elts:
+                value = self.expr(element)
+                if not isinstance(value, list):
+                    self.fail(node, "lists may only contain nodes")
+                group.extend(value)
+            return group
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in NODE_ICONS:
+                for keyword in node.keywords:
+                    if keyword.arg != 'label':
+                        self.fail(node, f"unsupported {node.func.id} argument {keyword.arg}")
+                return [self.add_node(node.func.id, self.string_arg(node, 'label'))]
+            if node.func.id == 'Edge':
+                attrs = {}
+                for keyword in node.keywords:
+                    if keyword.arg not in ('label', 'color', 'style'):
+                        self.fail(node, f"unsupported Edge argument {keyword.arg}")
+                    if not isinstance(keyword.value, ast.Constant) or not isinstance(keyword.value.value, str):
+                        self.fail(node, f"Edge {keyword.arg} must be a string literal")
+                    if keyword.value.value:
+                        attrs[keyword.arg] = keyword.value.value
+                if node.args:
+                    self.fail(node, "Edge only takes keyword arguments")
+                return _EdgeSpec(attrs)
+            self.fail(node, f"unknown node type {node.func.id}")
+
+        if isinstance(node, ast.BinOp) and type(node.op) in self.OPERATORS:
+            return self.connect(node, self.expr(node.left), self.OPERATORS[type(node.op)], self.expr(node.right))
+
+        self.fail(node, f"unsupported expression {type(node).__name__}")
+
+    def connect(self, node, left, direction, right):
+        forward = direction == 'forward'
+        reverse = direction == 'reverse'
+
+        if isinstance(left, list) and isinstance(right, _EdgeSpec):
+            if right.sources is not None:
+                self.fail(node, "edge is already connected")
+            return _EdgeSpec(right.attrs, left, forward, reverse)
+
+        if isinstance(left, _EdgeSpec) and isinstance(right, list):
+            if left.sources is None:
+                self.fail(node, "edge has no source node")
+            for source in left.sources:
+                for target in right:
+                    self.add_edge(source, target, left.forward or forward, left.reverse or reverse, left.attrs)
+            return right
+
+        if isinstance(left, list) and isinstance(right, list):
+            # Same restriction as the diagrams package: a list cannot be connected to a list
+            if len(left) > 1 and len(right) > 1:
+                self.fail(node, "cannot connect a list of nodes to another list")
+            for source in left:
+                for target in right:
+                    self.add_edge(source, target, forward, reverse)
+            return right
+
+        self.fail(node, "invalid connection")
+
+
+def _find_diagram_block(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.With) and len(node.items) == 1:
+            call = node.items[0].context_expr
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == 'Diagram':
+                return node, call
+    return None, None
+
+
+def parse_diagram_code(code, max_nodes=None, max_edges=None):
+    """Parse generated ``diagrams`` code into a DiagramModel without executing it.
+
+    Raises DiagramParseError for anything outside the supported subset: node
+    classes from NODE_ICONS, nested Cluster blocks, simple assignments, for loops
+    over node lists and ``>>``/``<<``/``-`` connections with optional Edge(...).
+    Raises DiagramTooLarge as soon as the graph passes ``max_nodes``/``max_edges``.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise DiagramParseError(f"invalid Python: {e}")
+
+    block, call = _find_diagram_block(tree)
+    if block is None:
+        raise DiagramParseError("no `with Diagram(...)` block found")
+
+    direction = 'LR'
+    for keyword in call.keywords:
+        if keyword.arg == 'direction':
+            if not isinstance(keyword.value, ast.Constant) or keyword.value.value not in DIRECTIONS:
+                raise DiagramParseError(f"invalid direction on line {call.lineno}")
+            direction = keyword.value.value
+
+    model = DiagramModel(direction=direction)
+    _Builder(model, max_nodes, max_edges).run(block.body)
+    if not model.nodes:
+        raise DiagramParseError("diagram has no nodes")
+    return model
@@ -1,64 +1,218 @@
 import os
-from diagrams import Diagram
 import tempfile
 import base64
 import traceback
 import sys
 from pathlib import Path
-import textwrap
 import re
+import subprocess
+import logging
+from app.config import Config
+from app.services.diagram_model import DiagramParseError, DiagramTooLarge, node_imports, parse_diagram_code
+from app.services.render_cache import RenderCache, get_render_cache
+from app.services.metrics import RENDER_FAILURES_TOTAL, RENDER_REJECTIONS_TOTAL, timed
+from app.services.render_limits import (
+    RenderRejected, choose_engine, estimate_complexity, limit_process, render_slot
+)
+from app.services.renderer_pool import get_renderer_pool
+
+logger = logging.getLogger(__name__)
+
+# Output formats clients can ask for; 'dot' is the laid-out Graphviz source and
+# 'mmd' Mermaid flowchart text that the client renders
+FORMATS = ('png', 'svg', 'pdf', 'dot', 'mmd')
+LAYOUT = 'layout'
+
+# Executed code can use every node class the model parser knows
+NODE_IMPORTS = '\n'.join(node_imports())
+
 
 class DiagramService:
     @staticmethod
-    def generate_diagram(code, diagram_id):
+    def generate_diagram(code, diagram_id, outformat='png'):
+        """Render ``code`` and return the image as a base64 string."""
+        return base64.b64encode(DiagramService.render_diagram(code, diagram_id, outformat)).decode()
+
+    @staticmethod
+    def default_format(code):
+        """Mermaid text with the mermaid backend; otherwise SVG for large diagrams, where it
+        is far smaller than the PNG, and PNG for the rest."""
+        try:
+            model = DiagramService.parse_model(code)
+        except DiagramParseError:
+            return 'png'
+        if model is not None and Config.DIAGRAM_BACKEND == 'mermaid':
+            return 'mmd'
+        if model is not None and len(model.nodes) >= Config.SVG_DEFAULT_MIN_NODES:
+            return 'svg'
+        return 'png'
+
+    @staticmethod
+    def render_diagram(code, diagram_id, outformat='png'):
+        """Render ``code`` and return the raw bytes in ``outformat`` (see ``FORMATS``).
+
+        Code is first parsed into a DiagramModel and drawn straight from DOT; only
+        code outside the supported subset falls back to executing it in a renderer
+        worker (see ``Config.DIAGRAM_RENDERER``). The layout is computed once and
+        cached as laid-out DOT, so other formats of the same diagram are drawn
+        from it without running the layout or the diagram code again.
+
+        Before a layout runs, the graph size picks the Graphviz engine (oversized
+        graphs raise RenderRejected), and Graphviz work waits for one of the
+        ``RENDER_CONCURRENCY`` render slots.
+        """
+        if outformat not in FORMATS:
+            raise ValueError(f"Unsupported format: {outformat}")
+        if outformat == 'mmd':
+            return DiagramService.render_mermaid(code)
         try:
-            # Create a temporary directory for the diagram
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Create a Path object for better path handling
-                diagram_path = Path(tmpdir) / "diagram"
-                diagram_path = str(diagram_path).replace("\\", "/")
-                
-                # Extract and format the diagram content
+            with timed('parse'):
+                model = DiagramService.parse_model(code)
+            cache = get_render_cache()
+
+            # Identical diagrams are served from the render cache without touching Graphviz
+            if model is not None:
+                make_key = lambda fmt: RenderCache.make_model_key(model, fmt)
+            else:
+                with timed('extract'):
+                    diagram_content = DiagramService._extract_diagram_content(code)
+                make_key = lambda fmt: RenderCache.make_key(diagram_content, fmt)
+
+            # A miss here is only counted once the layout lookup below misses too, so
+            # each render is one lookup in the stats
+            with timed('render_cache'):
+                output = cache.get(make_key(outformat), count_miss=False) if cache else None
+            if output is not None:
+                return output
+
+            with timed('render_cache'):
+                layout = cache.get(make_key(LAYOUT)) if cache else None
+            if layout is not None and outformat == 'dot':
+                output = layout
+            elif layout is not None:
+                with render_slot():
+                    output = DiagramService._transcode(layout, outformat)
+            else:
+                renderer = 'model' if model is not None else 'exec'
+                if model is not None:
+                    engine = choose_engine(len(model.nodes), len(model.edges))
+                else:
+                    engine = choose_engine(*estimate_complexity(code))
+                # One Graphviz run produces both the layout and the requested format
+                outformats = list(dict.fromkeys(['dot', outformat]))
                 try:
-                    # Use regex to extract the content between the outermost with block
-                    match = re.search(r'with\s+Diagram.*?:\s*(.*?)(?=if\s+__name__|$)', 
-                                    code, re.DOTALL)
-                    if not match:
-                        raise ValueError("Could not extract diagram content")
-                    
-                    # Get the content and clean it up
-                    diagram_content = match.group(1).strip()
-                    
-                    # Split into lines and remove empty lines at start/end
-                    lines = [line for line in diagram_content.splitlines() if line.strip()]
-                    
-                    # Find the base indentation level
-                    base_indent = len(lines[0]) - len(lines[0].lstrip())
-                    
-                    # Remove the base indentation from all lines and add proper indentation
-                    cleaned_lines = []
-                    for line in lines:
-                        if line.startswith(' ' * base_indent):
-                            line = line[base_indent:]
-                        cleaned_lines.append(' ' * 12 + line)  # 12 spaces = 3 levels of indentation
-                    
-                    # Join lines back together
-                    diagram_content = '\n'.join(cleaned_lines)
-                    
-                except Exception as e:
-                    print(f"Error extracting diagram content: {str(e)}")
+                    with render_slot():
+                        if model is not None:
+                            outputs = DiagramService._render_dot(model.to_dot(), outformats, engine)
+                        else:
+                            outputs = DiagramService._render(diagram_content, outformats, engine)
+                except RenderRejected:
                     raise
-                
-                # Create the modified code with the correct diagram parameters
-                modified_code = f"""
+                except Exception:
+                    RENDER_FAILURES_TOTAL.inc(renderer=renderer)
+                    raise
+                output = outputs[outformat]
+                if cache:
+                    cache.put(make_key(LAYOUT), outputs['dot'])
+
+            if cache:
+                cache.put(make_key(outformat), output)
+            return output
+
+        except RenderRejected as e:
+            logger.warning("Diagram rejected: %s", e)
+            raise
+        except Exception as e:
+            error_details = traceback.format_exc()
+            logger.error("Error generating diagram: %s", error_details)
+            raise Exception(f"Error generating diagram: {str(e)}\n{error_details}")
+
+    @staticmethod
+    def render_mermaid(code):
+        """Mermaid flowchart text for ``code``. The browser draws it, so Graphviz never runs.
+
+        Raises DiagramParseError for code outside the parser's subset.
+        """
+        try:
+            with timed('parse'):
+                model = parse_diagram_code(code, Config.RENDER_MAX_NODES, Config.RENDER_MAX_EDGES)
+        except DiagramTooLarge as e:
+            RENDER_REJECTIONS_TOTAL.inc(reason='too_complex')
+            raise RenderRejected(str(e))
+        except DiagramParseError as e:
+            raise DiagramParseError(f"Mermaid output needs diagram code the parser understands: {e}")
+        with timed('mermaid'):
+            return model.to_mermaid().encode('utf-8')
+
+    @staticmethod
+    def parse_model(code):
+        """Parse ``code`` into a DiagramModel, or None when it has to be executed instead."""
+        if Config.DIAGRAM_RENDERER == 'exec':
+            return None
+        try:
+            return parse_diagram_code(code, Config.RENDER_MAX_NODES, Config.RENDER_MAX_EDGES)
+        except DiagramTooLarge as e:
+            RENDER_REJECTIONS_TOTAL.inc(reason='too_complex')
+            raise RenderRejected(str(e))
+        except DiagramParseError as e:
+            if Config.DIAGRAM_RENDERER == 'model':
+                raise
+            logger.info("Falling back to executing diagram code: %s", e)
+            return None
+
+    @staticmethod
+    def cache_stats():
+        cache = get_render_cache()
+        return cache.stats() if cache else None
+
+    @staticmethod
+    def _extract_diagram_content(code):
+        """Pull the body of the outermost ``with Diagram`` block, re-indented for the render module."""
+        try:
+            # Use regex to extract the content between the outermost with block
+            match = re.search(r'with\s+Diagram.*?:\s*(.*?)(?=if\s+__name__|$)', 
+                            code, re.DOTALL)
+            if not match:
+                raise ValueError("Could not extract diagram content")
+            
+            # Get the content and clean it up
+            diagram_content = match.group(1).strip()
+            
+            # Split into lines and remove empty lines at start/end
+            lines = [line for line in diagram_content.splitlines() if line.strip()]
+            
+            # Find the base indentation level
+            base_indent = len(lines[0]) - len(lines[0].lstrip())
+            
+            # Remove the base indentation from all lines and add proper indentation
+            cleaned_lines = []
+            for line in lines:
+                if line.startswith(' ' * base_indent):
+                    line = line[base_indent:]
+                cleaned_lines.append(' ' * 12 + line)  # 12 spaces = 3 levels of indentation
+            
+            # Join lines back together
+            return '\n'.join(cleaned_lines)
+            
+        except Exception as e:
+            logger.warning("Error extracting diagram content: %s", e)
+            raise
+
+    @staticmethod
+    def _render(diagram_content, outformats, engine='dot'):
+        """Run extracted diagram content and return ``{format: bytes}`` for ``outformats``."""
+        # Create a temporary directory for the diagram
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Create a Path object for better path handling
+            diagram_path = Path(tmpdir) / "diagram"
+            diagram_path = str(diagram_path).replace("\\", "/")
+            
+            # Create the modified code with the correct diagram parameters
+            modified_code = f"""
 import os
 import sys
-from diagrams import Diagram, Cluster
-from diagrams.aws.compute import EC2
-from diagrams.aws.database import RDS
-from diagrams.aws.network import ELB
-from diagrams.aws.network import VPC, PrivateSubnet, PublicSubnet
-from diagrams.aws.network import ALB, ELB
+from diagrams import Diagram, Cluster, Edge
+{NODE_IMPORTS}
 
 def generate_diagram():
     try:
@@ -66,8 +220,9 @@ def generate_diagram():
             "AWS Architecture",
             filename=r"{diagram_path}",
             show=False,
-            outformat="png",
-            direction="LR"
+            outformat={outformats!r},
+            direction="LR",
+            graph_attr={{"layout": "{engine}"}}
         ):
 {diagram_content}
     except Exception as e:
@@ -77,48 +232,106 @@ def generate_diagram():
 if __name__ == "__main__":
     generate_diagram()
 """
-                
-                # Debug the generated code
-                print("Generated code:")
-                print(modified_code)
-                print("\nDiagram content:")
-                print(diagram_content)
-                
-                # Create a new Python file in the temp directory
-                temp_py_file = os.path.join(tmpdir, "diagram_gen.py")
-                with open(temp_py_file, "w", encoding='utf-8') as f:
-                    f.write(modified_code)
-                
-                # Execute the Python file as a separate process
-                import subprocess
-                result = subprocess.run(
-                    [sys.executable, temp_py_file],
-                    capture_output=True,
-                    text=True,
-                    cwd=tmpdir,  # Set working directory to temp dir
-                    env={**os.environ, 'PATH': f"{os.environ['PATH']};C:\\Program Files\\Graphviz\\bin"}  # Add Graphviz to PATH
-                )
-                
-                if result.returncode != 0:
-                    print("Error output:", result.stderr)
-                    raise Exception(f"Diagram generation failed: {result.stderr}")
-                
-                # Read the generated PNG file
-                png_path = f"{diagram_path}.png"
-                
-                # Debug information
-                print(f"Looking for diagram at: {png_path}")
-                print(f"Directory contents: {os.listdir(tmpdir)}")
-                
-                if not os.path.exists(png_path):
-                    raise Exception(f"Diagram file was not generated at {png_path}")
-                
-                with open(png_path, "rb") as image_file:
-                    encoded_string = base64.b64encode(image_file.read()).decode()
-                
-                return encoded_string
-                
-        except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"Error details: {error_details}", file=sys.stderr)
-            raise Exception(f"Error generating diagram: {str(e)}\n{error_details}") 
\ No newline at end of file
+            
+            # Debug the generated code
+            logger.debug("Generated code:\n%s", modified_code)
+            
+            # Create a new Python file in the temp directory
+            temp_py_file = os.path.join(tmpdir, "diagram_gen.py")
+            with open(temp_py_file, "w", encoding='utf-8') as f:
+                f.write(modified_code)
+            
+            # Execute the Python file on a pre-warmed renderer worker
+            with timed('execute'):
+                DiagramService._execute(temp_py_file, tmpdir)
+            
+            # Read the generated files
+            outputs = {}
+            for outformat in outformats:
+                output_path = f"{diagram_path}.{outformat}"
+
+                if not os.path.exists(output_path):
+                    raise Exception(f"Diagram file was not generated at {output_path}")
+
+                with timed('read_image'), open(output_path, "rb") as image_file:
+                    outputs[outformat] = image_file.read()
+            return outputs
+
+    @staticmethod
+    def _graphviz_env():
+        """Environment for diagram scripts, with the default Graphviz install dir on PATH."""
+        return {'PATH': f"{os.environ['PATH']}{os.pathsep}C:\\Program Files\\Graphviz\\bin"}
+
+    @staticmethod
+    def _run_limited(command, input=None, **kwargs):
+        """``subprocess.run`` with captured output, capped by the render limits once the child has started."""
+        with subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              **kwargs) as process:
+            try:
+                limit_process(process.pid)
+                stdout, stderr = process.communicate(input, timeout=Config.RENDERER_JOB_TIMEOUT)
+            except BaseException:
+                process.kill()
+                raise
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    @staticmethod
+    def _run_graphviz(command, dot_source):
+        try:
+            # Graphviz waits for its input, so the limits are in place before it does any work
+            result = DiagramService._run_limited(
+                command,
+                input=dot_source if isinstance(dot_source, bytes) else dot_source.encode('utf-8'),
+                env={**os.environ, **DiagramService._graphviz_env()}
+            )
+        except subprocess.TimeoutExpired:
+            raise Exception(f"Graphviz timed out after {Config.RENDERER_JOB_TIMEOUT} seconds")
+        if result.returncode != 0:
+            raise Exception(f"Graphviz failed: {result.stderr.decode('utf-8', 'replace')}")
+        return result.stdout
+
+    @staticmethod
+    def _render_dot(dot_source, outformats, engine='dot'):
+        """Lay out DOT source once with ``engine`` and write every format in ``outformats``."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            command = ['dot', f'-K{engine}']
+            for outformat in outformats:
+                command += [f'-T{outformat}', '-o', os.path.join(tmpdir, f"diagram.{outformat}")]
+            with timed('graphviz'):
+                DiagramService._run_graphviz(command, dot_source)
+
+            outputs = {}
+            for outformat in outformats:
+                with open(os.path.join(tmpdir, f"diagram.{outformat}"), 'rb') as f:
+                    outputs[outformat] = f.read()
+            return outputs
+
+    @staticmethod
+    def _transcode(layout, outformat):
+        """Draw already laid-out DOT in another format; ``neato -n2`` keeps the positions as they are."""
+        with timed('transcode'):
+            return DiagramService._run_graphviz(['neato', '-n2', f'-T{outformat}'], layout)
+
+    @staticmethod
+    def _execute(script_path, workdir):
+        """Run a generated diagram script in isolation from the web worker."""
+        env = DiagramService._graphviz_env()
+        pool = get_renderer_pool(env)
+        if pool is not None:
+            pool.run(script_path, workdir)
+            return
+
+        # No pool configured: execute the Python file as a separate process
+        try:
+            result = DiagramService._run_limited(
+                [sys.executable, script_path],
+                text=True,
+                cwd=workdir,  # Set working directory to temp dir
+                env={**os.environ, **env}  # Add Graphviz to PATH
+            )
+        except subprocess.TimeoutExpired:
+            raise Exception(f"Diagram generation timed out after {Config.RENDERER_JOB_TIMEOUT} seconds")
+        
+        if result.returncode != 0:
+            logger.warning("Diagram script failed: %s", result.stderr)
+            raise Exception(f"Diagram generation failed: {result.stderr}")
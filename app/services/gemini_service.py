@@ -1,105 +1,301 @@
-import google.generativeai as genai
-import os
+import json
+import logging
+import time
 from app.config import Config
+from app.services.diagram_model import (
+    NODE_ICONS, DiagramParseError, DiagramTooLarge, apply_patch, parse_diagram_code
+)
+from app.services.llm_cache import get_llm_cache
+from app.services.llm_clients import create_model
+from app.services.metrics import DIAGRAM_EDITS_TOTAL, LLM_FALLBACKS_TOTAL
+from app.services.resilience import LLMCallError, ResilientModel, wrap_model
+from app.services.template_generator import TemplateDiagramGenerator
+
+logger = logging.getLogger(__name__)
+
+# Sent once as the model's system instruction rather than with every request
+SYSTEM_INSTRUCTION = """You write Python code for the `diagrams` package. Reply with ONLY the code, following this exact structure:
+
+from diagrams import Diagram, Cluster
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.aws.network import ELB, VPC
+from diagrams.aws.network import PrivateSubnet, PublicSubnet
+
+def generate_diagram():
+    with Diagram("AWS Architecture", direction="LR"):
+        with Cluster("VPC"):
+            with Cluster("Public Subnet"):
+                lb = ELB("Load Balancer")
+            with Cluster("Private Subnet"):
+                web = [EC2("Web Server 1"), EC2("Web Server 2")]
+            with Cluster("Database Subnet"):
+                db = RDS("Database")
+            lb >> web >> db
+
+if __name__ == "__main__":
+    generate_diagram()
+
+Rules: keep the imports and structure; group components with Cluster; give components meaningful names; connect them with >>. Change only the components, names and connections to match the request."""
+
+EDIT_INSTRUCTION = f"""You edit architecture diagrams. You get the current diagram as JSON (clusters: [id, label, parent], nodes: [id, kind, label, cluster], edges: [source, target, dir, attrs]) and a change request. Reply with ONLY a JSON list of operations, each one of:
+
+{{"op": "add_node", "id": "<new id>", "kind": "<kind>", "label": "<label>", "cluster": "<cluster id or null>"}}
+{{"op": "update_node", "id": "<node id>", "label": "<label>", "kind": "<kind>", "cluster": "<cluster id>"}}
+{{"op": "remove_node", "id": "<node id>"}}
+{{"op": "add_edge", "source": "<node id>", "target": "<node id>", "label": "<optional label>"}}
+{{"op": "remove_edge", "source": "<node id>", "target": "<node id>"}}
+{{"op": "add_cluster", "id": "<new id>", "label": "<label>", "parent": "<cluster id or null>"}}
+
+Node kinds: {', '.join(NODE_ICONS)}. Ids of new nodes and clusters can be used by later operations. Change only what the request asks for."""
+
 
 class GeminiService:
-    def __init__(self):
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
+    def __init__(self, model=None, cache=None, fast_path=None, edit_model=None):
+        self.model, self._prefix = self._client(model, SYSTEM_INSTRUCTION)
+        if edit_model is None and (model is not None or not Config.GEMINI_SYSTEM_INSTRUCTION):
+            # The instructions go in the prompt, so edits share the client and its circuit breaker
+            self.edit_model, self._edit_prefix = self.model, f"{EDIT_INSTRUCTION}\n\n"
+        else:
+            # A client holding the generation instructions cannot follow the edit ones
+            self.edit_model, self._edit_prefix = self._client(edit_model, EDIT_INSTRUCTION)
+        self.cache = cache if cache is not None else get_llm_cache()
+        if fast_path is None and Config.FAST_PATH_ENABLED:
+            fast_path = TemplateDiagramGenerator()
+        self.fast_path = fast_path
 
-    def generate_diagram_code(self, prompt):
-        system_prompt = """
-        You are a Python code generator for architecture diagrams. Generate code using the 'diagrams' package.
-        
-        Follow this EXACT template and replace the placeholder content:
-
-        from diagrams import Diagram, Cluster
-        from diagrams.aws.compute import EC2
-        from diagrams.aws.database import RDS
-        from diagrams.aws.network import ELB, VPC
-        from diagrams.aws.network import PrivateSubnet, PublicSubnet
-
-        def generate_diagram():
-            with Diagram("AWS Architecture", direction="LR"):
-                with Cluster("VPC"):
-                    with Cluster("Public Subnet"):
-                        lb = ELB("Load Balancer")
-                    
-                    with Cluster("Private Subnet"):
-                        web = [
-                            EC2("Web Server 1"),
-                            EC2("Web Server 2")
-                        ]
-                    
-                    with Cluster("Database Subnet"):
-                        db = RDS("Database")
-                    
-                    # Connect components
-                    lb >> web >> db
-
-        if __name__ == "__main__":
-            generate_diagram()
-
-        IMPORTANT RULES:
-        1. Always include ONLY the necessary imports shown above
-        2. Always wrap diagram creation in a function called generate_diagram()
-        3. Always use Cluster for grouping related components
-        4. Always use meaningful names for components
-        5. Always connect components using >>
-        6. Always include the if __name__ == "__main__" block
-        7. Return ONLY the Python code, no explanations
+    @staticmethod
+    def _client(model, instruction):
+        """Return ``(client, prompt prefix)`` for a model that follows ``instruction``.
+
+        Any object with a ``generate_content(prompt)`` method can stand in for Gemini;
+        it is wrapped with timeouts, retries and a circuit breaker unless it already is.
+        The prefix is built once, and is empty when the model holds the instruction.
         """
+        if model is None and Config.GEMINI_SYSTEM_INSTRUCTION:
+            model, prefix = create_model(system_instruction=instruction), ''
+        else:
+            # An injected client never saw the instructions
+            model, prefix = model if model is not None else create_model(), f"{instruction}\n\n"
+        return (model if isinstance(model, ResilientModel) else wrap_model(model)), prefix
 
-        example_prompt = """
-        Here's an example prompt and how to modify the template:
+    def _local_code(self, prompt):
+        """Code that can be produced without calling the model, or None."""
+        # Prompts that only combine the stock components never need the LLM
+        if self.fast_path:
+            code = self.fast_path.try_generate(prompt)
+            if code is not None:
+                return code
+
+        if self.cache:
+            return self.cache.get(prompt)
+        return None
+
+    def _build_prompt(self, prompt):
+        return f"{self._prefix}Request: {prompt}"
+
+    @staticmethod
+    def _extract_code(text):
+        """Strip markdown fences from a model reply; None if it is not a valid diagram script."""
+        code = text.strip()
         
-        Prompt: "Create AWS architecture with ALB, 2 EC2 instances, and RDS"
+        # Clean up the code if it's wrapped in markdown
+        if "```python" in code:
+            code = code.split("```python")[1].split("```")[0].strip()
+        elif "```" in code:
+            code = code.split("```")[1].strip()
         
-        Modifications needed:
-        1. Keep the imports exactly as shown
-        2. Update component names to match the prompt
-        3. Update the connections to reflect the architecture
-        4. Keep the basic structure intact
+        # Validate the code structure
+        required_elements = [
+            "from diagrams import Diagram",
+            "def generate_diagram():",
+            'with Diagram(',
+            'if __name__ == "__main__":'
+        ]
+        
+        for element in required_elements:
+            if element not in code:
+                return None
+        return code
+
+    def generate_diagram_code(self, prompt):
+        code = self._local_code(prompt)
+        if code is not None:
+            return code
+
+        try:
+            started = time.perf_counter()
+            response = self.model.generate_content(self._build_prompt(prompt))
+            if self.fast_path:
+                self.fast_path.record_llm_latency(time.perf_counter() - started)
+            code = self._extract_code(response.text)
+        except Exception as e:
+            return self._fallback(prompt, e)
+
+        if code is None:
+            # If validation fails, return a default template with the user's components
+            return self._fallback(prompt)
+
+        if self.cache:
+            self.cache.put(prompt, code)
+        return code
+
+    async def generate_diagram_code_async(self, prompt, run_sync):
+        """``generate_diagram_code`` for the event loop: the model call is awaited.
+
+        ``run_sync(func, *args)`` must run blocking helpers (the cache's database
+        tier) on a worker thread inside an app context and return an awaitable.
         """
+        code = await run_sync(self._local_code, prompt)
+        if code is not None:
+            return code
+
+        try:
+            started = time.perf_counter()
+            response = await self.model.generate_content_async(self._build_prompt(prompt))
+            if self.fast_path:
+                self.fast_path.record_llm_latency(time.perf_counter() - started)
+            code = self._extract_code(response.text)
+        except Exception as e:
+            return self._fallback(prompt, e)
+
+        if code is None:
+            return self._fallback(prompt)
 
-        full_prompt = f"""
-        # {system_prompt}
+        if self.cache:
+            await run_sync(self.cache.put, prompt, code)
+        return code
 
-        # {example_prompt}
+    def stream_diagram_code(self, prompt):
+        """Generate code with a streaming model call.
 
-        # Now, generate a diagram based on this prompt: {prompt}
-        # Modify ONLY the components, names, and connections while keeping the exact same structure.
-        # Return ONLY the Python code.
+        Yields ``('token', text)`` for each chunk as it arrives, ``('code_ready', code)``
+        as soon as the fenced code block closes (so rendering can start early), and
+        always ends with ``('code', code)`` carrying the final validated code.
         """
+        code = self._local_code(prompt)
+        if code is not None:
+            yield 'code', code
+            return
 
+        text = ''
+        early_code = None
         try:
-            response = self.model.generate_content(full_prompt)
-            code = response.text.strip()
-            
-            # Clean up the code if it's wrapped in markdown
-            if "```python" in code:
-                code = code.split("```python")[1].split("```")[0].strip()
-            elif "```" in code:
-                code = code.split("```")[1].strip()
-            
-            # Validate the code structure
-            required_elements = [
-                "from diagrams import Diagram",
-                "def generate_diagram():",
-                'with Diagram(',
-                'if __name__ == "__main__":'
-            ]
-            
-            for element in required_elements:
-                if element not in code:
-                    # If validation fails, return a default template with the user's components
-                    return self._generate_default_template(prompt)
-            
-            return code
-            
+            started = time.perf_counter()
+            for chunk in self.model.generate_content(self._build_prompt(prompt), stream=True):
+                chunk_text = chunk.text
+                text += chunk_text
+                yield 'token', chunk_text
+
+                if early_code is None and text.count("```") >= 2:
+                    early_code = self._extract_code(text)
+                    if early_code is not None:
+                        yield 'code_ready', early_code
+            if self.fast_path:
+                self.fast_path.record_llm_latency(time.perf_counter() - started)
+            code = self._extract_code(text)
         except Exception as e:
-            # If there's any error, fall back to the default template
-            return self._generate_default_template(prompt)
+            yield 'code', self._fallback(prompt, e)
+            return
+
+        if code is None:
+            yield 'code', self._fallback(prompt)
+            return
+
+        if self.cache:
+            self.cache.put(prompt, code)
+        yield 'code', code
+
+    @staticmethod
+    def _extract_patch(text):
+        """Edit operations from a model reply; raises ValueError if it is not a JSON list."""
+        text = text.strip()
+        if "```" in text:
+            text = text.split("```")[1]
+            text = text[len('json'):] if text.startswith('json') else text
+        operations = json.loads(text)
+        if isinstance(operations, dict):
+            operations = operations.get('operations')
+        if not isinstance(operations, list):
+            raise ValueError("Model reply is not a list of operations")
+        return operations
+
+    def edit_diagram_code(self, code, instruction, original_prompt=None):
+        """Apply ``instruction`` to existing diagram ``code`` and return the new code.
+
+        The code is parsed into a DiagramModel and the model is only asked for a
+        small JSON patch, which is applied to the parsed graph and turned back into
+        code. Code outside the parser's subset, or a patch that does not apply, is
+        regenerated in full from ``original_prompt`` plus the instruction instead.
+        Model outages are raised rather than answered with the default template,
+        which would throw the diagram away.
+        """
+        try:
+            model = parse_diagram_code(code, Config.RENDER_MAX_NODES, Config.RENDER_MAX_EDGES)
+        except (DiagramParseError, DiagramTooLarge) as e:
+            logger.info("Diagram cannot be patched, regenerating it: %s", e)
+            model = None
+
+        if model is not None:
+            graph = json.dumps(model.to_dict(), separators=(',', ':'))
+            response = self.edit_model.generate_content(
+                f"{self._edit_prefix}Current diagram: {graph}\nRequest: {instruction}")
+            try:
+                edited = apply_patch(model, self._extract_patch(response.text))
+            except (ValueError, TypeError, KeyError) as e:
+                # Malformed JSON or ids that slip past apply_patch's checks
+                logger.info("Unusable patch, regenerating the diagram: %s", e)
+            else:
+                DIAGRAM_EDITS_TOTAL.inc(mode='patch')
+                return edited.to_code()
+
+        DIAGRAM_EDITS_TOTAL.inc(mode='regenerate')
+        prompt = f"{original_prompt}\nThen change it: {instruction}" if original_prompt else instruction
+        return self._regenerate(prompt)
+
+    def _regenerate(self, prompt):
+        """Full model call for an edit; unlike ``generate_diagram_code`` it never falls back to the template."""
+        try:
+            response = self.model.generate_content(self._build_prompt(prompt))
+        except LLMCallError:
+            raise
+        except Exception as e:
+            raise LLMCallError(f"Model call failed: {e}")
+        code = self._extract_code(response.text)
+        if code is None:
+            raise LLMCallError("Model returned no usable diagram code", 'invalid_output')
+        return code
+
+    def _fallback(self, prompt, error=None):
+        """Default template for a failed or unusable model call, unless fallback is disabled.
+
+        With ``Config.GEMINI_FALLBACK_TO_TEMPLATE`` off the failure is raised as an
+        LLMCallError instead, so callers see the outage rather than a stock diagram.
+        """
+        if error is None:
+            error = LLMCallError("Model returned no usable diagram code", 'invalid_output')
+        elif not isinstance(error, LLMCallError):
+            error = LLMCallError(f"Model call failed: {error}")
+        LLM_FALLBACKS_TOTAL.inc(reason=error.outcome)
+
+        if not Config.GEMINI_FALLBACK_TO_TEMPLATE:
+            raise error
+        logger.warning("Returning the default template: %s", error)
+        return self._generate_default_template(prompt)
+
+    def discard_code(self, prompt):
+        """Forget the cached code for ``prompt``; the pipeline calls this when that code fails to render."""
+        if self.cache:
+            self.cache.discard(prompt)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else None
+
+    def fast_path_stats(self):
+        return self.fast_path.stats() if self.fast_path else None
+
+    def resilience_stats(self):
+        return self.model.stats()
 
     def _generate_default_template(self, prompt):
         """Generate a safe default template if the AI generation fails."""
@@ -0,0 +1,151 @@
+import importlib.util
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+from app.config import Config
+from app.models.diagram import DiagramRequest
+from app.services.artifact_store import get_artifact_store
+from app.services.metrics import IMAGE_BYTES_SAVED_TOTAL, timed
+
+logger = logging.getLogger(__name__)
+
+
+def optimize_png(data, quantize=False):
+    """Recompress a PNG losslessly, or to a 256 colour palette with ``quantize``.
+
+    Returns the original bytes when recompressing does not make them smaller.
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    if quantize:
+        # Diagrams are flat colours and icons, so a palette is rarely visible
+        image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    output = io.BytesIO()
+    image.save(output, 'PNG', optimize=True)
+    optimized = output.getvalue()
+    return optimized if len(optimized) < len(data) else data
+
+
+def make_thumbnail(data, size, fmt='webp'):
+    """Scale a PNG down to fit in ``size`` x ``size`` pixels and encode it as ``fmt``."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    if fmt == 'webp':
+        image.save(output, 'WEBP', quality=80, method=4)
+    else:
+        image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+class ImagePostProcessor:
+    """Optimizes rendered PNGs and precomputes thumbnails on background threads.
+
+    ``submit`` is called once a diagram row is completed; the job recompresses
+    the stored PNG (repointing the row at the smaller artifact) and stores a
+    thumbnail next to it. Other formats only get a thumbnail, drawn from a PNG
+    of the cached layout.
+    """
+
+    def __init__(self, workers=2, optimize=True, quantize=False, thumbnail_size=320, thumbnail_format='webp'):
+        self.optimize = optimize
+        self.quantize = quantize
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_format = thumbnail_format
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-postprocess')
+        self._lock = threading.Lock()
+        self._stats = {'jobs': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+
+    def submit(self, app, diagram_id):
+        self._executor.submit(self._run, app, diagram_id)
+
+    def _run(self, app, diagram_id):
+        with app.app_context():
+            try:
+                self.process(diagram_id)
+            except Exception:
+                with self._lock:
+                    self._stats['failed'] += 1
+                logger.exception("Post-processing diagram %s failed", diagram_id)
+
+    def process(self, diagram_id):
+        """Optimize and thumbnail one completed diagram; needs an app context."""
+        from app.services.diagram_service import DiagramService
+
+        started = time.perf_counter()
+        diagram_request = db.session.get(DiagramRequest, diagram_id)
+        # Mermaid text is drawn by the client; a thumbnail would need a server render
+        if diagram_request is None or not diagram_request.image_sha256 or diagram_request.image_format == 'mmd':
+            return
+        image_sha256 = diagram_request.image_sha256
+        store = get_artifact_store()
+        data = store.read(image_sha256, diagram_request.image_format)
+        # Release the connection while Pillow works
+        db.session.commit()
+
+        if diagram_request.image_format == 'png':
+            png = data
+            if self.optimize:
+                with timed('optimize_png'):
+                    png = optimize_png(data, self.quantize)
+        else:
+            with timed('thumbnail_source'):
+                png = DiagramService.render_diagram(diagram_request.diagram_code, diagram_id, 'png')
+
+        with timed('thumbnail'):
+            thumbnail = make_thumbnail(png, self.thumbnail_size, self.thumbnail_format)
+        thumbnail_sha256 = store.put(thumbnail, self.thumbnail_format)
+
+        updates = {'thumbnail_sha256': thumbnail_sha256, 'thumbnail_format': self.thumbnail_format}
+        saved = 0
+        if diagram_request.image_format == 'png' and png is not data:
+            updates['image_sha256'] = store.put(png, 'png')
+            saved = len(data) - len(png)
+        # Skip the update if the row was re-rendered in the meantime
+        DiagramRequest.query.filter_by(id=diagram_id, image_sha256=image_sha256).update(updates)
+        db.session.commit()
+
+        IMAGE_BYTES_SAVED_TOTAL.inc(saved)
+        with self._lock:
+            self._stats['jobs'] += 1
+            if diagram_request.image_format == 'png':
+                self._stats['bytes_in'] += len(data)
+                self._stats['bytes_out'] += len(data) - saved
+            self._stats['seconds'] += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+        stats['avg_seconds'] = stats['seconds'] / stats['jobs'] if stats['jobs'] else None
+        return stats
+
+
+_postprocessor = None
+_postprocessor_lock = threading.Lock()
+
+
+def get_image_postprocessor():
+    """Return the process-wide post-processor, or None when it is disabled."""
+    global _postprocessor
+    if not Config.IMAGE_POSTPROCESS_ENABLED:
+        return None
+    with _postprocessor_lock:
+        if _postprocessor is None and importlib.util.find_spec('PIL') is None:
+            logger.warning("Pillow is not installed; images are stored as rendered, without thumbnails")
+            _postprocessor = False
+        if _postprocessor is None:
+            _postprocessor = ImagePostProcessor(
+                workers=Config.IMAGE_POSTPROCESS_WORKERS,
+                optimize=Config.PNG_OPTIMIZE,
+                quantize=Config.PNG_QUANTIZE,
+                thumbnail_size=Config.THUMBNAIL_SIZE,
+                thumbnail_format=Config.THUMBNAIL_FORMAT
+            )
+        return _postprocessor or None
@@ -0,0 +1,84 @@
+import queue
+import threading
+from app import db
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """Bounded background queue that runs diagram jobs on a fixed set of worker threads.
+
+    ``handler(job_id)`` is called inside an app context; results are persisted by
+    the handler, the queue only tracks completion so long-polls can wake up.
+    """
+
+    def __init__(self, app, handler, workers=4, max_depth=100):
+        self.app = app
+        self.handler = handler
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._events = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._stats = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f"diagram-job-{i}", daemon=True)
+            thread.start()
+
+    def submit(self, job_id):
+        """Queue ``job_id``; raises JobQueueFull when the queue is at capacity."""
+        with self._lock:
+            self._events[job_id] = threading.Event()
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                self._events.pop(job_id, None)
+                self._stats['rejected'] += 1
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} pending jobs)")
+        with self._lock:
+            self._stats['submitted'] += 1
+
+    def wait(self, job_id, timeout):
+        """Block until ``job_id`` finishes; returns None if this process is not tracking it."""
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is None:
+            return None
+        return event.wait(timeout)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                self._active += 1
+            outcome = 'completed'
+            try:
+                with self.app.app_context():
+                    try:
+                        self.handler(job_id)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                outcome = 'failed'
+                self.app.logger.warning(f"Diagram job {job_id} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._stats[outcome] += 1
+                    event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = self._active
+        stats['queued'] = self._queue.qsize()
+        stats['max_depth'] = self._queue.maxsize
+        stats['workers'] = self.workers
+        return stats
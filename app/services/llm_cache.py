@@ -0,0 +1,163 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import has_app_context
+from app import db
+from app.config import Config
+from app.models.llm_response import LLMResponse
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt):
+    """Fold case, punctuation and whitespace so trivially different prompts share a key."""
+    prompt = _PUNCTUATION.sub(' ', prompt.lower())
+    return _WHITESPACE.sub(' ', prompt).strip()
+
+
+def prompt_key(prompt):
+    return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Cache of generated diagram code keyed on the normalized prompt.
+
+    A bounded in-memory LRU sits in front of the ``llm_response`` table; both
+    tiers expire entries after ``ttl_seconds``. The database tier is only used
+    inside an app context and is trimmed to ``db_max_rows`` oldest-first.
+    """
+
+    def __init__(self, memory_items=256, ttl_seconds=7 * 24 * 3600, db_max_rows=10000):
+        self.memory_items = memory_items
+        self.ttl_seconds = ttl_seconds
+        self.db_max_rows = db_max_rows
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+    def _remember(self, key, response, stored_at):
+        self._memory[key] = (response, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, prompt):
+        key = prompt_key(prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, stored_at = entry
+                if now - stored_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return response
+                del self._memory[key]
+
+        if has_app_context():
+            table = LLMResponse.__table__
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            with db.engine.connect() as conn:
+                row = conn.execute(
+                    db.select(table.c.response, table.c.created_at)
+                    .where(table.c.prompt_key == key, table.c.created_at >= cutoff)
+                ).first()
+            if row is not None:
+                age = (datetime.utcnow() - row.created_at).total_seconds()
+                with self._lock:
+                    self._stats['db_hits'] += 1
+                    self._remember(key, row.response, now - age)
+                return row.response
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, prompt, response):
+        key = prompt_key(prompt)
+        with self._lock:
+            self._stats['stores'] += 1
+            self._remember(key, response, time.time())
+
+        if not has_app_context():
+            return
+
+        # Use our own connection so the caller's session transaction is left alone
+        table = LLMResponse.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.prompt_key == key))
+            conn.execute(table.insert().values(
+                prompt_key=key,
+                prompt=prompt,
+                response=response,
+                created_at=datetime.utcnow()
+            ))
+            self._trim(conn)
+
+    def discard(self, prompt):
+        """Drop the entry for ``prompt`` from both tiers, e.g. when its code would not render."""
+        key = prompt_key(prompt)
+        with self._lock:
+            self._memory.pop(key, None)
+
+        if has_app_context():
+            table = LLMResponse.__table__
+            with db.engine.begin() as conn:
+                conn.execute(table.delete().where(table.c.prompt_key == key))
+
+    def _trim(self, conn):
+        table = LLMResponse.__table__
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        evicted = conn.execute(table.delete().where(table.c.created_at < cutoff)).rowcount
+
+        count = conn.execute(db.select(db.func.count()).select_from(table)).scalar()
+        if count > self.db_max_rows:
+            oldest = (
+                db.select(table.c.prompt_key)
+                .order_by(table.c.created_at)
+                .limit(count - self.db_max_rows)
+            )
+            evicted += conn.execute(
+                table.delete().where(table.c.prompt_key.in_(oldest.scalar_subquery()))
+            ).rowcount
+
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_items'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache, or None when caching is disabled."""
+    global _cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                memory_items=Config.LLM_CACHE_MEMORY_ITEMS,
+                ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+                db_max_rows=Config.LLM_CACHE_DB_MAX_ROWS
+            )
+        return _cache
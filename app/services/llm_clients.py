@@ -0,0 +1,137 @@
+import asyncio
+import importlib
+import random
+import time
+from app.config import Config
+
+FAKE_DIAGRAM_CODE = """
+from diagrams import Diagram, Cluster
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.aws.network import ELB, VPC
+from diagrams.aws.network import PrivateSubnet, PublicSubnet
+
+def generate_diagram():
+    with Diagram("AWS Architecture", direction="LR"):
+        with Cluster("VPC"):
+            with Cluster("Public Subnet"):
+                lb = ELB("Load Balancer")
+
+            with Cluster("Private Subnet"):
+                web = [
+                    EC2("App Server 1"),
+                    EC2("App Server 2")
+                ]
+
+            with Cluster("Database Subnet"):
+                db = RDS("Primary Database")
+
+            lb >> web >> db
+
+if __name__ == "__main__":
+    generate_diagram()
+""".strip()
+
+
+# Patch the fake model answers edit requests with: a cache between the app servers and the database
+FAKE_EDIT_PATCH = """
+[
+  {"op": "add_node", "id": "cache", "kind": "ElastiCache", "label": "Redis Cache", "cluster": "Database Subnet"},
+  {"op": "remove_edge", "source": "n1", "target": "n3"},
+  {"op": "remove_edge", "source": "n2", "target": "n3"},
+  {"op": "add_edge", "source": "n1", "target": "cache"},
+  {"op": "add_edge", "source": "n2", "target": "cache"},
+  {"op": "add_edge", "source": "cache", "target": "n3"}
+]
+""".strip()
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for ``genai.GenerativeModel`` that answers with canned diagram code.
+
+    With ``stream=True`` the reply is returned as ``chunk_size`` character chunks,
+    with ``latency`` spread evenly across them like tokens arriving over the network.
+    To exercise retries and timeouts, a fraction ``error_rate`` of calls raise and
+    a fraction ``slow_rate`` take ``slow_latency`` seconds instead. Edit requests
+    (prompts with a "Current diagram:" section) are answered with ``edit_text``.
+    """
+
+    def __init__(self, text=None, latency=0.0, chunk_size=24, error_rate=0.0, slow_rate=0.0, slow_latency=10.0,
+                 system_instruction=None, edit_text=None):
+        self.text = text or f"```python\n{FAKE_DIAGRAM_CODE}\n```\nThis diagram shows a load balanced web tier."
+        self.edit_text = edit_text or f"```json\n{FAKE_EDIT_PATCH}\n```"
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.system_instruction = system_instruction
+        self.calls = 0
+
+    def _next_latency(self):
+        """Count the call, raise if it is chosen to fail, and return how long it should take."""
+        self.calls += 1
+        if self.error_rate and random.random() < self.error_rate:
+            raise Exception("Injected model error")
+        if self.slow_rate and random.random() < self.slow_rate:
+            return self.slow_latency
+        return self.latency
+
+    def _reply(self, prompt):
+        return self.edit_text if 'Current diagram:' in prompt else self.text
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        latency = self._next_latency()
+        if stream:
+            return self._stream(latency)
+        if latency:
+            time.sleep(latency)
+        return FakeResponse(self._reply(prompt))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        latency = self._next_latency()
+        if latency:
+            await asyncio.sleep(latency)
+        return FakeResponse(self._reply(prompt))
+
+    def _stream(self, latency):
+        chunks = [self.text[i:i + self.chunk_size] for i in range(0, len(self.text), self.chunk_size)]
+        for chunk in chunks:
+            if latency:
+                time.sleep(latency / len(chunks))
+            yield FakeResponse(chunk)
+
+
+def create_model(backend=None, system_instruction=None):
+    """Build the LLM client selected by ``Config.LLM_BACKEND``.
+
+    ``'gemini'`` and ``'fake'`` are built in; ``'package.module:factory'`` calls
+    ``factory(system_instruction=...)`` to build any other client with a
+    ``generate_content`` method. The system instruction is given to the client
+    once, so it does not have to be repeated in every prompt.
+    """
+    backend = backend or Config.LLM_BACKEND
+    if backend == 'fake':
+        return FakeGenerativeModel(
+            latency=Config.FAKE_LLM_LATENCY,
+            error_rate=Config.FAKE_LLM_ERROR_RATE,
+            slow_rate=Config.FAKE_LLM_SLOW_RATE,
+            slow_latency=Config.FAKE_LLM_SLOW_LATENCY,
+            system_instruction=system_instruction
+        )
+    if ':' in backend:
+        module_name, factory = backend.split(':', 1)
+        return getattr(importlib.import_module(module_name), factory)(system_instruction=system_instruction)
+    if backend != 'gemini':
+        raise ValueError(f"Unknown LLM backend: {backend}")
+
+    # Imported here: the SDK takes most of a second to import, and offline backends never need it
+    import google.generativeai as genai
+
+    genai.configure(api_key=Config.GEMINI_API_KEY)
+    return genai.GenerativeModel(Config.GEMINI_MODEL, system_instruction=system_instruction)
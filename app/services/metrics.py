@@ -0,0 +1,326 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, has_request_context, request
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def expose(self, values=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted((self.snapshot() if values is None else values).items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {'counts': list(series['counts']), 'sum': series['sum'], 'count': series['count']}
+                    for key, series in self._values.items()}
+
+    @staticmethod
+    def merge(values, other):
+        for key, series in other.items():
+            merged = values.get(key)
+            if merged is None:
+                values[key] = {'counts': list(series['counts']), 'sum': series['sum'], 'count': series['count']}
+                continue
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], series['counts'])]
+            merged['sum'] += series['sum']
+            merged['count'] += series['count']
+
+    def expose(self, values=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted((self.snapshot() if values is None else values).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, {'le': _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics in the Prometheus text exposition format.
+
+    Counters and histograms are updated inline; collectors are callables polled
+    at scrape time that return ``(name, type, help, [(labels, value), ...])``
+    tuples for values other components already keep (cache statistics etc.).
+
+    Values live in process memory. Under a pre-forking server, :meth:`share`
+    makes each worker publish its values to a directory every few seconds, and
+    a scrape answered by any worker adds up the files of all the others, so
+    ``/metrics`` covers the whole server. Files of exited workers are kept, so
+    counters do not drop when a worker is recycled; their gauges are ignored.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._shared_dir = None
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def share(self, directory, interval=5.0):
+        """Publish this process's values to ``directory`` and merge the other processes' into scrapes."""
+        os.makedirs(directory, exist_ok=True)
+        self._shared_dir = directory
+        self.publish()
+        thread = threading.Thread(target=self._publish_every, args=(interval,), name='metrics-share', daemon=True)
+        thread.start()
+
+    def _publish_every(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.publish()
+            except OSError:
+                pass
+
+    def publish(self):
+        """Write this process's current values where the other workers read them."""
+        if self._shared_dir is None:
+            return
+        dump = self.dump()
+        payload = {
+            'metrics': {name: [[list(key), value] for key, value in values.items()]
+                        for name, values in dump['metrics'].items()},
+            'collected': dump['collected'],
+        }
+        path = os.path.join(self._shared_dir, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(payload, f)
+        os.replace(path + '.tmp', path)
+
+    def dump(self):
+        """This process's values: metric snapshots by name, and the collectors' families."""
+        collected = []
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                collected.append([name, kind, documentation,
+                                  [[labels, value] for labels, value in samples if value is not None]])
+        return {
+            'metrics': {metric.name: metric.snapshot() for metric in self._metrics},
+            'collected': collected,
+        }
+
+    def _peer_dumps(self):
+        """``(alive, dump)`` for every other process that has published to the shared directory."""
+        peers = []
+        own = f'{os.getpid()}.json'
+        try:
+            names = os.listdir(self._shared_dir)
+        except OSError:
+            return peers
+        for name in names:
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self._shared_dir, name)) as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            dump = {
+                'metrics': {metric: {tuple(key): value for key, value in values}
+                            for metric, values in payload['metrics'].items()},
+                'collected': payload['collected'],
+            }
+            peers.append((_process_alive(int(name[:-len('.json')])), dump))
+        return peers
+
+    def render(self):
+        dumps = [(True, self.dump())]
+        if self._shared_dir is not None:
+            dumps += self._peer_dumps()
+
+        lines = []
+        for metric in self._metrics:
+            values = {}
+            for _, dump in dumps:
+                metric.merge(values, dump['metrics'].get(metric.name, {}))
+            lines.extend(metric.expose(values))
+
+        families = {}
+        for alive, dump in dumps:
+            for name, kind, documentation, samples in dump['collected']:
+                if kind == 'gauge' and not alive:
+                    continue
+                family = families.setdefault(name, (kind, documentation, {}))[2]
+                for labels, value in samples:
+                    key = tuple(sorted(labels.items()))
+                    if key not in family:
+                        family[key] = value
+                    else:
+                        family[key] = max(family[key], value) if kind == 'gauge' else family[key] + value
+        for name, (kind, documentation, family) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in family.items():
+                lines.append(f"{name}{_format_labels([k for k, _ in key], [v for _, v in key])} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    'diagram_stage_seconds', 'Time spent in each stage of diagram generation.', ['stage'])
+REQUEST_SECONDS = metrics.histogram(
+    'diagram_http_request_seconds', 'HTTP request latency.', ['endpoint', 'method', 'status'])
+REQUESTS_TOTAL = metrics.counter(
+    'diagram_requests_total', 'Diagram requests by final status.', ['status'])
+LLM_FALLBACKS_TOTAL = metrics.counter(
+    'diagram_llm_fallback_total', 'Times the default template was returned instead of model output.', ['reason'])
+RENDER_FAILURES_TOTAL = metrics.counter(
+    'diagram_render_failures_total', 'Failed renders by renderer.', ['renderer'])
+LLM_CALLS_TOTAL = metrics.counter(
+    'diagram_llm_calls_total', 'Model call attempts by outcome.', ['outcome'])
+LLM_CALL_SECONDS = metrics.histogram(
+    'diagram_llm_call_seconds', 'Duration of model call attempts.', ['outcome'])
+LLM_RETRIES_TOTAL = metrics.counter(
+    'diagram_llm_retries_total', 'Model calls retried after a failed attempt.')
+LLM_HEDGES_TOTAL = metrics.counter(
+    'diagram_llm_hedges_total', 'Hedged model requests by result.', ['result'])
+DIAGRAM_EDITS_TOTAL = metrics.counter(
+    'diagram_edits_total', 'Diagram edits by how the new code was produced.', ['mode'])
+IMAGE_BYTES_SAVED_TOTAL = metrics.counter(
+    'diagram_image_bytes_saved_total', 'Bytes removed from stored PNGs by recompression.')
+RENDER_REJECTIONS_TOTAL = metrics.counter(
+    'diagram_render_rejections_total', 'Renders refused before running.', ['reason'])
+RENDER_DOWNGRADES_TOTAL = metrics.counter(
+    'diagram_render_downgrades_total', 'Large diagrams laid out with a cheaper engine.', ['engine'])
+SEARCH_REUSE_TOTAL = metrics.counter(
+    'diagram_search_reuse_total', 'Reuse lookups on generate, by whether an earlier diagram was returned.', ['result'])
+
+
+# Server-Timing spans for work done outside a Flask request context, e.g. the
+# model call awaited on the ASGI event loop; set by whoever serves the request
+server_timing_spans = ContextVar('server_timing_spans', default=None)
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of ``stage``, and add it to Server-Timing when inside a request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if has_request_context():
+            spans = g.setdefault('server_timing', [])
+        else:
+            spans = server_timing_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def init_app(app):
+    """Time every request and emit a Server-Timing header when it is asked for."""
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=request.endpoint or 'unknown',
+                method=request.method,
+                status=response.status_code
+            )
+
+        wanted = app.config['SERVER_TIMING_ENABLED'] or request.headers.get('X-Server-Timing') == '1'
+        spans = g.get('server_timing')
+        if wanted and spans:
+            response.headers['Server-Timing'] = ', '.join(
+                f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in spans
+            )
+        return response
@@ -0,0 +1,266 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from flask import current_app
+from app import db
+from app.models.diagram import DiagramRequest
+from app.services.artifact_store import get_artifact_store
+from app.services.diagram_model import DiagramParseError
+from app.services.image_processing import get_image_postprocessor
+from app.services.metrics import REQUESTS_TOTAL, timed
+from app.services.render_limits import RenderRejected
+from app.services.resilience import LLMCallError
+
+logger = logging.getLogger(__name__)
+
+
+def _blames_code(error):
+    """Whether a failed render means the code itself is bad; a 'busy' rejection does not."""
+    return not (isinstance(error, RenderRejected) and error.reason == 'busy')
+
+
+class DiagramPipeline:
+    """Runs a persisted DiagramRequest through code generation and rendering."""
+
+    def __init__(self, gemini_service, diagram_service):
+        self.gemini_service = gemini_service
+        self.diagram_service = diagram_service
+
+    def generate_code(self, prompt):
+        """Stage 1: turn a prompt into diagram code."""
+        try:
+            with timed('llm'):
+                return self.gemini_service.generate_diagram_code(prompt)
+        except LLMCallError:
+            raise
+        except Exception as e:
+            raise Exception(f"Code generation failed: {str(e)}")
+
+    def edit_code(self, parent, instruction):
+        """Stage 1 for an edit: change ``parent``'s diagram code as ``instruction`` asks."""
+        try:
+            with timed('llm'):
+                return self.gemini_service.edit_diagram_code(parent.diagram_code, instruction, parent.prompt)
+        except LLMCallError:
+            raise
+        except Exception as e:
+            raise Exception(f"Diagram edit failed: {str(e)}")
+
+    def render(self, diagram_code, diagram_id, image_format=None):
+        """Stage 2: render diagram code and store the image.
+
+        ``image_format`` defaults to the service's choice for the diagram (SVG for
+        large ones, PNG otherwise). Returns ``(image_sha256, image_format,
+        image_bytes)``. Neither stage touches the database, so both can run on
+        worker threads.
+        """
+        try:
+            image_format = image_format or self.diagram_service.default_format(diagram_code)
+            with timed('render'):
+                try:
+                    image_bytes = self.diagram_service.render_diagram(diagram_code, diagram_id, image_format)
+                except DiagramParseError as e:
+                    if image_format != 'mmd':
+                        raise
+                    # The model has already answered; draw the code on the server rather than fail
+                    logger.info("No Mermaid output for this code, rendering a PNG instead: %s", e)
+                    image_format = 'png'
+                    image_bytes = self.diagram_service.render_diagram(diagram_code, diagram_id, image_format)
+        except RenderRejected:
+            raise
+        except Exception as e:
+            raise Exception(f"Diagram rendering failed: {str(e)}")
+
+        with timed('store_image'):
+            image_sha256 = get_artifact_store().put(image_bytes, image_format)
+        return image_sha256, image_format, image_bytes
+
+    def render_generated(self, prompt, diagram_code, diagram_id, image_format=None):
+        """``render`` for code generated from ``prompt``.
+
+        Generated code is cached as soon as the model returns it, so code that
+        cannot be drawn is dropped from the LLM cache here rather than served to
+        the next identical prompt. A 'busy' rejection says nothing about the code
+        and leaves the cache alone.
+        """
+        try:
+            return self.render(diagram_code, diagram_id, image_format)
+        except Exception as e:
+            if _blames_code(e):
+                self.gemini_service.discard_code(prompt)
+            raise
+
+    def process(self, diagram_request, parent=None):
+        """Generate and render ``diagram_request``, recording the outcome on the row.
+
+        With ``parent`` the request is an edit: its prompt is an instruction applied
+        to the parent's diagram code. The image is rendered in the row's
+        ``image_format`` (or the default for the diagram when unset), written to the
+        artifact store and referenced from the row. Returns ``(diagram_code,
+        image_bytes)``; on failure the request is marked failed and the exception
+        is re-raised.
+        """
+        # End the transaction so no pooled connection or SQLite lock is held
+        # across the slow stages; the row's values stay loaded after commit
+        db.session.commit()
+        try:
+            if parent is not None:
+                diagram_code = self.edit_code(parent, diagram_request.prompt)
+                image_sha256, image_format, image_bytes = self.render(
+                    diagram_code, diagram_request.id, diagram_request.image_format)
+            else:
+                diagram_code = self.generate_code(diagram_request.prompt)
+                image_sha256, image_format, image_bytes = self.render_generated(
+                    diagram_request.prompt, diagram_code, diagram_request.id, diagram_request.image_format)
+
+            # Update the diagram request
+            diagram_request.diagram_code = diagram_code
+            diagram_request.image_sha256 = image_sha256
+            diagram_request.image_format = image_format
+            diagram_request.status = 'completed'
+            with timed('db_commit'):
+                db.session.commit()
+            REQUESTS_TOTAL.inc(status='completed')
+            self.postprocess(diagram_request.id)
+
+            return diagram_code, image_bytes
+
+        except Exception as e:
+            db.session.rollback()
+            diagram_request.status = 'failed'
+            diagram_request.error_message = str(e)
+            db.session.commit()
+            REQUESTS_TOTAL.inc(status='failed')
+            raise
+
+    async def process_async(self, diagram_id, prompt, run_sync, render_executor, image_format=None):
+        """``process`` for the ASGI server.
+
+        The model call is awaited on the event loop, so a slow LLM holds no thread
+        while it answers. Rendering runs on ``render_executor``, and database work
+        goes through ``run_sync``, which runs a callable in an app context on a
+        worker thread. Returns the image bytes; failures are recorded on the row
+        and re-raised.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                with timed('llm'):
+                    diagram_code = await self.gemini_service.generate_diagram_code_async(prompt, run_sync)
+            except LLMCallError:
+                raise
+            except Exception as e:
+                raise Exception(f"Code generation failed: {str(e)}")
+
+            # run_in_executor does not carry context variables over, so copy them for the render's timings
+            try:
+                image_sha256, image_format, image_bytes = await loop.run_in_executor(render_executor, partial(
+                    contextvars.copy_context().run, self.render, diagram_code, diagram_id, image_format))
+            except Exception as e:
+                if _blames_code(e):
+                    await run_sync(self.gemini_service.discard_code, prompt)
+                raise
+            await run_sync(self._mark_completed, diagram_id, diagram_code, image_sha256, image_format)
+            await run_sync(self.postprocess, diagram_id)
+            return image_bytes
+
+        except Exception as e:
+            await run_sync(self._mark_failed, diagram_id, str(e))
+            raise
+
+    @staticmethod
+    def postprocess(diagram_id):
+        """Queue PNG optimization and the thumbnail for a completed row, off the request thread."""
+        postprocessor = get_image_postprocessor()
+        if postprocessor:
+            postprocessor.submit(current_app._get_current_object(), diagram_id)
+
+    @staticmethod
+    def _mark_completed(diagram_id, diagram_code, image_sha256, image_format):
+        diagram_request = db.session.get(DiagramRequest, diagram_id)
+        diagram_request.diagram_code = diagram_code
+        diagram_request.image_sha256 = image_sha256
+        diagram_request.image_format = image_format
+        diagram_request.status = 'completed'
+        with timed('db_commit'):
+            db.session.commit()
+        REQUESTS_TOTAL.inc(status='completed')
+
+    @staticmethod
+    def _mark_failed(diagram_id, error_message):
+        db.session.rollback()
+        diagram_request = db.session.get(DiagramRequest, diagram_id)
+        diagram_request.status = 'failed'
+        diagram_request.error_message = error_message
+        db.session.commit()
+        REQUESTS_TOTAL.inc(status='failed')
+
+    def process_stream(self, diagram_request):
+        """Like ``process`` but yields ``(event, data)`` progress events as each stage runs.
+
+        Rendering starts on a helper thread as soon as the model closes its code
+        block, while the rest of the reply is still streaming in. If the consumer
+        stops early (the client disconnected) the request is marked failed.
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream-render')
+        render_future = None
+        render_code = None
+        requested_format = diagram_request.image_format
+        db.session.commit()
+        code_events = self.gemini_service.stream_diagram_code(diagram_request.prompt)
+        try:
+            yield 'persisted', {'id': diagram_request.id, 'status': diagram_request.status}
+            diagram_code = None
+            for event, value in code_events:
+                if event == 'token':
+                    yield 'token', {'text': value}
+                elif event == 'code_ready':
+                    render_code = value
+                    render_future = executor.submit(self.render, value, diagram_request.id, requested_format)
+                    yield 'render_started', {'early': True}
+                else:
+                    diagram_code = value
+
+            yield 'validated', {'diagram_code': diagram_code}
+
+            # The early render is only usable if the final code is what we started from
+            if render_future is None or render_code != diagram_code:
+                yield 'render_started', {'early': False}
+                render_future = executor.submit(self.render, diagram_code, diagram_request.id, requested_format)
+            try:
+                image_sha256, image_format, _ = render_future.result()
+            except Exception as e:
+                if _blames_code(e):
+                    self.gemini_service.discard_code(diagram_request.prompt)
+                raise
+
+            diagram_request.diagram_code = diagram_code
+            diagram_request.image_sha256 = image_sha256
+            diagram_request.image_format = image_format
+            diagram_request.status = 'completed'
+            db.session.commit()
+            REQUESTS_TOTAL.inc(status='completed')
+            self.postprocess(diagram_request.id)
+
+        except Exception as e:
+            db.session.rollback()
+            diagram_request.status = 'failed'
+            diagram_request.error_message = str(e)
+            db.session.commit()
+            REQUESTS_TOTAL.inc(status='failed')
+            yield 'error', {'error': str(e), 'status': 'failed'}
+        except GeneratorExit:
+            # Closed mid-stream; without this the row would stay 'processing' forever
+            if render_future is not None:
+                render_future.cancel()
+            db.session.rollback()
+            diagram_request.status = 'failed'
+            diagram_request.error_message = 'Stream closed before the diagram was finished'
+            db.session.commit()
+            REQUESTS_TOTAL.inc(status='failed')
+            raise
+        finally:
+            code_events.close()
+            executor.shutdown(wait=False)
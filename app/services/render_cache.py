@@ -0,0 +1,175 @@
+import hashlib
+import io
+import os
+import threading
+import tokenize
+from collections import OrderedDict
+from app.config import Config
+
+
+def normalize_diagram_content(content):
+    """Canonical form of diagram code: comments, blank lines and spacing are dropped."""
+    try:
+        parts = []
+        for tok in tokenize.generate_tokens(io.StringIO(content).readline):
+            if tok.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENDMARKER):
+                continue
+            if tok.type == tokenize.INDENT:
+                parts.append('<indent>')
+            elif tok.type == tokenize.DEDENT:
+                parts.append('<dedent>')
+            elif tok.type == tokenize.NEWLINE:
+                parts.append('\n')
+            else:
+                parts.append(tok.string)
+        return ' '.join(parts)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Not valid Python; fall back to a line based cleanup
+        lines = [line.rstrip() for line in content.splitlines()]
+        return '\n'.join(line for line in lines if line.strip() and not line.strip().startswith('#'))
+
+
+class RenderCache:
+    """Two-tier (memory LRU + size-bounded directory) cache of rendered diagrams.
+
+    Entries are keyed by a hash of the normalized diagram content and the output
+    format, so identical diagrams never go through the renderer twice.
+    """
+
+    def __init__(self, memory_items=128, disk_dir=None, disk_max_bytes=0):
+        self.memory_items = memory_items
+        self.disk_dir = disk_dir if disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+        self._disk_bytes = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+
+    @staticmethod
+    def make_key(diagram_content, outformat='png'):
+        normalized = normalize_diagram_content(diagram_content)
+        return hashlib.sha256(f"{outformat}\0{normalized}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_model_key(model, outformat='png'):
+        return hashlib.sha256(f"model\0{outformat}\0{model.signature()}".encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def _scan_disk(self):
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key, count_miss=True):
+        """Cached bytes for ``key``, or None; ``count_miss=False`` keeps a miss out of the stats."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return data
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)  # Keep recently used entries at the back of the eviction order
+            except OSError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                    self._remember(key, data)
+                return data
+
+        if count_miss:
+            with self._lock:
+                self._stats['misses'] += 1
+        return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._stats['stores'] += 1
+            self._remember(key, data)
+
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Other processes share the directory, so rescan instead of trusting our own tally
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._stats['evictions'] += 1
+        self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_items'] = len(self._memory)
+            stats['disk_bytes'] = self._disk_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Return the process-wide render cache, or None when caching is disabled."""
+    global _cache
+    if not Config.RENDER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache(
+                memory_items=Config.RENDER_CACHE_MEMORY_ITEMS,
+                disk_dir=Config.RENDER_CACHE_DIR,
+                disk_max_bytes=Config.RENDER_CACHE_DISK_MAX_MB * 1024 * 1024
+            )
+        return _cache
@@ -0,0 +1,179 @@
+import ast
+import threading
+from contextlib import contextmanager
+from app.config import Config
+from app.services.metrics import RENDER_DOWNGRADES_TOTAL, RENDER_REJECTIONS_TOTAL
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Callables in diagram code that do not create a node
+NON_NODE_CALLS = {'Diagram', 'Cluster', 'Edge', 'range', 'len', 'list', 'str', 'print', 'enumerate', 'zip'}
+EDGE_OPERATORS = (ast.RShift, ast.LShift, ast.Sub)
+
+
+class RenderRejected(Exception):
+    """A render refused up front; ``reason`` is 'too_complex' or 'busy'."""
+
+    def __init__(self, message, reason='too_complex'):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _ComplexityEstimator(ast.NodeVisitor):
+    """Counts node constructors and connections, multiplied by the loops around them."""
+
+    def __init__(self):
+        self.nodes = 0
+        self.edges = 0
+        self.sizes = {}
+        self.multiplier = 1
+
+    def size(self, node):
+        """Number of items an expression stands for, when it can be told statically."""
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return sum(self.size(element) for element in node.elts)
+        if isinstance(node, ast.Name):
+            return self.sizes.get(node.id, 1)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range':
+            try:
+                return len(range(*[ast.literal_eval(arg) for arg in node.args]))
+            except (ValueError, TypeError):
+                return 1
+        if isinstance(node, (ast.ListComp, ast.GeneratorExp, ast.SetComp)):
+            total = 1
+            for generator in node.generators:
+                total *= self.size(generator.iter)
+            return total
+        if isinstance(node, ast.BinOp) and isinstance(node.op, EDGE_OPERATORS):
+            return self.size(node.right)
+        return 1
+
+    def repeated(self, times, nodes):
+        outer = self.multiplier
+        self.multiplier *= max(times, 1)
+        for node in nodes:
+            self.visit(node)
+        self.multiplier = outer
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                self.sizes[target.id] = self.size(node.value)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.repeated(self.size(node.iter), node.body + node.orelse)
+
+    def visit_ListComp(self, node):
+        self.repeated(self.size(node), [node.elt])
+
+    visit_GeneratorExp = visit_SetComp = visit_ListComp
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id[:1].isupper() and node.func.id not in NON_NODE_CALLS:
+            self.nodes += self.multiplier
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, EDGE_OPERATORS):
+            self.edges += self.multiplier * self.size(node.left) * self.size(node.right)
+        self.generic_visit(node)
+
+
+def estimate_complexity(code):
+    """Rough ``(nodes, edges)`` for code the DiagramModel parser cannot read.
+
+    Loops over ``range(...)`` or list literals multiply what they contain; other
+    loops count once, so the timeouts and rlimits remain the backstop.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return 0, 0
+    estimator = _ComplexityEstimator()
+    estimator.visit(tree)
+    return estimator.nodes, estimator.edges
+
+
+def choose_engine(nodes, edges):
+    """Graphviz layout engine for a graph of this size; raises RenderRejected if it is too big."""
+    if nodes > Config.RENDER_MAX_NODES or edges > Config.RENDER_MAX_EDGES:
+        RENDER_REJECTIONS_TOTAL.inc(reason='too_complex')
+        raise RenderRejected(
+            f"Diagram too large to render: {nodes} nodes and {edges} edges "
+            f"(limits {Config.RENDER_MAX_NODES} nodes, {Config.RENDER_MAX_EDGES} edges)"
+        )
+    if nodes > Config.RENDER_DOWNGRADE_NODES or edges > Config.RENDER_DOWNGRADE_EDGES:
+        RENDER_DOWNGRADES_TOTAL.inc(engine=Config.RENDER_LARGE_GRAPH_ENGINE)
+        return Config.RENDER_LARGE_GRAPH_ENGINE
+    return 'dot'
+
+
+def apply_resource_limits(memory_mb, cpu_seconds):
+    """Cap this process's address space and give it ``cpu_seconds`` more CPU time.
+
+    The CPU limit counts from the time already used, so long-lived renderer
+    workers can call this before every job. No-op where ``resource`` is missing.
+    """
+    if resource is None:
+        return
+    if memory_mb:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = memory_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        limit = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+def limit_process(pid):
+    """Apply the configured memory and CPU caps to the already running process ``pid``.
+
+    Used right after spawning a render subprocess instead of a ``preexec_fn``,
+    which can deadlock the child of a threaded server. Needs ``resource.prlimit``
+    (Linux); elsewhere only the render timeout bounds the subprocess.
+    """
+    if resource is None or not hasattr(resource, 'prlimit'):
+        return
+    memory_mb, cpu_seconds = Config.RENDER_MAX_MEMORY_MB, Config.RENDER_MAX_CPU_SECONDS
+    try:
+        for limit, amount in ((resource.RLIMIT_AS, memory_mb * 1024 * 1024), (resource.RLIMIT_CPU, cpu_seconds)):
+            if not amount:
+                continue
+            _, hard = resource.prlimit(pid, limit)
+            if hard != resource.RLIM_INFINITY:
+                amount = min(amount, hard)
+            resource.prlimit(pid, limit, (amount, hard))
+    except ProcessLookupError:
+        # Already finished
+        pass
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+@contextmanager
+def render_slot():
+    """Hold one of ``RENDER_CONCURRENCY`` render slots, or raise RenderRejected after the admission timeout."""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(max(Config.RENDER_CONCURRENCY, 1))
+    if not _slots.acquire(timeout=Config.RENDER_ADMISSION_TIMEOUT):
+        RENDER_REJECTIONS_TOTAL.inc(reason='busy')
+        raise RenderRejected(f"All {Config.RENDER_CONCURRENCY} render slots are busy, try again later", 'busy')
+    try:
+        yield
+    finally:
+        _slots.release()
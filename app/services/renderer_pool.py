@@ -0,0 +1,224 @@
+import multiprocessing
+import os
+import queue
+import runpy
+import signal
+import sys
+import threading
+import traceback
+from app.config import Config
+from app.services.render_limits import apply_resource_limits
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    """Peak resident set size of the current process in MB, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _worker_main(conn, env, max_memory_mb=0, max_cpu_seconds=0):
+    """Renderer worker loop: runs generated diagram scripts sent over the pipe."""
+    os.environ.update(env or {})
+
+    # Pre-warm the modules every generated script imports
+    import diagrams  # noqa: F401
+    import diagrams.aws.compute  # noqa: F401
+    import diagrams.aws.database  # noqa: F401
+    import diagrams.aws.network  # noqa: F401
+
+    # Graphviz runs as a child of this process and inherits the memory cap
+    apply_resource_limits(max_memory_mb, 0)
+
+    home = os.getcwd()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+
+        script_path, workdir = job
+        try:
+            # Each job gets its own CPU budget; going over it kills the worker with SIGXCPU
+            apply_resource_limits(0, max_cpu_seconds)
+            os.chdir(workdir)
+            runpy.run_path(script_path, run_name='__main__')
+            conn.send(('ok', None, _peak_rss_mb()))
+        except MemoryError:
+            # The heap may be in a bad state, so report it and let the pool replace us
+            conn.send(('fatal', f"Renderer ran out of memory ({max_memory_mb} MB limit)", None))
+            break
+        except BaseException:
+            conn.send(('error', traceback.format_exc(), _peak_rss_mb()))
+        finally:
+            os.chdir(home)
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class RendererPool:
+    """A pool of long-lived renderer processes with the diagrams package pre-imported.
+
+    Each job runs in a worker process, so a crashing or hanging script never takes
+    down the web worker. Workers are replaced after a timeout or crash, and recycled
+    after ``max_jobs`` renders or once their peak RSS passes ``max_rss_mb``. Where
+    rlimits are available, workers are capped at ``max_memory_mb`` of address
+    space and ``max_cpu_seconds`` of CPU per job.
+    """
+
+    def __init__(self, size, max_jobs=100, max_rss_mb=512, job_timeout=60, env=None,
+                 max_memory_mb=0, max_cpu_seconds=0):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.job_timeout = job_timeout
+        self.env = env or {}
+        self.max_memory_mb = max_memory_mb
+        self.max_cpu_seconds = max_cpu_seconds
+        # spawn keeps workers free of the parent's threads, sockets and DB connections
+        self._ctx = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.env, self.max_memory_mb, self.max_cpu_seconds),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker, kill=False):
+        with self._lock:
+            self._workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def _release(self, worker):
+        if self._closed:
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+    def run(self, script_path, workdir, timeout=None):
+        """Run ``script_path`` as ``__main__`` inside ``workdir`` on a pooled worker."""
+        if self._closed:
+            raise Exception("Renderer pool is closed")
+        if timeout is None:
+            timeout = self.job_timeout
+
+        worker = self._idle.get()
+        try:
+            try:
+                worker.conn.send((script_path, workdir))
+                if not worker.conn.poll(timeout):
+                    self._retire(worker, kill=True)
+                    worker = None
+                    worker = self._spawn()
+                    raise Exception(f"Diagram generation timed out after {timeout} seconds")
+                status, detail, rss_mb = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.process.join(timeout=1)
+                exitcode = worker.process.exitcode
+                self._retire(worker, kill=True)
+                worker = None
+                worker = self._spawn()
+                if exitcode == -getattr(signal, 'SIGXCPU', 0):
+                    raise Exception(f"Diagram generation exceeded the {self.max_cpu_seconds}s CPU limit")
+                raise Exception(f"Renderer worker crashed (exit code {exitcode})")
+
+            if status == 'fatal':
+                self._retire(worker, kill=True)
+                worker = None
+                worker = self._spawn()
+                raise Exception(f"Diagram generation failed: {detail}")
+
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs or (rss_mb is not None and rss_mb > self.max_rss_mb):
+                self._retire(worker)
+                worker = None
+                worker = self._spawn()
+
+            if status != 'ok':
+                raise Exception(f"Diagram generation failed: {detail}")
+        finally:
+            # None if a replacement could not be started; the pool runs one short
+            if worker is not None:
+                self._release(worker)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_renderer_pool(env=None):
+    """Return the process-wide renderer pool, starting it on first use."""
+    global _pool
+    if Config.RENDERER_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = RendererPool(
+                Config.RENDERER_POOL_SIZE,
+                max_jobs=Config.RENDERER_MAX_JOBS_PER_WORKER,
+                max_rss_mb=Config.RENDERER_MAX_RSS_MB,
+                job_timeout=Config.RENDERER_JOB_TIMEOUT,
+                env=env,
+                max_memory_mb=Config.RENDER_MAX_MEMORY_MB,
+                max_cpu_seconds=Config.RENDER_MAX_CPU_SECONDS
+            )
+        return _pool
@@ -0,0 +1,307 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
+from app.config import Config, hedge_after as check_hedge_after
+from app.services.metrics import LLM_CALL_SECONDS, LLM_CALLS_TOTAL, LLM_HEDGES_TOTAL, LLM_RETRIES_TOTAL
+
+_END = object()
+
+
+class LLMCallError(Exception):
+    """A model call that did not produce a response; ``outcome`` says why."""
+
+    def __init__(self, message, outcome='error'):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+class LLMTimeout(LLMCallError):
+    def __init__(self, message):
+        super().__init__(message, 'timeout')
+
+
+class CircuitOpenError(LLMCallError):
+    def __init__(self, message):
+        super().__init__(message, 'circuit_open')
+
+
+class CircuitBreaker:
+    """Fails fast after ``failure_threshold`` consecutive failures.
+
+    While open, calls are refused until ``reset_timeout`` has passed; then a single
+    trial call is let through (half-open). Its success closes the circuit, its
+    failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_timeout:
+                # One trial per reset window, so an abandoned trial cannot wedge the breaker
+                self.state = 'half_open'
+                self._opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+
+class LatencyWindow:
+    """Durations of the most recent successful calls, for percentile-based hedging."""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ResilientModel:
+    """Wraps a model client with per-call timeouts, retries, hedging and a circuit breaker.
+
+    It has the same ``generate_content``/``generate_content_async`` interface as
+    the client it wraps, so any object with ``generate_content(prompt)`` can be
+    plugged in underneath. Every attempt is recorded by outcome (success,
+    timeout, error, circuit_open); the caller decides what to do with a final
+    LLMCallError. Streaming calls go through the breaker and the timeout, which
+    applies to the first chunk and to each gap between chunks, but are not
+    retried or hedged, since chunks may already have been passed on.
+    """
+
+    def __init__(self, model, timeout=30, max_retries=2, backoff_base=0.5, backoff_max=8,
+                 hedge_after='', breaker=None, max_concurrency=32):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # A bad setting fails here rather than inside every call, where it would look like an outage
+        self.hedge_after = check_hedge_after(hedge_after)
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+        # Blocking clients run here so a hung call can be abandoned at its timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-call')
+
+    def hedge_delay(self):
+        """Seconds to wait before sending a duplicate request, or None for no hedging."""
+        if not self.hedge_after:
+            return None
+        if self.hedge_after == 'p95':
+            return self.latencies.percentile(95)
+        return float(self.hedge_after)
+
+    def stats(self):
+        return {
+            'circuit_state': self.breaker.state,
+            'hedge_delay': self.hedge_delay(),
+            'p95_seconds': self.latencies.percentile(95),
+        }
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retries from many workers from arriving in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record(self, outcome, started):
+        elapsed = time.perf_counter() - started
+        LLM_CALLS_TOTAL.inc(outcome=outcome)
+        LLM_CALL_SECONDS.observe(elapsed, outcome=outcome)
+        if outcome == 'success':
+            self.latencies.add(elapsed)
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            LLM_CALLS_TOTAL.inc(outcome='circuit_open')
+            raise CircuitOpenError("Model calls are suspended after repeated failures (circuit open)")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt, kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker()
+            try:
+                return self._attempt(prompt, kwargs)
+            except LLMCallError as e:
+                error = e
+            if attempt < self.max_retries:
+                LLM_RETRIES_TOTAL.inc()
+                time.sleep(self._backoff(attempt))
+        raise error
+
+    def _attempt(self, prompt, kwargs):
+        """One call, plus a hedged duplicate if it runs past the hedge delay."""
+        started = time.perf_counter()
+        call = partial(self.model.generate_content, prompt, **kwargs)
+        pending = {self._executor.submit(call)}
+        hedge = None
+        delay = self.hedge_delay()
+        error = None
+
+        while pending:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.timeout:
+                break
+            timeout = self.timeout - elapsed
+            if hedge is None and delay is not None:
+                timeout = min(timeout, max(delay - elapsed, 0))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        LLM_HEDGES_TOTAL.inc(result='won')
+                    self._record('success', started)
+                    return future.result()
+                error = future.exception()
+            if hedge is None and delay is not None and pending and time.perf_counter() - started >= delay:
+                hedge = self._executor.submit(call)
+                pending.add(hedge)
+                LLM_HEDGES_TOTAL.inc(result='launched')
+
+        if pending:
+            for future in pending:
+                future.cancel()
+            self._record('timeout', started)
+            raise LLMTimeout(f"Model call timed out after {self.timeout} seconds")
+        self._record('error', started)
+        raise LLMCallError(f"Model call failed: {error}") from error
+
+    async def generate_content_async(self, prompt, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker()
+            try:
+                return await self._attempt_async(prompt, kwargs)
+            except LLMCallError as e:
+                error = e
+            if attempt < self.max_retries:
+                LLM_RETRIES_TOTAL.inc()
+                await asyncio.sleep(self._backoff(attempt))
+        raise error
+
+    async def _attempt_async(self, prompt, kwargs):
+        loop = asyncio.get_running_loop()
+        generate = getattr(self.model, 'generate_content_async', None)
+
+        def start():
+            if generate is not None:
+                return asyncio.ensure_future(generate(prompt, **kwargs))
+            return loop.run_in_executor(self._executor, partial(self.model.generate_content, prompt, **kwargs))
+
+        started = time.perf_counter()
+        pending = {start()}
+        hedge = None
+        delay = self.hedge_delay()
+        error = None
+
+        try:
+            while pending:
+                elapsed = time.perf_counter() - started
+                if elapsed >= self.timeout:
+                    break
+                timeout = self.timeout - elapsed
+                if hedge is None and delay is not None:
+                    timeout = min(timeout, max(delay - elapsed, 0))
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            LLM_HEDGES_TOTAL.inc(result='won')
+                        self._record('success', started)
+                        return task.result()
+                    error = task.exception()
+                if hedge is None and delay is not None and pending and time.perf_counter() - started >= delay:
+                    hedge = start()
+                    pending.add(hedge)
+                    LLM_HEDGES_TOTAL.inc(result='launched')
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if pending:
+            self._record('timeout', started)
+            raise LLMTimeout(f"Model call timed out after {self.timeout} seconds")
+        self._record('error', started)
+        raise LLMCallError(f"Model call failed: {error}") from error
+
+    def _stream(self, prompt, kwargs):
+        self._check_breaker()
+        started = time.perf_counter()
+        try:
+            chunks = self._within(lambda: iter(self.model.generate_content(prompt, stream=True, **kwargs)), started)
+            # The first chunk shares the call's deadline; each later one gets a fresh timeout
+            since = started
+            while True:
+                chunk = self._within(partial(next, chunks, _END), since)
+                if chunk is _END:
+                    break
+                yield chunk
+                since = time.perf_counter()
+        except LLMTimeout:
+            self._record('timeout', started)
+            raise
+        except Exception as e:
+            self._record('error', started)
+            raise LLMCallError(f"Model call failed: {e}") from e
+        self._record('success', started)
+
+    def _within(self, call, since):
+        """Run ``call`` on the executor, giving up ``timeout`` seconds after ``since``."""
+        future = self._executor.submit(call)
+        try:
+            return future.result(timeout=max(self.timeout - (time.perf_counter() - since), 0))
+        except FutureTimeout:
+            future.cancel()
+            raise LLMTimeout(f"Model stream stalled for more than {self.timeout} seconds") from None
+
+
+def wrap_model(model):
+    """Wrap ``model`` with the resilience settings from Config."""
+    return ResilientModel(
+        model,
+        timeout=Config.LLM_TIMEOUT_SECONDS,
+        max_retries=Config.LLM_MAX_RETRIES,
+        backoff_base=Config.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=Config.LLM_BACKOFF_MAX_SECONDS,
+        hedge_after=Config.LLM_HEDGE_AFTER,
+        breaker=CircuitBreaker(Config.LLM_CIRCUIT_FAILURES, Config.LLM_CIRCUIT_RESET_SECONDS),
+        max_concurrency=Config.LLM_MAX_CONCURRENCY
+    )
@@ -0,0 +1,142 @@
+import re
+import threading
+from sqlalchemy import literal_column, table, column, text
+from app import db
+from app.config import Config
+from app.models.diagram import DiagramRequest
+from app.services.llm_cache import normalize_prompt
+
+_TOKEN = re.compile(r'\w+')
+
+# Words nearly every prompt has; they would make unrelated prompts look alike
+STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'to', 'in', 'on', 'for', 'with', 'into', 'from', 'by', 'is', 'are',
+    'create', 'generate', 'draw', 'make', 'show', 'showing', 'me', 'please', 'diagram', 'architecture',
+}
+
+_fts = table('diagram_search', column('rowid'))
+# bm25 is lower for better matches; prompt hits count ten times as much as code hits
+_RANK = literal_column('bm25(diagram_search, 10.0, 1.0)')
+_SNIPPET = literal_column("snippet(diagram_search, -1, '[', ']', '...', 12)")
+
+
+def prompt_terms(prompt):
+    return set(normalize_prompt(prompt).split()) - STOPWORDS
+
+
+def jaccard(a, b):
+    union = a | b
+    return len(a & b) / len(union) if union else 0.0
+
+
+def like_pattern(word):
+    """``%word%`` for LIKE, with the wildcards ``%`` and ``_`` in ``word`` matched literally."""
+    escaped = word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def match_expression(words, any_word=False):
+    """FTS5 query for ``words``; every word is quoted so input is never parsed as FTS5 syntax."""
+    return (' OR ' if any_word else ' ').join(f'"{word}"' for word in words)
+
+
+class DiagramSearch:
+    """Ranked full-text search over past requests, and lookup of a reusable earlier diagram.
+
+    Uses the ``diagram_search`` FTS5 index where it exists. Without it (another
+    database, or a SQLite file not migrated yet) results come from LIKE matching,
+    newest first and without a score.
+    """
+
+    def __init__(self, reuse_threshold=0.8, reuse_candidates=20):
+        self.reuse_threshold = reuse_threshold
+        self.reuse_candidates = reuse_candidates
+
+    @staticmethod
+    def available():
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        return db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'diagram_search'")
+        ).first() is not None
+
+    @staticmethod
+    def _query(words, columns, filters, use_index, any_word=False):
+        """Rows matching all of ``words`` (any of them with ``any_word``), best first."""
+        if use_index:
+            expression = match_expression(words, any_word)
+            return (
+                db.session.query(*columns, _RANK.label('rank'), _SNIPPET.label('snippet'))
+                .select_from(_fts)
+                .join(DiagramRequest, DiagramRequest.id == _fts.c.rowid)
+                .filter(text('diagram_search MATCH :expression').bindparams(expression=expression), *filters)
+                .order_by(literal_column('rank'))
+            )
+        combine = db.or_ if any_word else db.and_
+        matches = [DiagramRequest.prompt.ilike(like_pattern(word), escape='\\') for word in words]
+        return (
+            db.session.query(*columns)
+            .filter(combine(*matches), *filters)
+            .order_by(DiagramRequest.created_at.desc(), DiagramRequest.id.desc())
+        )
+
+    def search(self, query, limit, offset=0, status=None):
+        """Return ``(rows, has_more)``; rows have a ``score`` (higher is better) and ``snippet``."""
+        words = _TOKEN.findall(query.lower())
+        if not words:
+            return [], False
+        columns = (DiagramRequest.id, DiagramRequest.prompt, DiagramRequest.status,
+                   DiagramRequest.created_at, DiagramRequest.image_sha256, DiagramRequest.image_format,
+                   DiagramRequest.parent_id)
+        filters = [DiagramRequest.status == status] if status else []
+        rows = self._query(words, columns, filters, self.available()).offset(offset).limit(limit + 1).all()
+
+        results = []
+        for row in rows[:limit]:
+            item = dict(row._mapping)
+            rank = item.pop('rank', None)
+            item['score'] = -rank if rank is not None else None
+            item.setdefault('snippet', None)
+            results.append(item)
+        return results, len(rows) > limit
+
+    def find_reusable(self, prompt, image_format=None):
+        """Return ``(diagram_request, similarity)`` for the closest completed diagram, or None.
+
+        Candidates come from the index; the one whose prompt terms have the highest
+        Jaccard similarity with ``prompt`` wins if it reaches ``reuse_threshold``.
+        """
+        terms = prompt_terms(prompt)
+        if not terms:
+            return None
+        filters = [DiagramRequest.status == 'completed', DiagramRequest.image_sha256.isnot(None)]
+        if image_format:
+            filters.append(DiagramRequest.image_format == image_format)
+        rows = self._query(
+            sorted(terms), (DiagramRequest.id, DiagramRequest.prompt), filters, self.available(), any_word=True
+        ).limit(self.reuse_candidates).all()
+
+        best_id, best_score = None, 0.0
+        for row in rows:
+            score = jaccard(terms, prompt_terms(row.prompt))
+            if score > best_score:
+                best_id, best_score = row.id, score
+        if best_id is None or best_score < self.reuse_threshold:
+            return None
+        return db.session.get(DiagramRequest, best_id), best_score
+
+
+_search = None
+_search_lock = threading.Lock()
+
+
+def get_search():
+    """Return the process-wide search service."""
+    global _search
+    with _search_lock:
+        if _search is None:
+            _search = DiagramSearch(
+                reuse_threshold=Config.SEARCH_REUSE_THRESHOLD,
+                reuse_candidates=Config.SEARCH_REUSE_CANDIDATES
+            )
+        return _search
@@ -0,0 +1,251 @@
+import threading
+import time
+from app.services.llm_cache import normalize_prompt
+
+# Phrases that name a component; the parser always tries the longest match first
+COMPONENT_PHRASES = {
+    ('application', 'load', 'balancers'): 'ALB',
+    ('application', 'load', 'balancer'): 'ALB',
+    ('albs',): 'ALB',
+    ('alb',): 'ALB',
+    ('elastic', 'load', 'balancer'): 'ELB',
+    ('load', 'balancers'): 'ELB',
+    ('load', 'balancer'): 'ELB',
+    ('elbs',): 'ELB',
+    ('elb',): 'ELB',
+    ('lb',): 'ELB',
+    ('ec2', 'instances'): 'EC2',
+    ('ec2', 'instance'): 'EC2',
+    ('web', 'servers'): 'EC2',
+    ('web', 'server'): 'EC2',
+    ('app', 'servers'): 'EC2',
+    ('app', 'server'): 'EC2',
+    ('ec2s',): 'EC2',
+    ('ec2',): 'EC2',
+    ('instances',): 'EC2',
+    ('instance',): 'EC2',
+    ('servers',): 'EC2',
+    ('server',): 'EC2',
+    ('rds', 'databases'): 'RDS',
+    ('rds', 'database'): 'RDS',
+    ('rds', 'instance'): 'RDS',
+    ('database', 'servers'): 'RDS',
+    ('database', 'server'): 'RDS',
+    ('database', 'instances'): 'RDS',
+    ('database', 'instance'): 'RDS',
+    ('db', 'servers'): 'RDS',
+    ('db', 'server'): 'RDS',
+    ('db', 'instances'): 'RDS',
+    ('db', 'instance'): 'RDS',
+    ('rds',): 'RDS',
+    ('databases',): 'RDS',
+    ('database',): 'RDS',
+    ('db',): 'RDS',
+    ('mysql', 'database'): 'RDS',
+    ('postgres', 'database'): 'RDS',
+    ('postgresql', 'database'): 'RDS',
+    ('mysql',): 'RDS',
+    ('postgres',): 'RDS',
+    ('postgresql',): 'RDS',
+}
+
+# Generic nouns that are a component on their own ("2 servers") but only qualify
+# the word before them otherwise ("mysql server"), which the parser cannot tell apart
+GENERIC_PHRASES = {('server',), ('servers',), ('instance',), ('instances',)}
+
+LOAD_BALANCERS = ('ALB', 'ELB')
+
+# Structural words the fixed VPC/subnet layout already covers
+LAYOUT_PHRASES = {
+    ('public', 'subnets'), ('public', 'subnet'),
+    ('private', 'subnets'), ('private', 'subnet'),
+    ('subnets',), ('subnet',), ('vpc',),
+}
+
+NUMBER_WORDS = {
+    'one': 1, 'single': 1, 'two': 2, 'three': 3, 'four': 4,
+    'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+
+# Words that carry no meaning for the layout. 'web', 'app' and 'application' are
+# deliberately absent: on their own ("3 tier web app") they describe an
+# architecture the template cannot draw faithfully.
+FILLER_WORDS = {
+    'a', 'an', 'create', 'generate', 'draw', 'make', 'build', 'show', 'showing', 'design', 'me', 'please',
+    'aws', 'amazon', 'architecture', 'diagram', 'simple', 'basic', 'typical', 'setup', 'stack',
+    'with', 'and', 'plus', 'in', 'inside', 'within', 'on', 'of', 'the', 'to', 'for',
+    'behind', 'connected', 'connecting', 'that', 'has', 'having', 'using', 'separate', 'its', 'own',
+    'tier', 'layer',
+}
+
+# Components in data-flow order: (class, subnet cluster, variable, label)
+TIERS = (
+    ('ALB', 'Public Subnet', 'lb', 'Application Load Balancer'),
+    ('ELB', 'Public Subnet', 'lb', 'Load Balancer'),
+    ('EC2', 'Private Subnet', 'web', 'Web Server'),
+    ('RDS', 'Database Subnet', 'db', 'Database'),
+)
+
+MAX_COUNT = 10
+MAX_PHRASE = max(len(phrase) for phrase in COMPONENT_PHRASES)
+
+
+class TemplateDiagramGenerator:
+    """Builds diagram code locally for prompts that only combine the stock components.
+
+    Prompts like "ALB, 2 EC2, RDS" are parsed into component counts and laid out
+    on the default VPC/subnet template without calling the LLM. Anything with a
+    word the parser does not understand is left for the model.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'seconds': 0.0}
+        self._llm_calls = 0
+        self._llm_seconds = 0.0
+
+    def parse(self, prompt):
+        """Return ``{component: count}`` if every word of ``prompt`` is understood, else None.
+
+        A count must come directly before the component it applies to ("2 EC2",
+        "2 x EC2"); a count anywhere else, a zero count or a trailing number
+        means the prompt is left for the model. So does anything ambiguous: a
+        generic noun straight after a component ("mysql server") or more than
+        one load balancer, which the single-entry template cannot draw.
+        """
+        tokens = normalize_prompt(prompt).split()
+        counts = {}
+        pending = None
+        after_component = False
+        i = 0
+        while i < len(tokens):
+            for size in range(min(MAX_PHRASE, len(tokens) - i), 0, -1):
+                phrase = tuple(tokens[i:i + size])
+                if phrase in COMPONENT_PHRASES:
+                    if after_component and phrase in GENERIC_PHRASES:
+                        return None
+                    component = COMPONENT_PHRASES[phrase]
+                    counts[component] = counts.get(component, 0) + (pending or 1)
+                    pending = None
+                    after_component = True
+                    i += size
+                    break
+                if phrase in LAYOUT_PHRASES:
+                    if pending is not None:
+                        return None  # "2 private subnets": the template has one of each
+                    after_component = False
+                    i += size
+                    break
+            else:
+                token = tokens[i]
+                if token.isdigit() or token in NUMBER_WORDS:
+                    if pending is not None:
+                        return None
+                    pending = int(token) if token.isdigit() else NUMBER_WORDS[token]
+                    if pending == 0:
+                        return None
+                elif token == 'x' and pending is not None:
+                    pass  # "2 x EC2"
+                elif token in FILLER_WORDS and pending is None:
+                    pass
+                else:
+                    return None
+                after_component = False
+                i += 1
+
+        if pending is not None or not counts or any(count > MAX_COUNT for count in counts.values()):
+            return None
+        if sum(counts.get(name, 0) for name in LOAD_BALANCERS) > 1:
+            return None
+        return counts
+
+    def build_code(self, counts):
+        imports = {
+            'ALB': 'from diagrams.aws.network import ALB',
+            'ELB': 'from diagrams.aws.network import ELB',
+            'EC2': 'from diagrams.aws.compute import EC2',
+            'RDS': 'from diagrams.aws.database import RDS',
+        }
+        lines = [
+            'from diagrams import Diagram, Cluster',
+            *[imports[name] for name, _, _, _ in TIERS if name in counts],
+            'from diagrams.aws.network import VPC',
+            'from diagrams.aws.network import PrivateSubnet, PublicSubnet',
+            '',
+            'def generate_diagram():',
+            '    with Diagram("AWS Architecture", direction="LR"):',
+            '        with Cluster("VPC"):',
+        ]
+
+        tier_vars = []
+        for cluster in ('Public Subnet', 'Private Subnet', 'Database Subnet'):
+            tiers = [t for t in TIERS if t[1] == cluster and t[0] in counts]
+            if not tiers:
+                continue
+            lines.append(f'            with Cluster("{cluster}"):')
+            for name, _, var, label in tiers:
+                count = counts[name]
+                if len(tiers) > 1:
+                    var = f"{var}_{name.lower()}"
+                if count == 1:
+                    lines.append(f'                {var} = {name}("{label}")')
+                else:
+                    lines.append(f'                {var} = [')
+                    nodes = [f'                    {name}("{label} {n}")' for n in range(1, count + 1)]
+                    lines.append(',\n'.join(nodes))
+                    lines.append('                ]')
+                tier_vars.append((var, count))
+            lines.append('')
+
+        # Connect each tier to the next one along the data flow
+        edges = []
+        for (source, source_count), (target, _) in zip(tier_vars, tier_vars[1:]):
+            if source_count == 1:
+                edges.append(f'            {source} >> {target}')
+            else:
+                # diagrams cannot connect a list to a list, so fan out from each source node
+                edges.append(f'            for node in {source}:')
+                edges.append(f'                node >> {target}')
+        if edges:
+            lines.append('            # Connect components')
+            lines.extend(edges)
+        else:
+            lines.pop()  # trailing blank line after the last cluster
+
+        lines.extend([
+            '',
+            'if __name__ == "__main__":',
+            '    generate_diagram()',
+        ])
+        return '\n'.join(lines)
+
+    def try_generate(self, prompt):
+        """Return diagram code for ``prompt`` if it can be built locally, otherwise None."""
+        start = time.perf_counter()
+        counts = self.parse(prompt)
+        code = self.build_code(counts) if counts else None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats['hits' if code else 'misses'] += 1
+            self._stats['seconds'] += elapsed
+        return code
+
+    def record_llm_latency(self, seconds):
+        """Feed in the duration of a real model call so savings can be estimated."""
+        with self._lock:
+            self._llm_calls += 1
+            self._llm_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            llm_calls, llm_seconds = self._llm_calls, self._llm_seconds
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['avg_llm_seconds'] = llm_seconds / llm_calls if llm_calls else None
+        # Each hit saves roughly one average model call
+        stats['estimated_seconds_saved'] = (
+            stats['hits'] * stats['avg_llm_seconds'] - stats['seconds'] if llm_calls else None
+        )
+        return stats
@@ -1,16 +1,105 @@
+import os
 import streamlit as st
 import requests
-import base64
-from PIL import Image
-import io
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 
+API_URL = os.environ.get('DIAGRAM_API_URL', 'http://localhost:5000').rstrip('/')
+# (connect, read) timeouts; the stream only needs its read timeout between events
+REQUEST_TIMEOUT = (3.05, 30)
+STREAM_TIMEOUT = (3.05, 120)
+HISTORY_PAGE_SIZE = 10
+HISTORY_TTL = 30
+IMAGE_TTL = 3600
+
 st.set_page_config(
     page_title="Architecture Diagram Generator",
     page_icon="🔧",
     layout="wide"
 )
 
+
+@st.cache_resource
+def get_session():
+    """One pooled keep-alive session per Streamlit server, shared by every rerun and user."""
+    session = requests.Session()
+    # Only idempotent GETs are retried; a retried POST would generate twice
+    retry = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@st.cache_data(ttl=HISTORY_TTL, show_spinner=False)
+def fetch_history_page(cursor=None):
+    """One page of /history with just the fields the list shows."""
+    params = {
+        'limit': HISTORY_PAGE_SIZE,
+        'fields': 'id,prompt,status,created_at,error_message,thumbnail_url'
+    }
+    if cursor:
+        params['cursor'] = cursor
+    response = get_session().get(f"{API_URL}/api/diagrams/history", params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(ttl=IMAGE_TTL, max_entries=200, show_spinner=False)
+def fetch_image(path, etag=None):
+    """Raw bytes and content type of an image URL.
+
+    Stored images are content addressed, so ``etag`` (when known) makes a new
+    version of the same URL a separate cache entry.
+    """
+    response = get_session().get(f"{API_URL}{path}", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.content, response.headers.get('Content-Type', 'image/png')
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+        elif not line and event:
+            yield event, json.loads("\n".join(data))
+            event, data = None, []
+
+def reset_history():
+    """Start the history list over from the newest page."""
+    fetch_history_page.clear()
+    st.session_state.history_cursors = [None]
+
+def show_history():
+    # Pages already loaded are served from cache_data, so reruns don't refetch them
+    cursors = st.session_state.setdefault('history_cursors', [None])
+    next_cursor = None
+    for cursor in cursors:
+        page = fetch_history_page(cursor)
+        next_cursor = page['next_cursor']
+        for diagram in page['items']:
+            with st.expander(f"Diagram {diagram['id']} - {diagram['created_at']}"):
+                if diagram.get('thumbnail_url'):
+                    try:
+                        thumbnail, _ = fetch_image(diagram['thumbnail_url'])
+                        st.image(thumbnail)
+                    except requests.RequestException:
+                        st.caption("Thumbnail unavailable")
+                st.write(f"**Prompt:** {diagram['prompt']}")
+                st.write(f"**Status:** {diagram['status']}")
+                if diagram.get('error_message'):
+                    st.error(f"Error: {diagram['error_message']}")
+
+    if len(cursors) == 1 and not page['items']:
+        st.info("No diagrams yet.")
+    if next_cursor and st.button("Load more"):
+        cursors.append(next_cursor)
+        st.rerun()
+
 def main():
     st.title("Architecture Diagram Generator 🏗️")
     
@@ -34,69 +123,90 @@ def main():
         
         if st.button("Generate Diagram", type="primary"):
             if prompt:
-                with st.spinner("Generating diagram..."):
-                    try:
-                        # Make request to Flask backend
-                        response = requests.post(
-                            "http://localhost:5000/api/diagrams/generate",
-                            json={"prompt": prompt}
-                        )
+                status = st.status("Generating diagram...")
+                code_preview = st.empty()
+                try:
+                    # Stream progress events from the Flask backend
+                    response = get_session().post(
+                        f"{API_URL}/api/diagrams/generate/stream",
+                        json={"prompt": prompt, "format": "png"},  # st.image needs a raster image
+                        stream=True,
+                        timeout=STREAM_TIMEOUT
+                    )
+                    
+                    if response.status_code == 200:
+                        streamed_code = ""
+                        data = None
+                        for event, payload in iter_sse(response):
+                            if event == 'persisted':
+                                status.update(label=f"Request {payload['id']} saved, waiting for the model...")
+                            elif event == 'token':
+                                streamed_code += payload['text']
+                                code_preview.code(streamed_code, language="python")
+                            elif event == 'validated':
+                                code_preview.code(payload['diagram_code'], language="python")
+                                st.session_state.diagram_code = payload['diagram_code']
+                            elif event == 'render_started':
+                                status.update(label="Rendering diagram...")
+                            elif event == 'image':
+                                data = payload
+                            elif event == 'error':
+                                raise Exception(payload['error'])
+                        
+                        # Fetch the rendered image once; later reruns read it from the cache
+                        fetch_image(data['image_url'], data.get('etag'))
+                        
+                        # Store the cache key in session state, not the image itself
+                        st.session_state.diagram_image = (data['image_url'], data.get('etag'))
+                        st.session_state.diagram_id = data['id']
                         
-                        if response.status_code == 200:
-                            data = response.json()
-                            
-                            # Store data in session state
-                            st.session_state.diagram_code = data['diagram_code']
-                            st.session_state.diagram_image = data['diagram_image']
-                            st.session_state.diagram_id = data['id']
-                            
-                            st.success("Diagram generated successfully!")
-                        else:
-                            error_msg = response.json().get('error', 'Unknown error occurred')
-                            st.error(f"Error: {error_msg}")
-                            
-                    except Exception as e:
-                        st.error(f"Error connecting to backend: {str(e)}")
+                        # The new diagram belongs at the top of the history
+                        reset_history()
+                        
+                        code_preview.empty()
+                        status.update(label="Diagram generated successfully!", state="complete")
+                    else:
+                        error_msg = response.json().get('error', 'Unknown error occurred')
+                        status.update(label=f"Error: {error_msg}", state="error")
+                        
+                except Exception as e:
+                    status.update(label=f"Error: {str(e)}", state="error")
             else:
                 st.warning("Please enter a description first!")
 
     with col2:
         st.subheader("Generated Diagram")
         if 'diagram_image' in st.session_state:
-            # Display the diagram
-            image_bytes = base64.b64decode(st.session_state.diagram_image)
-            image = Image.open(io.BytesIO(image_bytes))
-            st.image(image, use_column_width=True)
-            
-            # Download button
-            st.download_button(
-                label="Download Diagram",
-                data=image_bytes,
-                file_name="architecture_diagram.png",
-                mime="image/png"
-            )
+            # st.image takes the encoded bytes directly, no need to decode them here
+            try:
+                image_bytes, mimetype = fetch_image(*st.session_state.diagram_image)
+            except requests.RequestException as e:
+                st.error(f"Error fetching diagram: {str(e)}")
+            else:
+                st.image(image_bytes, use_column_width=True)
+                
+                # Download button
+                st.download_button(
+                    label="Download Diagram",
+                    data=image_bytes,
+                    file_name="architecture_diagram.png",
+                    mime=mimetype
+                )
     
     # Display generated code
     if 'diagram_code' in st.session_state:
         st.subheader("Generated Python Code")
         st.code(st.session_state.diagram_code, language="python")
 
-    # Display diagram history
+    # Display diagram history, loaded only once it is opened
     st.subheader("Previous Diagrams")
-    if st.button("Refresh History"):
+    if st.toggle("Show history"):
+        if st.button("Refresh History"):
+            reset_history()
         try:
-            response = requests.get("http://localhost:5000/api/diagrams/history")
-            if response.status_code == 200:
-                diagrams = response.json()
-                
-                for diagram in diagrams:
-                    with st.expander(f"Diagram {diagram['id']} - {diagram['created_at']}"):
-                        st.write(f"**Prompt:** {diagram['prompt']}")
-                        st.write(f"**Status:** {diagram['status']}")
-                        if diagram.get('error_message'):
-                            st.error(f"Error: {diagram['error_message']}")
+            show_history()
         except Exception as e:
             st.error(f"Error fetching history: {str(e)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,163 @@
+"""WSGI (threaded Flask server) vs ASGI (uvicorn + app.asgi) under many slow LLM calls.
+
+Both servers are started as subprocesses with the fake model answering after
+``--llm-latency`` seconds, then hit with ``--clients`` simultaneous
+``POST /api/diagrams/generate`` requests. Besides latency and throughput the
+result records the server's peak thread count and peak RSS.
+
+Run: python -m benchmarks.bench_asgi --clients 100,1000 --llm-latency 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from benchmarks.common import setup_env, summarize, write_results
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(kind, port):
+    if kind == 'wsgi':
+        return [sys.executable, '-m', 'flask', '--app', 'run', 'run', '--port', str(port), '--with-threads']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+            '--log-level', 'warning', '--backlog', '4096']
+
+
+def proc_status(pid):
+    """Current thread count and peak RSS (MB) of ``pid`` from /proc, or Nones."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['Threads']), int(fields['VmHWM'].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+async def request(port, method, path, payload=None):
+    """One HTTP/1.1 request on a fresh connection; returns the status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if await request(port, 'GET', '/') == 200:
+                return
+        except (OSError, IndexError, ValueError):
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def load(port, pid, clients, prompts):
+    samples = []
+    statuses = {}
+    peak_threads = 0
+    done = asyncio.Event()
+
+    async def watch():
+        nonlocal peak_threads
+        while not done.is_set():
+            threads, _ = proc_status(pid)
+            peak_threads = max(peak_threads, threads or 0)
+            await asyncio.sleep(0.05)
+
+    async def client(index):
+        start = time.perf_counter()
+        try:
+            status = await request(port, 'POST', '/api/diagrams/generate',
+                                   {'prompt': f"{prompts[index % len(prompts)]} #{index}"})
+        except Exception as e:
+            status = type(e).__name__
+        samples.append(time.perf_counter() - start)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    watcher = asyncio.create_task(watch())
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await watcher
+
+    summary = summarize(samples, elapsed)
+    summary['statuses'] = statuses
+    summary['errors'] = sum(count for status, count in statuses.items() if status != '200')
+    summary['peak_server_threads'] = peak_threads
+    summary['peak_server_rss_mb'] = proc_status(pid)[1]
+    return summary
+
+
+def run_server(kind, client_counts, workdir, llm_latency):
+    from benchmarks.corpus import FREEFORM_PROMPTS
+
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'FAKE_LLM_LATENCY': str(llm_latency),
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, f'{kind}.db')}",
+    })
+    subprocess.run([sys.executable, '-c', 'from app import create_app, db\napp = create_app()\n'
+                    'with app.app_context(): db.create_all()'], cwd=REPO_ROOT, env=env, check=True)
+    server = subprocess.Popen(server_command(kind, port), cwd=REPO_ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready(port))
+        results = {}
+        for clients in client_counts:
+            results[str(clients)] = asyncio.run(load(port, server.pid, clients, FREEFORM_PROMPTS))
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', default='100,500', help='Comma separated concurrency levels')
+    parser.add_argument('--llm-latency', type=float, default=2.0, help='Fake model latency in seconds')
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/asgi-<time>.json)')
+    args = parser.parse_args(argv)
+
+    workdir = setup_env()
+    if resource is not None:
+        # Every simultaneous client needs a socket on both ends
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    client_counts = [int(clients) for clients in args.clients.split(',')]
+    results = {
+        'llm_latency_s': args.llm_latency,
+        **{kind: run_server(kind, client_counts, workdir, args.llm_latency) for kind in args.servers.split(',')}
+    }
+    write_results('asgi', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
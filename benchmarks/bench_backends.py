@@ -0,0 +1,80 @@
+"""Server cost per request of each output backend: Graphviz PNG/SVG vs Mermaid text.
+
+Every corpus diagram is rendered ``--iterations`` times per format with the render
+cache disabled, so each call does the full server-side work. CPU time includes
+the Graphviz subprocesses. ``bytes`` is the mean size of what the client
+downloads; Mermaid text is drawn by the browser, so it costs the server no layout.
+
+Run: python -m benchmarks.bench_backends --iterations 10
+"""
+import argparse
+import time
+from benchmarks.common import setup_env, summarize, write_results
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _cpu_seconds():
+    """CPU time of this process plus its reaped children (Graphviz runs)."""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run(iterations=10, formats=('png', 'svg', 'mmd')):
+    from app.config import Config
+    from app.services.diagram_service import DiagramService
+    from benchmarks.corpus import code_samples
+
+    Config.RENDER_CACHE_ENABLED = False
+    codes = list(code_samples().values())
+
+    results = {}
+    for fmt in formats:
+        DiagramService.render_diagram(codes[0], 0, fmt)  # warm-up
+        samples, sizes = [], []
+        cpu_start = _cpu_seconds()
+        for _ in range(iterations):
+            for code in codes:
+                start = time.perf_counter()
+                output = DiagramService.render_diagram(code, 0, fmt)
+                samples.append(time.perf_counter() - start)
+                sizes.append(len(output))
+        cpu = _cpu_seconds() - cpu_start
+
+        summary = summarize(samples, sum(samples))
+        summary['cpu_ms_per_request'] = round(cpu / len(samples) * 1000, 3)
+        summary['mean_bytes'] = round(sum(sizes) / len(sizes))
+        results[fmt] = summary
+
+    baseline = results.get('png')
+    if baseline:
+        for summary in results.values():
+            summary['cpu_vs_png'] = (
+                round(summary['cpu_ms_per_request'] / baseline['cpu_ms_per_request'], 4)
+                if baseline['cpu_ms_per_request'] else None
+            )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--formats', default='png,svg,mmd', help='Comma separated output formats')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/backends-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env()
+    results = run(args.iterations, tuple(args.formats.split(',')))
+    for fmt, summary in results.items():
+        print(f"{fmt}: {summary['mean_ms']} ms, {summary['cpu_ms_per_request']} ms CPU, {summary['mean_bytes']} bytes")
+    write_results('backends', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
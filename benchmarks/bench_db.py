@@ -0,0 +1,155 @@
+"""Concurrent SQLite writers following the /generate transaction pattern.
+
+Each writer thread repeats: insert a pending row, wait ``--stage-latency``
+seconds (standing in for the LLM and render stages), then mark the row
+completed. A reader thread meanwhile pages through /history-style queries.
+
+Scenarios:
+
+* ``held``: a transaction with an uncommitted status change stays open (and
+  keeps its pooled connection) across the slow stages
+* ``released``: the current path, which commits before the slow stages
+
+Each scenario runs with the rollback journal (``DELETE``/``FULL``) and with
+``WAL``/``NORMAL``.
+
+Run: python -m benchmarks.bench_db --writers 8,32 --requests 10
+"""
+import argparse
+import os
+import threading
+import time
+from benchmarks.common import setup_env, summarize, write_results
+
+JOURNALS = {'delete': ('DELETE', 'FULL'), 'wal': ('WAL', 'NORMAL')}
+
+
+def make_app(path, journal):
+    from app import create_app, db
+    from app.config import Config
+
+    journal_mode, synchronous = JOURNALS[journal]
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLITE_JOURNAL_MODE = journal_mode
+        SQLITE_SYNCHRONOUS = synchronous
+
+    if os.path.exists(path):
+        os.remove(path)
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        # journal_mode is stored in the file, so switch it back explicitly for DELETE runs
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql(f"PRAGMA journal_mode={journal_mode}")
+    return app
+
+
+def writer(app, requests, stage_latency, hold, samples, errors, lock):
+    from app import db
+    from app.models.diagram import DiagramRequest
+
+    for n in range(requests):
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                row = DiagramRequest(prompt=f"benchmark prompt {n}", status='pending')
+                db.session.add(row)
+                db.session.commit()
+                if hold:
+                    # Re-read and flag the row without committing until the stages finish
+                    db.session.execute(
+                        db.select(DiagramRequest.prompt).where(DiagramRequest.id == row.id)
+                    ).scalar()
+                    db.session.execute(
+                        db.update(DiagramRequest).where(DiagramRequest.id == row.id).values(status='processing')
+                    )
+                time.sleep(stage_latency)
+                row = db.session.get(DiagramRequest, row.id)
+                row.status = 'completed'
+                row.diagram_code = 'x' * 1000
+                db.session.commit()
+                db.session.remove()
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        with lock:
+            samples.append(time.perf_counter() - start - stage_latency)
+
+
+def reader(app, stop, samples):
+    from app import db
+    from app.models.diagram import DiagramRequest
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        with app.app_context():
+            db.session.execute(
+                db.select(DiagramRequest.id, DiagramRequest.status)
+                .order_by(DiagramRequest.created_at.desc(), DiagramRequest.id.desc())
+                .limit(50)
+            ).all()
+            db.session.remove()
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+
+def scenario(workdir, journal, hold, writers, requests, stage_latency):
+    app = make_app(os.path.join(workdir, f"writers-{journal}-{hold}.db"), journal)
+    samples, read_samples, errors = [], [], {}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    read_thread = threading.Thread(target=reader, args=(app, stop, read_samples))
+    threads = [
+        threading.Thread(target=writer, args=(app, requests, stage_latency, hold, samples, errors, lock))
+        for _ in range(writers)
+    ]
+    start = time.perf_counter()
+    read_thread.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    read_thread.join()
+
+    # Latencies exclude the simulated stage, so they show time spent waiting on the database
+    result = {
+        'db_overhead': summarize(samples, elapsed),
+        'reads': summarize(read_samples),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 2),
+    }
+    return result
+
+
+def run(writer_counts=(8, 32), requests=10, stage_latency=0.2, workdir=None):
+    results = {}
+    for writers in writer_counts:
+        for journal in JOURNALS:
+            for hold in (True, False):
+                name = f"{writers}_writers.{journal}.{'held' if hold else 'released'}"
+                results[name] = scenario(workdir, journal, hold, writers, requests, stage_latency)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', default='8,32', help='Comma separated writer thread counts')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per writer')
+    parser.add_argument('--stage-latency', type=float, default=0.2, help='Simulated LLM+render seconds')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/db-<time>.json)')
+    args = parser.parse_args(argv)
+
+    workdir = setup_env()
+    writer_counts = [int(writers) for writers in args.writers.split(',')]
+    results = run(writer_counts, args.requests, args.stage_latency, workdir)
+    write_results('db', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
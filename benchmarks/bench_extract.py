@@ -0,0 +1,48 @@
+"""Code extraction and parsing cost on large diagram code.
+
+Times ``DiagramService._extract_diagram_content`` (the regex extraction used by
+the exec renderer), ``GeminiService._extract_code`` on a fenced model reply and
+``parse_diagram_code`` for diagrams of increasing size.
+
+Run: python -m benchmarks.bench_extract --sizes 10,100,1000,5000
+"""
+import argparse
+from benchmarks.common import setup_env, summarize, time_calls, write_results
+
+
+def run(sizes=(10, 100, 1000, 5000), iterations=20):
+    from app.services.diagram_model import parse_diagram_code
+    from app.services.diagram_service import DiagramService
+    from app.services.gemini_service import GeminiService
+    from benchmarks.corpus import large_code
+
+    results = {}
+    for size in sizes:
+        code = large_code(size)
+        reply = f"Here is your diagram:\n```python\n{code}\n```\nIt has {size} web servers."
+        results[str(size)] = {
+            'code_bytes': len(code),
+            'extract_diagram_content': summarize(
+                time_calls(lambda: DiagramService._extract_diagram_content(code), iterations)),
+            'extract_code': summarize(
+                time_calls(lambda: GeminiService._extract_code(reply), iterations)),
+            'parse_model': summarize(
+                time_calls(lambda: parse_diagram_code(code), iterations)),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,5000', help='Comma separated node counts')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/extract-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    write_results('extract', run(sizes, args.iterations), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""End-to-end ``POST /api/diagrams/generate`` under N concurrent clients.
+
+By default requests go through the Flask test client in-process; pass ``--url``
+to load-test a running server instead. The fake model's latency is set with
+``--llm-latency`` so runs are repeatable without network access.
+
+Run: python -m benchmarks.bench_generate --clients 1,4,16 --requests 50
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import setup_env, summarize, write_results
+
+
+def make_sender(url=None):
+    """Return ``send(payload) -> status_code`` for the in-process app or a live server."""
+    if url:
+        import requests
+        session_local = threading.local()
+
+        def send(payload):
+            session = getattr(session_local, 'session', None)
+            if session is None:
+                session = session_local.session = requests.Session()
+            return session.post(f"{url.rstrip('/')}/api/diagrams/generate", json=payload, timeout=120).status_code
+        return send
+
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    return lambda payload: client.post('/api/diagrams/generate', json=payload).status_code
+
+
+def load(send, prompts, clients, requests_per_client):
+    samples = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client_loop(index):
+        for n in range(requests_per_client):
+            prompt = prompts[(index * requests_per_client + n) % len(prompts)]
+            start = time.perf_counter()
+            try:
+                status = send({'prompt': prompt})
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client_loop, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(samples, elapsed)
+    summary['statuses'] = statuses
+    summary['errors'] = sum(count for status, count in statuses.items() if status != '200')
+    return summary
+
+
+def run(client_counts=(1, 4, 16), requests_per_client=20, url=None, freeform=True):
+    from benchmarks.corpus import PROMPTS, STOCK_PROMPTS
+
+    send = make_sender(url)
+    prompts = PROMPTS if freeform else STOCK_PROMPTS
+    send({'prompt': prompts[0]})  # warm up the renderer pool and connections
+
+    return {
+        str(clients): load(send, prompts, clients, requests_per_client)
+        for clients in client_counts
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', default='1,4,16', help='Comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Fake model latency in seconds')
+    parser.add_argument('--stock-only', action='store_true', help='Only send prompts the fast path answers')
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process test client)')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/generate-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env(FAKE_LLM_LATENCY=args.llm_latency)
+    client_counts = [int(clients) for clients in args.clients.split(',')]
+    results = run(client_counts, args.requests, args.url, not args.stock_only)
+    write_results('generate', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
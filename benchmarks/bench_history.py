@@ -0,0 +1,111 @@
+"""``GET /api/diagrams/history`` latency on SQLite tables of 10k to 1M rows.
+
+Each table size gets its own database file in the work directory; seeded files
+are reused by later runs with the same ``--workdir``.
+
+Run: python -m benchmarks.bench_history --rows 10000,100000,1000000
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import setup_env, summarize, time_calls, write_results
+
+SEED_CHUNK = 10000
+STATUSES = ('completed', 'completed', 'completed', 'failed', 'pending')
+
+
+def seed(app, rows):
+    """Fill the diagram table with ``rows`` requests unless it already has them."""
+    from app import db
+    from app.models.diagram import DiagramRequest
+    from benchmarks.corpus import PROMPTS, code_samples
+
+    codes = list(code_samples().values())
+    with app.app_context():
+        db.create_all()
+        existing = db.session.query(db.func.count(DiagramRequest.id)).scalar()
+        if existing == rows:
+            return 0.0
+
+        start = time.perf_counter()
+        db.session.query(DiagramRequest).delete()
+        table = DiagramRequest.__table__
+        base = datetime.utcnow() - timedelta(seconds=rows)
+        for offset in range(0, rows, SEED_CHUNK):
+            db.session.execute(table.insert(), [
+                {
+                    'prompt': PROMPTS[n % len(PROMPTS)],
+                    'diagram_code': codes[n % len(codes)],
+                    'created_at': base + timedelta(seconds=n),
+                    'status': STATUSES[n % len(STATUSES)],
+                    'image_sha256': f"{n:064x}",
+                    'image_format': 'png',
+                }
+                for n in range(offset, min(offset + SEED_CHUNK, rows))
+            ])
+        db.session.commit()
+        return time.perf_counter() - start
+
+
+def walk(client, url, pages):
+    """Follow ``next_cursor`` for ``pages`` pages, timing each request."""
+    samples = []
+    cursor = None
+    for _ in range(pages):
+        page_url = f"{url}&cursor={cursor}" if cursor else url
+        start = time.perf_counter()
+        response = client.get(page_url)
+        body = response.get_json()
+        samples.append(time.perf_counter() - start)
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    return samples
+
+
+def run(row_counts=(10000, 100000), iterations=20, workdir=None):
+    from app import create_app
+    from app.config import Config
+
+    results = {}
+    for rows in row_counts:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, f'history-{rows}.db')}"
+
+        app = create_app(BenchConfig)
+        seed_seconds = seed(app, rows)
+        client = app.test_client()
+        get = lambda url: client.get(url).get_json()
+
+        results[str(rows)] = {
+            'seed_seconds': round(seed_seconds, 2),
+            'first_page': summarize(time_calls(lambda: get('/api/diagrams/history'), iterations)),
+            'first_page_id_status': summarize(
+                time_calls(lambda: get('/api/diagrams/history?fields=id,status'), iterations)),
+            'first_page_failed_only': summarize(
+                time_calls(lambda: get('/api/diagrams/history?status=failed'), iterations)),
+            'cursor_walk_50_pages': summarize(walk(client, '/api/diagrams/history?limit=50', 50)),
+            'streamed_page_1000': summarize(
+                time_calls(lambda: get('/api/diagrams/history?limit=1000&fields=id,prompt,status'), iterations)),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10000,100000', help='Comma separated table sizes')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--workdir', help='Directory for the seeded databases (default: a new temp dir)')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/history-<time>.json)')
+    args = parser.parse_args(argv)
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+    workdir = setup_env(args.workdir)
+    row_counts = [int(rows) for rows in args.rows.split(',')]
+    write_results('history', run(row_counts, args.iterations, workdir), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""PNG post-processing: bytes saved and time per stage.
+
+Renders each corpus diagram (and a large generated one) to PNG, then times
+lossless recompression, palette quantization and thumbnail encoding on it.
+Needs Graphviz and Pillow.
+
+Run: python -m benchmarks.bench_images --iterations 5 --nodes 200
+"""
+import argparse
+from benchmarks.common import setup_env, summarize, time_calls, write_results
+
+
+def run(iterations=5, nodes=200, thumbnail_size=320):
+    from app.services.diagram_service import DiagramService
+    from app.services.image_processing import make_thumbnail, optimize_png
+    from benchmarks.corpus import code_samples, large_code
+
+    samples = code_samples()
+    samples[f'large_{nodes}'] = large_code(nodes)
+    results = {}
+    for name, code in samples.items():
+        png = DiagramService.render_diagram(code, 0, 'png')
+        optimized = optimize_png(png)
+        quantized = optimize_png(png, quantize=True)
+        results[name] = {
+            'png_bytes': len(png),
+            'optimized_bytes': len(optimized),
+            'quantized_bytes': len(quantized),
+            'saved_ratio': round(1 - len(optimized) / len(png), 3),
+            'quantized_saved_ratio': round(1 - len(quantized) / len(png), 3),
+            'optimize': summarize(time_calls(lambda: optimize_png(png), iterations)),
+            'quantize': summarize(time_calls(lambda: optimize_png(png, quantize=True), iterations)),
+        }
+        for fmt in ('webp', 'png'):
+            thumbnail = make_thumbnail(optimized, thumbnail_size, fmt)
+            results[name][f'thumbnail_{fmt}_bytes'] = len(thumbnail)
+            results[name][f'thumbnail_{fmt}'] = summarize(
+                time_calls(lambda: make_thumbnail(optimized, thumbnail_size, fmt), iterations))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--nodes', type=int, default=200, help='Size of the large generated diagram')
+    parser.add_argument('--thumbnail-size', type=int, default=320)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/images-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env(RENDER_CACHE_ENABLED='false')
+    write_results('images', run(args.iterations, args.nodes, args.thumbnail_size), args.output)
+
+
+if __name__ == '__main__':
+    main()
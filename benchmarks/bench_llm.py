@@ -0,0 +1,76 @@
+"""Model call latency and success rate under injected faults.
+
+Calls the fake model through ``ResilientModel`` with a share of failing and
+slow calls, comparing no protection, retries only, and retries plus hedging
+(after a fixed delay and after the observed p95). Latency covers the whole
+call including retries; failed calls are counted separately.
+
+Run: python -m benchmarks.bench_llm --calls 200 --error-rate 0.1 --slow-rate 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import setup_env, summarize, write_results
+
+SCENARIOS = {
+    'unprotected': {'max_retries': 0, 'hedge_after': ''},
+    'retries': {'max_retries': 2, 'hedge_after': ''},
+    'retries_hedge_fixed': {'max_retries': 2, 'hedge_after': '0.2'},
+    'retries_hedge_p95': {'max_retries': 2, 'hedge_after': 'p95'},
+}
+
+
+def run(calls=200, concurrency=8, latency=0.05, error_rate=0.1, slow_rate=0.05, slow_latency=2.0, timeout=5.0):
+    from app.services.llm_clients import FakeGenerativeModel
+    from app.services.resilience import CircuitBreaker, LLMCallError, ResilientModel
+
+    results = {}
+    for name, options in SCENARIOS.items():
+        model = ResilientModel(
+            FakeGenerativeModel(latency=latency, error_rate=error_rate, slow_rate=slow_rate,
+                                slow_latency=slow_latency),
+            timeout=timeout,
+            backoff_base=0.05,
+            # Injected errors are independent, so keep the breaker out of the comparison
+            breaker=CircuitBreaker(failure_threshold=calls + 1),
+            **options
+        )
+
+        def call(_):
+            start = time.perf_counter()
+            try:
+                model.generate_content('benchmark prompt')
+                return time.perf_counter() - start, True
+            except LLMCallError:
+                return time.perf_counter() - start, False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(call, range(calls)))
+        elapsed = time.perf_counter() - start
+
+        summary = summarize([seconds for seconds, ok in outcomes if ok], elapsed)
+        summary['failures'] = sum(1 for _, ok in outcomes if not ok)
+        summary['model_calls'] = model.model.calls
+        results[name] = summary
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help='Normal model latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.1)
+    parser.add_argument('--slow-rate', type=float, default=0.05)
+    parser.add_argument('--slow-latency', type=float, default=2.0)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/llm-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env()
+    write_results('llm', run(args.calls, args.concurrency, args.latency, args.error_rate,
+                             args.slow_rate, args.slow_latency), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Prompt size and latency of the old inline prompt vs the system-instruction prompt.
+
+Counts input tokens per request for every prompt in the corpus with a local
+tokenizer (tiktoken's cl100k_base when installed, otherwise a word/punctuation
+approximation); the system instruction is counted on every request, as Gemini
+bills it that way. With ``--live`` both variants
+are also sent to Gemini (``GEMINI_API_KEY``, ``GEMINI_MODEL``) to compare call
+latency and the share of replies that pass code validation.
+
+Run: python -m benchmarks.bench_prompt [--live --limit 10]
+"""
+import argparse
+import re
+import time
+from benchmarks.common import setup_env, summarize, write_results
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\s{2,}")
+
+
+def count_tokens(text):
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding('cl100k_base').encode(text))
+    # Words, punctuation and runs of whitespace each count as roughly one BPE token
+    return len(_TOKEN_RE.findall(text))
+
+
+class LegacyPrompt:
+    """``GeminiService._build_prompt`` as it was before the system instruction, kept verbatim."""
+
+    def _build_prompt(self, prompt):
+        system_prompt = """
+        You are a Python code generator for architecture diagrams. Generate code using the 'diagrams' package.
+        
+        Follow this EXACT template and replace the placeholder content:
+
+        from diagrams import Diagram, Cluster
+        from diagrams.aws.compute import EC2
+        from diagrams.aws.database import RDS
+        from diagrams.aws.network import ELB, VPC
+        from diagrams.aws.network import PrivateSubnet, PublicSubnet
+
+        def generate_diagram():
+            with Diagram("AWS Architecture", direction="LR"):
+                with Cluster("VPC"):
+                    with Cluster("Public Subnet"):
+                        lb = ELB("Load Balancer")
+                    
+                    with Cluster("Private Subnet"):
+                        web = [
+                            EC2("Web Server 1"),
+                            EC2("Web Server 2")
+                        ]
+                    
+                    with Cluster("Database Subnet"):
+                        db = RDS("Database")
+                    
+                    # Connect components
+                    lb >> web >> db
+
+        if __name__ == "__main__":
+            generate_diagram()
+
+        IMPORTANT RULES:
+        1. Always include ONLY the necessary imports shown above
+        2. Always wrap diagram creation in a function called generate_diagram()
+        3. Always use Cluster for grouping related components
+        4. Always use meaningful names for components
+        5. Always connect components using >>
+        6. Always include the if __name__ == "__main__" block
+        7. Return ONLY the Python code, no explanations
+        """
+
+        example_prompt = """
+        Here's an example prompt and how to modify the template:
+        
+        Prompt: "Create AWS architecture with ALB, 2 EC2 instances, and RDS"
+        
+        Modifications needed:
+        1. Keep the imports exactly as shown
+        2. Update component names to match the prompt
+        3. Update the connections to reflect the architecture
+        4. Keep the basic structure intact
+        """
+
+        full_prompt = f"""
+        # {system_prompt}
+
+        # {example_prompt}
+
+        # Now, generate a diagram based on this prompt: {prompt}
+        # Modify ONLY the components, names, and connections while keeping the exact same structure.
+        # Return ONLY the Python code.
+        """
+        return full_prompt
+
+
+def _live(variants, prompts):
+    import google.generativeai as genai
+    from app.config import Config
+    from app.services.gemini_service import SYSTEM_INSTRUCTION, GeminiService
+
+    genai.configure(api_key=Config.GEMINI_API_KEY)
+    models = {
+        'legacy': genai.GenerativeModel(Config.GEMINI_MODEL),
+        'system_instruction': genai.GenerativeModel(Config.GEMINI_MODEL, system_instruction=SYSTEM_INSTRUCTION),
+    }
+    results = {}
+    for name, build in variants.items():
+        samples, valid = [], 0
+        for prompt in prompts:
+            start = time.perf_counter()
+            try:
+                text = models[name].generate_content(build(prompt)).text
+            except ValueError:  # blocked reply with no text
+                text = ''
+            samples.append(time.perf_counter() - start)
+            valid += GeminiService._extract_code(text) is not None
+        results[name] = {'latency': summarize(samples), 'valid_ratio': valid / len(prompts)}
+    return results
+
+
+def run(live=False, limit=None):
+    from app.services.gemini_service import SYSTEM_INSTRUCTION, GeminiService
+    from app.services.llm_clients import FakeGenerativeModel
+    from benchmarks.corpus import PROMPTS
+
+    prompts = PROMPTS[:limit] if limit else PROMPTS
+    service = GeminiService(model=FakeGenerativeModel(), cache=False, fast_path=False)
+    service._prefix = ''  # as built for a model holding the system instruction
+    variants = {'legacy': LegacyPrompt()._build_prompt, 'system_instruction': service._build_prompt}
+
+    # Gemini still bills the system instruction on every call, so count it per request
+    instruction_tokens = count_tokens(SYSTEM_INSTRUCTION)
+    results = {'tokenizer': 'tiktoken/cl100k_base' if tiktoken is not None else 'approximate'}
+    for name, build in variants.items():
+        extra = instruction_tokens if name == 'system_instruction' else 0
+        tokens = [count_tokens(build(prompt)) + extra for prompt in prompts]
+        results[name] = {
+            'mean_input_tokens': round(sum(tokens) / len(tokens), 1),
+            'max_input_tokens': max(tokens),
+        }
+    results['system_instruction']['instruction_tokens'] = instruction_tokens
+    results['token_reduction'] = round(
+        1 - results['system_instruction']['mean_input_tokens'] / results['legacy']['mean_input_tokens'], 3)
+    if live:
+        results['live'] = _live(variants, prompts)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--live', action='store_true', help='Also call Gemini with both prompts')
+    parser.add_argument('--limit', type=int, help='Only use the first N corpus prompts')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/prompt-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env(**({'LLM_BACKEND': 'gemini'} if args.live else {}))
+    write_results('prompt', run(args.live, args.limit), args.output)
+
+
+if __name__ == '__main__':
+    main()
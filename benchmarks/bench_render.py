@@ -0,0 +1,63 @@
+"""Cold vs warm ``DiagramService.generate_diagram`` latency.
+
+* cold: the first render in a fresh process, which pays for starting the
+  renderer pool (or importing diagrams in a subprocess)
+* warm: repeat renders with the render cache disabled
+* cached: repeat renders served from the render cache
+
+Run: python -m benchmarks.bench_render --iterations 20
+"""
+import argparse
+import time
+from benchmarks.common import setup_env, summarize, time_calls, write_results
+
+
+def run(iterations=20, renderers=('model', 'exec')):
+    from app.config import Config
+    from app.services.diagram_service import DiagramService
+    from benchmarks.corpus import code_samples
+
+    samples = code_samples()
+    results = {}
+    for renderer in renderers:
+        Config.DIAGRAM_RENDERER = renderer
+        Config.RENDER_CACHE_ENABLED = False
+        codes = list(samples.values())
+
+        start = time.perf_counter()
+        DiagramService.generate_diagram(codes[0], 0)
+        cold = time.perf_counter() - start
+
+        counter = iter(range(iterations * len(codes)))
+        warm = time_calls(
+            lambda: DiagramService.generate_diagram(codes[next(counter) % len(codes)], 0),
+            iterations
+        )
+
+        Config.RENDER_CACHE_ENABLED = True
+        DiagramService.generate_diagram(codes[0], 0)
+        cached = time_calls(lambda: DiagramService.generate_diagram(codes[0], 0), iterations)
+
+        results[renderer] = {
+            'cold_ms': round(cold * 1000, 3),
+            'warm': summarize(warm, sum(warm)),
+            'cached': summarize(cached, sum(cached)),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--renderer', action='append', choices=['model', 'exec'],
+                        help='Renderer to measure; repeat for several (default: both)')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/render-<time>.json)')
+    args = parser.parse_args(argv)
+
+    setup_env()
+    results = run(args.iterations, tuple(args.renderer or ('model', 'exec')))
+    write_results('render', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Cold start of the app factory: import breakdown and time to the first request.
+
+Each sample runs in a fresh interpreter. ``create_app`` and the first request
+(which builds the model clients) are timed with and without ``PREWARM``, and
+one ``python -X importtime`` run is summarized as self time per top-level
+package, so a new eager import of a heavy dependency shows up directly.
+
+Run: python -m benchmarks.bench_startup --runs 5 [--backend gemini]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from benchmarks.common import setup_env, summarize, write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+app.test_client().get('/api/diagrams/stats')
+print(json.dumps({'create_app': created - start, 'first_request': time.perf_counter() - created}))
+"""
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def _run_child(code, env, *flags):
+    result = subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def import_breakdown(env, top=15):
+    """Self time of every imported module, summed per top-level package, in ms."""
+    stderr = _run_child('from app import create_app; create_app()', env, '-X', 'importtime').stderr
+    packages = {}
+    total = 0
+    for self_us, cumulative_us, indent, name in _IMPORTTIME_RE.findall(stderr):
+        root = name.split('.')[0]
+        packages[root] = packages.get(root, 0) + int(self_us)
+        if not indent:
+            total += int(cumulative_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        'total_ms': round(total / 1000, 1),
+        'by_package_ms': {name: round(us / 1000, 1) for name, us in ranked},
+    }
+
+
+def run(runs=5):
+    results = {}
+    for prewarm in (False, True):
+        env = {**os.environ, 'PREWARM': str(prewarm).lower()}
+        samples = {'create_app': [], 'first_request': []}
+        for _ in range(runs):
+            timings = json.loads(_run_child(CHILD, env).stdout.strip().splitlines()[-1])
+            for key, value in timings.items():
+                samples[key].append(value)
+        results['prewarm' if prewarm else 'lazy'] = {key: summarize(values) for key, values in samples.items()}
+    results['imports'] = import_breakdown({**os.environ, 'PREWARM': 'false'})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--backend', default='gemini', help="LLM_BACKEND to start with ('gemini' or 'fake')")
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/startup-<time>.json)')
+    args = parser.parse_args(argv)
+
+    # Building the Gemini client needs no network, so the real SDK import cost is measured
+    setup_env(LLM_BACKEND=args.backend)
+    write_results('startup', run(args.runs), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Requests/sec of the gunicorn deployment against its worker count.
+
+For each ``--workers`` value gunicorn is started with gunicorn.conf.py (preloaded
+app, ``GUNICORN_THREADS`` threads per worker) on a history table seeded with
+``--rows`` requests. ``--clients`` keep-alive connections, spread over
+``--client-procs`` load-generator processes, then hit ``--path`` for
+``--duration`` seconds. The load generator runs on the same machine and takes
+its share of the CPUs, so leave some free when comparing high worker counts.
+
+Run: python -m benchmarks.bench_workers --workers 1,2,4,8 --clients 64 --duration 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from benchmarks.bench_asgi import REPO_ROOT, free_port
+from benchmarks.common import setup_env, summarize, write_results
+
+DEFAULT_PATH = '/api/diagrams/history?limit=20&fields=id,prompt,status,created_at'
+
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not become ready")
+
+
+def _client_process(port, path, connections, duration):
+    """Run ``connections`` looping clients for ``duration`` seconds; return (samples, statuses)."""
+    samples = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local, codes = [], {}
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close()
+            local.append(time.perf_counter() - start)
+            codes[status] = codes.get(status, 0) + 1
+        conn.close()
+        with lock:
+            samples.extend(local)
+            for status, count in codes.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, statuses
+
+
+def load(port, path, clients, client_procs, duration):
+    per_proc = [clients // client_procs + (1 if i < clients % client_procs else 0) for i in range(client_procs)]
+    with multiprocessing.get_context('spawn').Pool(client_procs) as pool:
+        start = time.perf_counter()
+        parts = pool.starmap(_client_process, [(port, path, n, duration) for n in per_proc if n])
+        elapsed = time.perf_counter() - start
+
+    samples, statuses = [], {}
+    for part_samples, part_statuses in parts:
+        samples.extend(part_samples)
+        for status, count in part_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    summary = summarize(samples, elapsed)
+    summary['statuses'] = statuses
+    summary['errors'] = sum(count for status, count in statuses.items() if status != '200')
+    return summary
+
+
+def run_workers(workers, port, args):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(args.threads))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}",
+         '--log-level', 'warning', 'run:app'],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(port, server)
+        load(port, args.path, args.clients, args.client_procs, min(args.duration, 2))  # warm-up
+        return load(port, args.path, args.clients, args.client_procs, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, max(1, cpus // 2), cpus})
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help='Comma separated worker counts')
+    parser.add_argument('--threads', type=int, default=1, help='Threads per worker')
+    parser.add_argument('--clients', type=int, default=64, help='Concurrent keep-alive connections')
+    parser.add_argument('--client-procs', type=int, default=max(1, cpus // 4), help='Load generator processes')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per worker count')
+    parser.add_argument('--rows', type=int, default=1000, help='History rows to seed')
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/workers-<time>.json)')
+    args = parser.parse_args(argv)
+
+    workdir = setup_env()
+    from app import create_app
+    from benchmarks.bench_history import seed
+    seed(create_app(), args.rows)
+
+    results = {}
+    for workers in (int(w) for w in args.workers.split(',')):
+        results[str(workers)] = run_workers(workers, free_port(), args)
+        print(f"{workers} workers: {results[str(workers)]['throughput_per_s']} req/s")
+
+    baseline = next(iter(results.values()))['throughput_per_s']
+    for summary in results.values():
+        summary['speedup'] = round(summary['throughput_per_s'] / baseline, 2) if baseline else None
+    write_results('workers', {
+        'cpu_count': cpus,
+        'threads_per_worker': args.threads,
+        'clients': args.clients,
+        'path': args.path,
+        'workers': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def setup_env(workdir=None, **overrides):
+    """Point the app at the fake model and throwaway storage.
+
+    Must run before anything under ``app`` is imported, because ``Config`` reads
+    the environment at import time. Returns the scratch directory.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix='diagram-bench-')
+    defaults = {
+        'LLM_BACKEND': 'fake',
+        'FAKE_LLM_LATENCY': '0',
+        'LLM_CACHE_ENABLED': 'false',
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'RENDER_CACHE_DIR': os.path.join(workdir, 'render-cache'),
+        'ARTIFACT_DIR': os.path.join(workdir, 'artifacts'),
+        'LOG_LEVEL': 'WARNING',
+    }
+    for key, value in {**defaults, **overrides}.items():
+        os.environ.setdefault(key, str(value))
+    return workdir
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples, elapsed=None):
+    """Latency summary in milliseconds; throughput is per second of ``elapsed`` wall time."""
+    ordered = sorted(samples)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    summary = {
+        'count': len(ordered),
+        'min_ms': ms(ordered[0]) if ordered else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+    }
+    if elapsed:
+        summary['throughput_per_s'] = round(len(ordered) / elapsed, 2)
+    return summary
+
+
+def time_calls(func, iterations):
+    """Call ``func`` ``iterations`` times and return the per-call durations in seconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def peak_rss_mb():
+    """Peak RSS of this process and of its reaped children (render subprocesses), in MB."""
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+    }
+
+
+def write_results(name, results, output=None):
+    """Write ``results`` with run metadata as JSON and return the file path."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    document = {
+        'benchmark': name,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment(),
+        'peak_rss_mb': peak_rss_mb(),
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    print(f"Wrote {output}")
+    return output
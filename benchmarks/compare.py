@@ -0,0 +1,60 @@
+"""Compare two benchmark result files and flag latency regressions.
+
+Every ``p50_ms``/``p95_ms``/``p99_ms``/``cold_ms`` value found in both files is
+compared; the exit status is 1 when any of them got slower than the threshold.
+
+Run: python -m benchmarks.compare baseline.json candidate.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+COMPARED_KEYS = ('p50_ms', 'p95_ms', 'p99_ms', 'cold_ms')
+
+
+def flatten(results, prefix=''):
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif key in COMPARED_KEYS and isinstance(value, (int, float)):
+            values[path] = value
+    return values
+
+
+def compare(baseline, candidate, threshold):
+    """Return ``(path, old, new, change)`` rows for every metric present in both runs."""
+    old_values = flatten(baseline['results'])
+    new_values = flatten(candidate['results'])
+    rows = []
+    for path in sorted(old_values.keys() & new_values.keys()):
+        old, new = old_values[path], new_values[path]
+        change = (new - old) / old if old else 0.0
+        rows.append((path, old, new, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown, 0.2 = 20%%')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    regressions = 0
+    for path, old, new, change, regressed in compare(baseline, candidate, args.threshold):
+        marker = 'REGRESSION' if regressed else ''
+        print(f"{path:70} {old:>10.2f} {new:>10.2f} {change:>+8.1%} {marker}")
+        regressions += regressed
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
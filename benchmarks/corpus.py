@@ -0,0 +1,80 @@
+"""Representative prompts and diagram code shared by the benchmarks."""
+from itertools import zip_longest
+
+# Prompts the template fast path can answer without the model
+STOCK_PROMPTS = [
+    "ALB, 2 EC2, RDS",
+    "Create a load balancer with two web servers and a database",
+    "three EC2 instances behind an application load balancer",
+    "simple aws architecture with elb and rds",
+    "an ALB connected to 4 app servers and a postgres database",
+]
+
+# Prompts that always need the model
+FREEFORM_PROMPTS = [
+    "Create an AWS architecture with an ALB, two EC2 instances in private subnets, and an RDS database",
+    "Show a three tier web application with a bastion host and a read replica",
+    "Draw a VPC with public and private subnets, NAT gateway and an autoscaling group of web servers",
+    "Design a highly available setup across two availability zones with a multi-AZ database",
+    "A web tier of five servers behind a load balancer writing to a primary database with a standby",
+    "Generate a diagram for a blog platform: load balancer, application servers, MySQL",
+    "Architecture for an internal API with a private load balancer and two backend instances",
+    "Make me a basic LAMP stack on AWS",
+]
+
+# Interleaved so that any prefix of the list has both kinds of prompt
+PROMPTS = [prompt for pair in zip_longest(FREEFORM_PROMPTS, STOCK_PROMPTS) for prompt in pair if prompt]
+
+
+def large_code(nodes, per_cluster=25):
+    """Valid diagram code with ``nodes`` EC2 nodes spread over subnets behind one ALB."""
+    lines = [
+        'from diagrams import Diagram, Cluster',
+        'from diagrams.aws.compute import EC2',
+        'from diagrams.aws.database import RDS',
+        'from diagrams.aws.network import ALB, VPC',
+        '',
+        'def generate_diagram():',
+        '    with Diagram("AWS Architecture", direction="LR"):',
+        '        with Cluster("VPC"):',
+        '            with Cluster("Public Subnet"):',
+        '                lb = ALB("Load Balancer")',
+        '',
+        '            with Cluster("Database Subnet"):',
+        '                db = RDS("Database")',
+    ]
+    for start in range(0, nodes, per_cluster):
+        group = start // per_cluster
+        lines.append('')
+        lines.append(f'            with Cluster("Private Subnet {group + 1}"):')
+        lines.append(f'                group_{group} = [')
+        for n in range(start, min(start + per_cluster, nodes)):
+            lines.append(f'                    EC2("Web Server {n + 1}"),')
+        lines.append('                ]')
+        lines.append(f'            lb >> group_{group}')
+        lines.append(f'            for node in group_{group}:')
+        lines.append('                node >> db')
+    lines.extend([
+        '',
+        'if __name__ == "__main__":',
+        '    generate_diagram()',
+    ])
+    return '\n'.join(lines)
+
+
+def code_samples():
+    """Named diagram scripts: the fake model reply, the default template and fast-path output."""
+    from app.services.gemini_service import GeminiService
+    from app.services.llm_clients import FAKE_DIAGRAM_CODE, FakeGenerativeModel
+    from app.services.template_generator import TemplateDiagramGenerator
+
+    generator = TemplateDiagramGenerator()
+    service = GeminiService(model=FakeGenerativeModel(), cache=False, fast_path=False)
+    samples = {
+        'fake_model': FAKE_DIAGRAM_CODE,
+        'default_template': service._generate_default_template(''),
+    }
+    for index, prompt in enumerate(STOCK_PROMPTS):
+        samples[f'fast_path_{index}'] = generator.try_generate(prompt)
+    samples['large_100'] = large_code(100)
+    return samples
@@ -0,0 +1,33 @@
+"""Run every benchmark with quick defaults and write one combined result file.
+
+Run: python -m benchmarks.run [--quick] [--output results.json]
+"""
+import argparse
+from benchmarks import (
+    bench_backends, bench_extract, bench_generate, bench_history, bench_llm, bench_render, bench_startup
+)
+from benchmarks.common import setup_env, write_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes for a smoke run')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/all-<time>.json)')
+    args = parser.parse_args(argv)
+
+    iterations = 5 if args.quick else 20
+    workdir = setup_env(FAKE_LLM_LATENCY=0.1 if args.quick else 0.5)
+    results = {
+        'render': bench_render.run(iterations),
+        'extract': bench_extract.run((10, 100, 1000) if args.quick else (10, 100, 1000, 5000), iterations),
+        'history': bench_history.run((1000,) if args.quick else (10000, 100000), iterations, workdir),
+        'generate': bench_generate.run((1, 4) if args.quick else (1, 4, 16), iterations),
+        'llm': bench_llm.run(50 if args.quick else 200),
+        'startup': bench_startup.run(2 if args.quick else 5),
+        'backends': bench_backends.run(2 if args.quick else 10),
+    }
+    write_results('all', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
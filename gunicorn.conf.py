@@ -0,0 +1,66 @@
+# Gunicorn settings: `gunicorn -c gunicorn.conf.py run:app`
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5000')
+# One worker per core; each worker gets its share of RENDER_CONCURRENCY and
+# RENDERER_POOL_SIZE (see post_fork), which are set for the whole host
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Time a worker gets to finish in-flight requests on restart/shutdown
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Replace each worker after this many requests, so slow leaks never build up; the
+# jitter keeps all workers from restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Heartbeat files on tmpfs, so a slow disk cannot get workers killed as hung
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Workers publish their metrics here so whichever one answers /metrics reports them all.
+# Set before the app is imported: Config reads it at import time
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'diagram-metrics-{os.getpid()}'))
+
+# Import the app once in the master and fork workers from it
+preload_app = True
+
+
+def on_starting(server):
+    # Counters left by workers of an earlier run would be added to this one's
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+    # The app factory loads heavy dependencies lazily; pull them in before forking
+    # so every worker starts with them already imported
+    from app import prewarm
+    prewarm()
+
+
+def post_fork(server, worker):
+    # Pooled connections must never be shared across processes; drop any the
+    # master may have opened without closing them under its feet
+    from app import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    from app.config import Config, share_render_limits
+    from app.services.metrics import metrics
+    share_render_limits(server.cfg.workers)
+    metrics.share(Config.METRICS_DIR, Config.METRICS_SHARE_SECONDS)
+
+
+def worker_exit(server, worker):
+    # Leave the final counts behind; they stay in /metrics after the worker is replaced
+    from app.services.metrics import metrics
+    metrics.publish()
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
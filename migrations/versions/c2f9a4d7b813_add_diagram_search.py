@@ -0,0 +1,50 @@
+"""Add full-text search index over diagram_request
+
+Revision ID: c2f9a4d7b813
+Revises: f3b8d2e6a917
+Create Date: 2025-01-18 10:12:37.402518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f9a4d7b813'
+down_revision = 'f3b8d2e6a917'
+branch_labels = None
+depends_on = None
+
+# External-content FTS5 table kept in sync by triggers (same DDL as app.models.diagram.SEARCH_DDL).
+# Batch migrations rebuild diagram_request on SQLite and drop these triggers, so they
+# have to create them again.
+SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS diagram_search USING fts5("
+    "prompt, diagram_code, content='diagram_request', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS diagram_search_ai AFTER INSERT ON diagram_request BEGIN "
+    "INSERT INTO diagram_search(rowid, prompt, diagram_code) VALUES (new.id, new.prompt, new.diagram_code); END",
+    "CREATE TRIGGER IF NOT EXISTS diagram_search_ad AFTER DELETE ON diagram_request BEGIN "
+    "INSERT INTO diagram_search(diagram_search, rowid, prompt, diagram_code) "
+    "VALUES ('delete', old.id, old.prompt, old.diagram_code); END",
+    "CREATE TRIGGER IF NOT EXISTS diagram_search_au AFTER UPDATE OF prompt, diagram_code ON diagram_request BEGIN "
+    "INSERT INTO diagram_search(diagram_search, rowid, prompt, diagram_code) "
+    "VALUES ('delete', old.id, old.prompt, old.diagram_code); "
+    "INSERT INTO diagram_search(rowid, prompt, diagram_code) VALUES (new.id, new.prompt, new.diagram_code); END",
+)
+
+
+def upgrade():
+    # FTS5 is SQLite only; other databases fall back to LIKE matching in /search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in SEARCH_DDL:
+        op.execute(statement)
+    # Index the rows that already exist
+    op.execute("INSERT INTO diagram_search(diagram_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('diagram_search_ai', 'diagram_search_ad', 'diagram_search_au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS diagram_search")
@@ -1,26 +1,86 @@
+"""Start the API and the Streamlit frontend together.
+
+The API runs under gunicorn (settings in gunicorn.conf.py), by default as one
+threaded worker per CPU forked from an app preloaded in the master. Streamlit is started once
+``/readyz`` answers. Without gunicorn (e.g. on Windows) the threaded Flask
+server is used instead.
+
+Run: python run_all.py [--workers N] [--port 5000] [--no-frontend]
+"""
+import argparse
+import importlib.util
+import os
 import subprocess
 import sys
-import os
-from threading import Thread
 import time
+import urllib.error
+import urllib.request
 
-def run_flask():
-    os.environ['FLASK_APP'] = 'run.py'
-    subprocess.run([sys.executable, "-m", "flask", "run"])
 
-def run_streamlit():
-    # Wait a moment for Flask to start
-    time.sleep(2)
-    subprocess.run([
-        sys.executable, "-m", "streamlit", "run", 
-        "app/streamlit_app.py",
-        "--server.port", "8501"
-    ])
+def backend_command(host, port):
+    if importlib.util.find_spec('gunicorn') is not None and os.name != 'nt':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"{host}:{port}", 'run:app']
+    print("gunicorn is not installed; falling back to the single-process Flask server", file=sys.stderr)
+    return [sys.executable, '-m', 'flask', '--app', 'run', 'run', '--host', host, '--port', str(port), '--with-threads']
 
-if __name__ == "__main__":
-    # Start Flask in a separate thread
-    flask_thread = Thread(target=run_flask)
-    flask_thread.start()
 
-    # Run Streamlit in the main thread
-    run_streamlit() 
\ No newline at end of file
+def wait_until_ready(url, process, timeout=60):
+    """Poll the readiness probe until it returns 200; fail early if the server exits."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode} before becoming ready")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Backend was not ready at {url} after {timeout} seconds")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, help='Backend worker processes (default: one per CPU)')
+    parser.add_argument('--ready-timeout', type=float, default=60)
+    parser.add_argument('--no-frontend', action='store_true', help='Only run the backend')
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    backend = subprocess.Popen(backend_command(args.host, args.port), cwd=root, env=env)
+
+    api_url = f"http://{args.host}:{args.port}"
+    try:
+        wait_until_ready(f"{api_url}/readyz", backend, args.ready_timeout)
+        print(f"Backend ready at {api_url}")
+        if args.no_frontend:
+            backend.wait()
+        else:
+            subprocess.run([
+                sys.executable, "-m", "streamlit", "run",
+                "app/streamlit_app.py",
+                "--server.port", "8501"
+            ], cwd=root, env={**env, 'DIAGRAM_API_URL': api_url})
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # SIGTERM lets gunicorn finish in-flight requests before exiting
+        if backend.poll() is None:
+            backend.terminate()
+            try:
+                backend.wait(timeout=35)
+            except subprocess.TimeoutExpired:
+                backend.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+# Config reads the environment at import time, so point the app at the fake model
+# and throwaway storage before anything under ``app`` is imported
+_workdir = tempfile.mkdtemp(prefix='diagram-tests-')
+for key, value in {
+    'LLM_BACKEND': 'fake',
+    'FAKE_LLM_LATENCY': '0',
+    'DATABASE_URL': f"sqlite:///{os.path.join(_workdir, 'test.db')}",
+    'ARTIFACT_DIR': os.path.join(_workdir, 'artifacts'),
+    'RENDER_CACHE_DIR': os.path.join(_workdir, 'render-cache'),
+    'IMAGE_POSTPROCESS_ENABLED': 'false',
+    'LOG_LEVEL': 'WARNING',
+}.items():
+    os.environ.setdefault(key, value)
+
+import pytest  # noqa: E402
+from app import create_app, db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """A fresh app with empty tables."""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
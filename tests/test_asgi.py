@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+from app.asgi import DiagramASGIApp
+
+
+@pytest.fixture
+def asgi_app(app):
+    return DiagramASGIApp(app)
+
+
+def post(app, payload, headers=()):
+    """POST ``payload`` to /generate and return ``(status, headers, body)``."""
+    body = json.dumps(payload).encode()
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/api/diagrams/generate', 'query_string': b'',
+        'headers': [(b'content-type', b'application/json'), *headers],
+        'server': ('localhost', 5000), 'scheme': 'http', 'root_path': '', 'http_version': '1.1',
+    }
+    asyncio.run(app(scope, receive, send))
+    start, end = messages
+    return start['status'], dict(start['headers']), json.loads(end['body'])
+
+
+def test_native_generate_gets_cors_and_server_timing(asgi_app):
+    status, headers, body = post(
+        asgi_app, {'prompt': 'web server behind a load balancer', 'backend': 'mermaid'},
+        headers=[(b'origin', b'http://localhost:8501'), (b'x-server-timing', b'1')]
+    )
+    assert status == 200
+    assert body['image_format'] == 'mmd'
+    assert headers[b'access-control-allow-origin'] == b'http://localhost:8501'
+    stages = {span.split(b';')[0] for span in headers[b'server-timing'].split(b', ')}
+    assert {b'llm', b'render', b'db_commit'} <= stages
+    assert int(headers[b'content-length']) > 0
+
+
+def test_native_generate_errors_go_through_flask_too(asgi_app):
+    status, headers, body = post(asgi_app, {'prompt': ''}, headers=[(b'origin', b'http://localhost:8501')])
+    assert status == 400
+    assert body == {'error': 'Prompt is required'}
+    assert headers[b'access-control-allow-origin'] == b'http://localhost:8501'
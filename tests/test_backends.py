@@ -0,0 +1,61 @@
+import pytest
+from app.config import Config
+from app.routes.diagram_routes import _requested_format
+from app.services.diagram_model import DiagramParseError
+from app.services.diagram_service import DiagramService
+from app.services.llm_clients import FAKE_DIAGRAM_CODE
+from app.services.pipeline import DiagramPipeline
+from tests.test_gemini_service import UNPARSEABLE_CODE
+
+
+@pytest.mark.parametrize('data, expected', [
+    ({}, None),
+    ({'format': 'svg'}, 'svg'),
+    ({'backend': 'mermaid'}, 'mmd'),
+    ({'backend': 'graphviz'}, 'png'),
+    ({'backend': 'graphviz', 'format': 'svg'}, 'svg'),
+])
+def test_requested_format(app, data, expected):
+    with app.test_request_context():
+        assert _requested_format(data) == expected
+
+
+@pytest.mark.parametrize('data', [{'backend': 'mermaid', 'format': 'png'}, {'backend': 'vega'}, {'format': 'gif'}])
+def test_requested_format_rejects_conflicts(app, data):
+    with app.test_request_context(), pytest.raises(ValueError):
+        _requested_format(data)
+
+
+def test_mermaid_output_has_subgraphs_for_clusters():
+    text = DiagramService.render_diagram(FAKE_DIAGRAM_CODE, 0, 'mmd').decode()
+    assert text.splitlines()[3] == 'flowchart LR'
+    assert 'subgraph cluster_0["VPC"]' in text
+    assert 'n0 --> n1' in text
+
+
+def test_mermaid_output_needs_parseable_code():
+    with pytest.raises(DiagramParseError):
+        DiagramService.render_diagram(UNPARSEABLE_CODE, 0, 'mmd')
+
+
+class RecordingDiagramService(DiagramService):
+    """Real Mermaid output; image formats are recorded instead of running Graphviz."""
+    rendered = []
+
+    @staticmethod
+    def render_diagram(code, diagram_id, outformat='png'):
+        if outformat == 'mmd':
+            return DiagramService.render_diagram(code, diagram_id, outformat)
+        RecordingDiagramService.rendered.append(outformat)
+        return b'image'
+
+
+def test_unparseable_code_falls_back_to_a_server_render(app, monkeypatch):
+    monkeypatch.setattr(Config, 'DIAGRAM_BACKEND', 'mermaid')
+    pipeline = DiagramPipeline(gemini_service=None, diagram_service=RecordingDiagramService())
+    with app.app_context():
+        _, image_format, _ = pipeline.render(UNPARSEABLE_CODE, 0, 'mmd')
+        assert image_format == 'png'
+        _, image_format, _ = pipeline.render(FAKE_DIAGRAM_CODE, 0, None)
+        assert image_format == 'mmd'
+    assert RecordingDiagramService.rendered == ['png']
@@ -0,0 +1,35 @@
+import threading
+
+from app.models.diagram import DiagramRequest
+from app.routes import diagram_routes
+
+
+class OneResultRunner:
+    """Finishes the first job and leaves the rest running until the stream is closed."""
+    closed = threading.Event()
+
+    def __init__(self, pipeline, **kwargs):
+        pass
+
+    def run(self, app, jobs, image_format=None):
+        try:
+            diagram_id, _ = jobs[0]
+            yield {'id': diagram_id, 'status': 'failed', 'error': 'boom'}
+        finally:
+            OneResultRunner.closed.set()
+
+
+def test_disconnect_fails_unfinished_rows(client, monkeypatch):
+    monkeypatch.setattr(diagram_routes, 'get_pipeline', lambda: None)
+    monkeypatch.setattr(diagram_routes, 'BatchRunner', OneResultRunner)
+    response = client.post('/api/diagrams/batch', json={'prompts': ['a web server', 'a queue', 'a cache']})
+    next(response.response)
+    # The client going away closes the response iterator
+    response.close()
+
+    assert OneResultRunner.closed.is_set()
+    with client.application.app_context():
+        statuses = {row.prompt: (row.status, row.error_message) for row in DiagramRequest.query.all()}
+    assert statuses['a web server'] == ('failed', 'boom')
+    assert statuses['a queue'][0] == statuses['a cache'][0] == 'failed'
+    assert 'closed' in statuses['a queue'][1]
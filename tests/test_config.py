@@ -0,0 +1,24 @@
+import pytest
+from app.config import Config, _engine_options, share_render_limits
+
+
+@pytest.mark.parametrize('uri', ['sqlite://', 'sqlite:///:memory:', 'sqlite:///file:db?mode=memory&uri=true'])
+def test_in_memory_sqlite_gets_no_queue_pool_options(uri):
+    assert not {'pool_size', 'max_overflow', 'pool_timeout'} & set(_engine_options(uri))
+
+
+@pytest.mark.parametrize('uri', ['sqlite:///app.db', 'postgresql://user@localhost/diagrams'])
+def test_file_and_server_databases_get_pool_limits(uri):
+    assert {'pool_size', 'max_overflow', 'pool_timeout'} <= set(_engine_options(uri))
+
+
+@pytest.mark.parametrize('workers, concurrency, pool, expected', [
+    (1, 8, 2, (8, 2)),
+    (4, 8, 2, (2, 1)),
+    (4, 2, 0, (1, 0)),
+])
+def test_render_limits_are_shared_between_workers(monkeypatch, workers, concurrency, pool, expected):
+    monkeypatch.setattr(Config, 'RENDER_CONCURRENCY', concurrency)
+    monkeypatch.setattr(Config, 'RENDERER_POOL_SIZE', pool)
+    share_render_limits(workers)
+    assert (Config.RENDER_CONCURRENCY, Config.RENDERER_POOL_SIZE) == expected
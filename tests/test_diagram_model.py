@@ -0,0 +1,158 @@
+import pytest
+from app.services.diagram_model import (
+    NODE_ICONS, DiagramParseError, DiagramPatchError, DiagramTooLarge, apply_patch, node_imports, parse_diagram_code
+)
+from app.services.llm_clients import FAKE_DIAGRAM_CODE
+
+
+def wrap(body, direction='LR'):
+    lines = '\n'.join(f"        {line}" for line in body.strip().splitlines())
+    return f'''from diagrams import Diagram, Cluster, Edge
+
+def generate_diagram():
+    with Diagram("Test", direction="{direction}"):
+{lines}
+
+if __name__ == "__main__":
+    generate_diagram()
+'''
+
+
+def edges(model):
+    labels = {node.id: node.label for node in model.nodes.values()}
+    return [(labels[e.source], labels[e.target], e.dir) for e in model.edges]
+
+
+def test_parses_the_stock_diagram():
+    model = parse_diagram_code(FAKE_DIAGRAM_CODE)
+    assert [c.label for c in model.clusters.values()] == ['VPC', 'Public Subnet', 'Private Subnet', 'Database Subnet']
+    assert [n.kind for n in model.nodes.values()] == ['ELB', 'EC2', 'EC2', 'RDS']
+    # lb >> [web1, web2] >> db fans out and back in
+    assert len(model.edges) == 4
+    assert model.nodes['n0'].cluster == 'cluster_1'
+    assert model.clusters['cluster_1'].parent == 'cluster_0'
+
+
+def test_connection_operators_and_edge_attributes():
+    model = parse_diagram_code(wrap('''
+a = EC2("a")
+b = EC2("b")
+c = EC2("c")
+a << b
+b - c
+a >> Edge(label="reads", color="red") >> c
+'''))
+    # Like the diagrams package, << keeps the written order and points the arrow back
+    assert edges(model) == [('a', 'b', 'back'), ('b', 'c', 'none'), ('a', 'c', 'forward')]
+    assert model.edges[2].attrs == {'label': 'reads', 'color': 'red'}
+
+
+def test_for_loop_over_nodes():
+    model = parse_diagram_code(wrap('''
+lb = ELB("lb")
+for web in [EC2("w1"), EC2("w2")]:
+    lb >> web
+'''))
+    assert edges(model) == [('lb', 'w1', 'forward'), ('lb', 'w2', 'forward')]
+
+
+def test_direction():
+    assert parse_diagram_code(wrap('EC2("a")', direction='TB')).direction == 'TB'
+    with pytest.raises(DiagramParseError):
+        parse_diagram_code(wrap('EC2("a")', direction='UP'))
+
+
+@pytest.mark.parametrize('body', [
+    'a = EC2(name())',
+    'a = Lambda("f")',
+    '[EC2("a"), EC2("b")] >> [EC2("c"), EC2("d")]',
+    'a = b',
+    'import os',
+])
+def test_code_outside_the_subset_is_rejected(body):
+    with pytest.raises(DiagramParseError):
+        parse_diagram_code(wrap(body))
+
+
+def test_invalid_python_and_missing_block():
+    with pytest.raises(DiagramParseError):
+        parse_diagram_code("def (:")
+    with pytest.raises(DiagramParseError):
+        parse_diagram_code("x = 1")
+
+
+def test_size_limits():
+    code = wrap('\n'.join(f'EC2("n{i}")' for i in range(5)))
+    with pytest.raises(DiagramTooLarge):
+        parse_diagram_code(code, max_nodes=4)
+    assert len(parse_diagram_code(code, max_nodes=5).nodes) == 5
+
+
+def test_generated_code_round_trips():
+    model = parse_diagram_code(FAKE_DIAGRAM_CODE)
+    assert parse_diagram_code(model.to_code()).signature() == model.signature()
+
+
+def test_signature_ignores_formatting_but_not_content():
+    a = parse_diagram_code(wrap('x = EC2("a")\ny = EC2("b")\nx >> y'))
+    b = parse_diagram_code(wrap('x=EC2("a")\n\ny=EC2("b")\nx>>y'))
+    c = parse_diagram_code(wrap('x = EC2("a")\ny = EC2("b")\nx << y'))
+    assert a.signature() == b.signature() != c.signature()
+
+
+def test_dot_output():
+    dot = parse_diagram_code(FAKE_DIAGRAM_CODE).to_dot()
+    assert dot.startswith('digraph "AWS Architecture" {')
+    assert 'subgraph cluster_0' in dot
+    assert 'n0 -> n1' in dot
+
+
+def test_patch_adds_and_connects_nodes_by_alias():
+    model = parse_diagram_code(FAKE_DIAGRAM_CODE)
+    patched = apply_patch(model, [
+        {'op': 'add_cluster', 'id': 'cache_tier', 'label': 'Cache'},
+        {'op': 'add_node', 'id': 'redis', 'kind': 'ElastiCache', 'label': 'Redis', 'cluster': 'cache_tier'},
+        {'op': 'add_edge', 'source': 'n1', 'target': 'redis', 'label': 'reads'},
+        {'op': 'update_node', 'id': 'n3', 'label': 'Primary DB'},
+    ])
+    redis = next(n for n in patched.nodes.values() if n.label == 'Redis')
+    assert patched.clusters[redis.cluster].label == 'Cache'
+    assert edges(patched)[-1] == ('App Server 1', 'Redis', 'forward')
+    assert patched.nodes['n3'].label == 'Primary DB'
+    # The original model is left alone
+    assert len(model.nodes) == 4 and model.nodes['n3'].label == 'Primary Database'
+
+
+def test_patch_removes_nodes_and_edges():
+    model = parse_diagram_code(FAKE_DIAGRAM_CODE)
+    patched = apply_patch(model, [{'op': 'remove_node', 'id': 'n2'}, {'op': 'remove_edge', 'source': 'n0', 'target': 'n1'}])
+    assert 'n2' not in patched.nodes
+    assert edges(patched) == [('App Server 1', 'Primary Database', 'forward')]
+
+
+def test_cluster_can_be_named_by_label():
+    patched = apply_patch(parse_diagram_code(FAKE_DIAGRAM_CODE), [
+        {'op': 'add_node', 'id': 'x', 'kind': 'EC2', 'label': 'Worker', 'cluster': 'Private Subnet'}
+    ])
+    worker = next(n for n in patched.nodes.values() if n.label == 'Worker')
+    assert patched.clusters[worker.cluster].label == 'Private Subnet'
+
+
+@pytest.mark.parametrize('operations', [
+    {'op': 'add_node'},
+    [{'op': 'rename_everything'}],
+    [{'op': 'add_node', 'kind': 'Mainframe', 'label': 'x'}],
+    [{'op': 'remove_node', 'id': 'n99'}],
+    [{'op': 'remove_edge', 'source': 'n0', 'target': 'n3'}],
+    [{'op': 'add_node', 'kind': 'EC2', 'label': 'x', 'cluster': 'Nowhere'}],
+    [{'op': 'update_node', 'id': 'n0', 'label': 7}],
+    [{'op': 'remove_node', 'id': n} for n in ('n0', 'n1', 'n2', 'n3')],
+])
+def test_patches_that_do_not_apply(operations):
+    with pytest.raises(DiagramPatchError):
+        apply_patch(parse_diagram_code(FAKE_DIAGRAM_CODE), operations)
+
+
+def test_node_imports_name_every_kind_once():
+    imported = [name.strip() for line in node_imports() for name in line.split(' import ')[1].split(',')]
+    assert sorted(imported) == sorted(NODE_ICONS)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from app import db
+from app.models.diagram import DiagramRequest
+from app.routes import diagram_routes
+from app.services.gemini_service import GeminiService
+from app.services.llm_clients import FAKE_DIAGRAM_CODE, FakeGenerativeModel
+from app.services.pipeline import DiagramPipeline
+from tests.test_gemini_service import UNPARSEABLE_CODE, resilient
+
+ADD_CACHE = json.dumps([{'op': 'add_node', 'id': 'cache', 'kind': 'ElastiCache', 'label': 'Cache'}])
+
+
+@pytest.fixture
+def use_model(monkeypatch):
+    """Serve requests with a pipeline around ``model`` and ``edit_model``."""
+    def use(model, edit_model=None):
+        service = GeminiService(model=resilient(model), edit_model=resilient(edit_model or model),
+                                cache=False, fast_path=False)
+        monkeypatch.setattr(diagram_routes, '_pipeline', DiagramPipeline(service, diagram_routes.diagram_service))
+    return use
+
+
+def add_parent(app, code=FAKE_DIAGRAM_CODE):
+    with app.app_context():
+        row = DiagramRequest(prompt='web server', diagram_code=code, status='completed', image_format='mmd')
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+
+def edit(client, parent_id):
+    return client.post(f'/api/diagrams/{parent_id}/edit', json={'instruction': 'add a cache', 'format': 'mmd'})
+
+
+def test_patch_edit_is_saved_as_a_child(app, client, use_model):
+    use_model(FakeGenerativeModel(), edit_model=FakeGenerativeModel(edit_text=ADD_CACHE))
+    parent_id = add_parent(app)
+    response = edit(client, parent_id)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'completed' and body['parent_id'] == parent_id
+    assert 'ElastiCache("Cache")' in body['diagram_code']
+    assert 'Cache' in body['mermaid']
+    with app.app_context():
+        child = db.session.get(DiagramRequest, body['id'])
+        assert child.parent_id == parent_id and child.prompt == 'add a cache'
+
+
+def test_unparseable_parent_is_regenerated(app, client, use_model):
+    use_model(FakeGenerativeModel(), edit_model=FakeGenerativeModel(edit_text=ADD_CACHE))
+    parent_id = add_parent(app, code=UNPARSEABLE_CODE)
+    response = edit(client, parent_id)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['parent_id'] == parent_id
+    # The full reply of the generation model, not a patch
+    assert body['diagram_code'] == FAKE_DIAGRAM_CODE
+
+
+def test_model_outage_fails_the_edit_instead_of_returning_the_template(app, client, use_model):
+    use_model(FakeGenerativeModel(error_rate=1.0))
+    parent_id = add_parent(app)
+    response = edit(client, parent_id)
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'failed'
+    with app.app_context():
+        child = DiagramRequest.query.filter_by(parent_id=parent_id).one()
+        assert child.status == 'failed' and child.diagram_code is None
+
+
+def test_only_completed_diagrams_can_be_edited(app, client):
+    with app.app_context():
+        row = DiagramRequest(prompt='web server', status='processing')
+        db.session.add(row)
+        db.session.commit()
+        parent_id = row.id
+    assert edit(client, parent_id).status_code == 409
+    assert client.post(f'/api/diagrams/{parent_id}/edit', json={}).status_code == 400
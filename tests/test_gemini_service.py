@@ -0,0 +1,81 @@
+import json
+import pytest
+from app.services.gemini_service import GeminiService
+from app.services.llm_clients import FAKE_DIAGRAM_CODE, FakeGenerativeModel
+from app.services.resilience import CircuitBreaker, LLMCallError, ResilientModel
+
+UNPARSEABLE_CODE = '''from diagrams import Diagram
+from diagrams.aws.compute import EC2
+
+def generate_diagram():
+    with Diagram("Loop", direction="LR"):
+        nodes = [EC2(name) for name in load_names()]
+
+if __name__ == "__main__":
+    generate_diagram()
+'''
+
+
+def resilient(model):
+    return ResilientModel(model, timeout=5, max_retries=0, breaker=CircuitBreaker(100, 30))
+
+
+def make_service(model=None, edit_model=None):
+    model = model or FakeGenerativeModel()
+    return GeminiService(
+        model=resilient(model),
+        edit_model=resilient(edit_model or model),
+        cache=False,
+        fast_path=False
+    )
+
+
+def test_edit_applies_a_patch():
+    patch = json.dumps([{'op': 'add_node', 'id': 'cache', 'kind': 'ElastiCache', 'label': 'Cache'}])
+    service = make_service(edit_model=FakeGenerativeModel(edit_text=patch))
+    code = service.edit_diagram_code(FAKE_DIAGRAM_CODE, "add a cache")
+    assert 'ElastiCache("Cache")' in code
+
+
+@pytest.mark.parametrize('patch', [
+    '[{"op": "add_node", "id": ["x"], "kind": "EC2"}]',
+    '[{"op": "remove_node", "id": {"a": 1}}]',
+    '[{"op": "update_node", "id": "n0", "kind": ["EC2"]}]',
+    'not json at all',
+])
+def test_malformed_patch_regenerates_instead_of_failing(patch):
+    service = make_service(edit_model=FakeGenerativeModel(edit_text=patch))
+    assert service.edit_diagram_code(FAKE_DIAGRAM_CODE, "add a cache") == FAKE_DIAGRAM_CODE
+
+
+def test_regenerated_edit_raises_on_outage_instead_of_returning_the_template():
+    service = make_service(model=FakeGenerativeModel(error_rate=1.0))
+    with pytest.raises(LLMCallError):
+        service.edit_diagram_code(UNPARSEABLE_CODE, "add a cache")
+
+
+def test_regenerated_edit_raises_on_unusable_reply():
+    service = make_service(model=FakeGenerativeModel(text="I cannot help with that"))
+    with pytest.raises(LLMCallError) as info:
+        service.edit_diagram_code(UNPARSEABLE_CODE, "add a cache")
+    assert info.value.outcome == 'invalid_output'
+
+
+
+def test_one_injected_model_shares_its_circuit_breaker_with_edits():
+    model = ResilientModel(FakeGenerativeModel(error_rate=1.0), timeout=5, max_retries=0,
+                           breaker=CircuitBreaker(1, 30))
+    service = GeminiService(model=model, cache=False, fast_path=False)
+    assert service.edit_model is service.model
+    assert service._edit_prefix.startswith('You edit architecture diagrams')
+
+    # The failed generation opens the breaker, so the edit fails fast
+    service.generate_diagram_code('web app')
+    with pytest.raises(LLMCallError) as info:
+        service.edit_diagram_code(UNPARSEABLE_CODE, "add a cache")
+    assert info.value.outcome == 'circuit_open'
+
+
+def test_separate_edit_model_gets_its_own_client():
+    service = make_service(edit_model=FakeGenerativeModel())
+    assert service.edit_model is not service.model
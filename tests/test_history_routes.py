@@ -0,0 +1,73 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.diagram import DiagramRequest
+
+START = datetime(2026, 1, 1)
+
+
+def add_rows(app, count, start=START, same_time=False):
+    """``count`` rows, one second apart unless ``same_time``; returns their ids."""
+    with app.app_context():
+        rows = [DiagramRequest(prompt=f'prompt {i}', status='completed',
+                               created_at=start if same_time else start + timedelta(seconds=i))
+                for i in range(count)]
+        db.session.add_all(rows)
+        db.session.commit()
+        return [row.id for row in rows]
+
+
+def walk(client, limit, between_pages=None):
+    """Follow next_cursor to the end; returns the ids in the order they were served."""
+    ids, cursor = [], None
+    while True:
+        url = f'/api/diagrams/history?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        body = response.get_json()
+        ids += [item['id'] for item in body['items']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids
+        if between_pages:
+            between_pages()
+
+
+@pytest.mark.parametrize('same_time', [False, True])
+def test_cursor_walks_every_row_newest_first(app, client, same_time):
+    ids = add_rows(app, 7, same_time=same_time)
+    assert walk(client, limit=3) == sorted(ids, reverse=True)
+
+
+def test_streamed_pages_match_buffered_ones(app, client):
+    ids = add_rows(app, 7)
+    app.config['HISTORY_STREAM_THRESHOLD'] = 1
+    assert walk(client, limit=3) == sorted(ids, reverse=True)
+
+
+def test_new_rows_do_not_shift_later_pages(app, client):
+    ids = add_rows(app, 6)
+    newer = iter(range(1, 100))
+    # Each page is followed by a newer insert, which offset paging would repeat rows for
+    served = walk(client, limit=2,
+                  between_pages=lambda: add_rows(app, 1, start=START + timedelta(days=next(newer))))
+    assert served == sorted(ids, reverse=True)
+
+
+def test_cursor_round_trips_the_last_row(app, client):
+    ids = add_rows(app, 3)
+    cursor = client.get('/api/diagrams/history?limit=1').get_json()['next_cursor']
+    created_at, row_id = base64.urlsafe_b64decode(cursor).decode().rsplit('|', 1)
+    assert int(row_id) == ids[-1]
+    assert datetime.fromisoformat(created_at) == START + timedelta(seconds=2)
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', base64.urlsafe_b64encode(b'no separator').decode(),
+                                    base64.urlsafe_b64encode(b'yesterday|1').decode(),
+                                    base64.urlsafe_b64encode(b'2026-01-01T00:00:00|one').decode()])
+def test_bad_cursor_is_400(app, client, cursor):
+    response = client.get(f'/api/diagrams/history?cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
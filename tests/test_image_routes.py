@@ -0,0 +1,112 @@
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.models.diagram import DiagramRequest
+from app.routes import diagram_routes
+from app.services.artifact_store import get_artifact_store
+from app.services.image_processing import ImagePostProcessor
+
+
+def png_bytes(size=(800, 400), color='navy'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def add_rendered(app, data, fmt='png'):
+    """A completed row whose image is ``data`` in the artifact store."""
+    with app.app_context():
+        row = DiagramRequest(prompt='web server', diagram_code='code', status='completed',
+                             image_format=fmt, image_sha256=get_artifact_store().put(data, fmt))
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+
+def test_image_is_served_with_its_content_hash_as_etag(app, client):
+    data = png_bytes()
+    diagram_id = add_rendered(app, data)
+    response = client.get(f'/api/diagrams/{diagram_id}/image')
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.mimetype == 'image/png'
+    assert response.headers['ETag'] == f'"{hashlib.sha256(data).hexdigest()}"'
+
+
+def test_matching_if_none_match_gets_304(app, client):
+    diagram_id = add_rendered(app, png_bytes())
+    etag = client.get(f'/api/diagrams/{diagram_id}/image').headers['ETag']
+    response = client.get(f'/api/diagrams/{diagram_id}/image', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    stale = client.get(f'/api/diagrams/{diagram_id}/image', headers={'If-None-Match': '"0"'})
+    assert stale.status_code == 200
+
+
+def test_identical_renders_share_one_artifact(app, client):
+    data = png_bytes()
+    first, second = add_rendered(app, data), add_rendered(app, data)
+    with app.app_context():
+        rows = [db.session.get(DiagramRequest, diagram_id) for diagram_id in (first, second)]
+        assert rows[0].image_sha256 == rows[1].image_sha256
+    etags = {client.get(f'/api/diagrams/{diagram_id}/image').headers['ETag'] for diagram_id in (first, second)}
+    assert len(etags) == 1
+
+
+def test_missing_artifact_is_404(app, client):
+    with app.app_context():
+        row = DiagramRequest(prompt='web server', status='completed', image_format='png', image_sha256='f' * 64)
+        db.session.add(row)
+        db.session.commit()
+        diagram_id = row.id
+    assert client.get(f'/api/diagrams/{diagram_id}/image').status_code == 404
+
+
+def test_other_formats_are_drawn_and_stored_by_content(app, client, monkeypatch):
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"/>'
+    monkeypatch.setattr(diagram_routes.diagram_service, 'render_diagram', lambda code, diagram_id, fmt: svg)
+    diagram_id = add_rendered(app, png_bytes())
+    response = client.get(f'/api/diagrams/{diagram_id}/image?format=svg')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/svg+xml'
+    sha256 = hashlib.sha256(svg).hexdigest()
+    assert response.headers['ETag'] == f'"{sha256}"'
+    assert get_artifact_store().exists(sha256, 'svg')
+
+
+@pytest.fixture
+def postprocessor(monkeypatch):
+    """Post-process on the request thread, counting the jobs."""
+    processor = ImagePostProcessor(workers=1, thumbnail_size=64, thumbnail_format='png')
+    calls = []
+    process = processor.process
+    monkeypatch.setattr(processor, 'process', lambda diagram_id: calls.append(diagram_id) or process(diagram_id))
+    monkeypatch.setattr(diagram_routes, 'get_image_postprocessor', lambda: processor)
+    processor.calls = calls
+    return processor
+
+
+def test_thumbnail_is_made_once_and_then_cached(app, client, postprocessor):
+    diagram_id = add_rendered(app, png_bytes())
+    response = client.get(f'/api/diagrams/{diagram_id}/thumbnail')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert max(Image.open(io.BytesIO(response.data)).size) == 64
+    assert response.cache_control.max_age == 86400
+
+    again = client.get(f'/api/diagrams/{diagram_id}/thumbnail', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert postprocessor.calls == [diagram_id]
+    with app.app_context():
+        row = db.session.get(DiagramRequest, diagram_id)
+        assert response.headers['ETag'] == f'"{row.thumbnail_sha256}"'
+
+
+def test_thumbnail_is_404_when_post_processing_is_off(app, client, monkeypatch):
+    monkeypatch.setattr(diagram_routes, 'get_image_postprocessor', lambda: None)
+    diagram_id = add_rendered(app, png_bytes())
+    assert client.get(f'/api/diagrams/{diagram_id}/thumbnail').status_code == 404
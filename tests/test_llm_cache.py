@@ -0,0 +1,81 @@
+import pytest
+from app.services.gemini_service import GeminiService
+from app.services.llm_cache import LLMResponseCache, normalize_prompt
+from app.services.llm_clients import FAKE_DIAGRAM_CODE, FakeGenerativeModel
+from app.services.pipeline import DiagramPipeline
+from app.services.render_limits import RenderRejected
+from tests.test_gemini_service import resilient
+
+
+def test_normalize_prompt_folds_case_punctuation_and_spacing():
+    assert normalize_prompt("  Web server,  DB!") == normalize_prompt("web server db")
+
+
+def test_memory_tier_hits_and_misses():
+    cache = LLMResponseCache()
+    assert cache.get("web server") is None
+    cache.put("web server", "code")
+    assert cache.get("Web Server!") == "code"
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses'], stats['stores']) == (1, 1, 1)
+    assert stats['hit_ratio'] == 0.5
+
+
+def test_memory_tier_is_bounded_lru():
+    cache = LLMResponseCache(memory_items=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_entries_expire(monkeypatch):
+    cache = LLMResponseCache(ttl_seconds=10)
+    monkeypatch.setattr('app.services.llm_cache.time.time', lambda: 1000.0)
+    cache.put("a", "1")
+    monkeypatch.setattr('app.services.llm_cache.time.time', lambda: 1011.0)
+    assert cache.get("a") is None
+
+
+def test_discard():
+    cache = LLMResponseCache()
+    cache.put("a", "1")
+    cache.discard("A.")
+    assert cache.get("a") is None
+
+
+class FailingDiagramService:
+    def __init__(self, error):
+        self.error = error
+
+    def default_format(self, code):
+        return 'png'
+
+    def render_diagram(self, code, diagram_id, outformat='png'):
+        raise self.error
+
+
+def make_pipeline(error):
+    cache = LLMResponseCache()
+    service = GeminiService(model=resilient(FakeGenerativeModel()), cache=cache, fast_path=False)
+    return DiagramPipeline(service, FailingDiagramService(error)), cache
+
+
+@pytest.mark.parametrize('error', [ValueError("bad code"), RenderRejected("too big")])
+def test_code_that_fails_to_render_is_not_served_from_cache(error):
+    pipeline, cache = make_pipeline(error)
+    code = pipeline.generate_code("web server")
+    assert cache.get("web server") == FAKE_DIAGRAM_CODE
+    with pytest.raises(Exception):
+        pipeline.render_generated("web server", code, 1)
+    assert cache.get("web server") is None
+
+
+def test_busy_rejection_keeps_cached_code():
+    pipeline, cache = make_pipeline(RenderRejected("busy", reason='busy'))
+    code = pipeline.generate_code("web server")
+    with pytest.raises(RenderRejected):
+        pipeline.render_generated("web server", code, 1)
+    assert cache.get("web server") == FAKE_DIAGRAM_CODE
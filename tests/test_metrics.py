@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+from app.routes import diagram_routes
+
+
+def test_scrape_does_not_build_the_pipeline(monkeypatch):
+    monkeypatch.setattr(diagram_routes, '_pipeline', None)
+    families = {name: samples for name, _, _, samples in diagram_routes._collect_cache_metrics()}
+    assert diagram_routes._pipeline is None
+    assert 'diagram_llm_circuit_open' not in families
+    assert all(labels['cache'] == 'render' for labels, _ in families['diagram_cache_misses_total'])
+
+
+def test_scrape_reports_model_counters_once_the_pipeline_exists(monkeypatch):
+    monkeypatch.setattr(diagram_routes, '_pipeline', None)
+    diagram_routes.get_pipeline()
+    families = {name: samples for name, _, _, samples in diagram_routes._collect_cache_metrics()}
+    assert families['diagram_llm_circuit_open'] == [({}, 0)]
+    assert {'llm', 'fast_path'} <= {labels['cache'] for labels, _ in families['diagram_cache_misses_total']}
+
+
+
+def _peer_file(directory, pid, counter=0, observed=(), circuit_open=0):
+    from app.services.metrics import MetricsRegistry
+    peer = MetricsRegistry()
+    peer.counter('test_total', 'Test counter.', ['kind']).inc(counter, kind='a')
+    histogram = peer.histogram('test_seconds', 'Test histogram.', buckets=(1,))
+    for value in observed:
+        histogram.observe(value)
+    peer.register_collector(lambda: [('test_open', 'gauge', 'Test gauge.', [({}, circuit_open)])])
+    peer._shared_dir = str(directory)
+    peer.publish()
+    os.rename(directory / f'{os.getpid()}.json', directory / f'{pid}.json')
+
+
+def test_shared_scrape_adds_up_every_worker(tmp_path):
+    from app.services.metrics import MetricsRegistry
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+
+    registry = MetricsRegistry()
+    registry.counter('test_total', 'Test counter.', ['kind']).inc(1, kind='a')
+    registry.histogram('test_seconds', 'Test histogram.', buckets=(1,)).observe(0.5)
+    registry.register_collector(lambda: [('test_open', 'gauge', 'Test gauge.', [({}, 0)])])
+    registry._shared_dir = str(tmp_path)
+    _peer_file(tmp_path, os.getppid(), counter=2, observed=[2])
+    _peer_file(tmp_path, exited.pid, counter=4, observed=[0.1], circuit_open=1)
+
+    lines = registry.render().splitlines()
+    assert 'test_total{kind="a"} 7' in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_count 3' in lines
+    # Gauges of workers that have exited are stale
+    assert 'test_open 0' in lines
+
+
+def test_publish_writes_what_peers_read(tmp_path):
+    from app.services.metrics import MetricsRegistry
+    registry = MetricsRegistry()
+    registry.counter('test_total', 'Test counter.').inc(3)
+    registry._shared_dir = str(tmp_path)
+    registry.publish()
+
+    reader = MetricsRegistry()
+    reader.counter('test_total', 'Test counter.')
+    reader._shared_dir = str(tmp_path)
+    os.rename(tmp_path / f'{os.getpid()}.json', tmp_path / f'{os.getppid()}.json')
+    assert 'test_total 3' in reader.render().splitlines()
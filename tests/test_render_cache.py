@@ -0,0 +1,73 @@
+import pytest
+from app.services import diagram_service as diagram_service_module
+from app.services.diagram_service import DiagramService
+from app.services.llm_clients import FAKE_DIAGRAM_CODE
+from app.services.render_cache import RenderCache, normalize_diagram_content
+
+
+def test_normalize_ignores_comments_blank_lines_and_spacing():
+    assert normalize_diagram_content("a = EC2( 'x' )\n\n# note\nb = a") == normalize_diagram_content("a=EC2('x')\nb=a")
+    assert normalize_diagram_content("a = 1") != normalize_diagram_content("a = 2")
+
+
+def test_key_depends_on_format():
+    assert RenderCache.make_key("a = 1", 'png') != RenderCache.make_key("a = 1", 'svg')
+
+
+def test_memory_tier_is_bounded_lru():
+    cache = RenderCache(memory_items=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    cache.get('a')
+    cache.put('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1'
+
+
+def test_disk_tier_survives_a_new_instance_and_is_size_bounded(tmp_path):
+    cache = RenderCache(memory_items=1, disk_dir=str(tmp_path), disk_max_bytes=10)
+    cache.put('a', b'12345')
+    assert RenderCache(disk_dir=str(tmp_path), disk_max_bytes=10).get('a') == b'12345'
+    cache.put('b', b'12345')
+    cache.put('c', b'12345')
+    assert cache.stats()['disk_bytes'] <= 10
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_uncounted_miss():
+    cache = RenderCache()
+    assert cache.get('a', count_miss=False) is None
+    assert cache.stats()['misses'] == 0
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 1
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RenderCache()
+    monkeypatch.setattr(diagram_service_module, 'get_render_cache', lambda: cache)
+    graphviz_runs = []
+
+    def render_dot(dot_source, outformats, engine='dot'):
+        graphviz_runs.append(outformats)
+        return {fmt: f'{fmt} output'.encode() for fmt in outformats}
+
+    monkeypatch.setattr(DiagramService, '_render_dot', staticmethod(render_dot))
+    monkeypatch.setattr(DiagramService, '_transcode', staticmethod(lambda layout, fmt: f'{fmt} from layout'.encode()))
+    cache.graphviz_runs = graphviz_runs
+    return cache
+
+
+def test_each_render_is_one_cache_lookup(cache):
+    assert DiagramService.render_diagram(FAKE_DIAGRAM_CODE, 1, 'png') == b'png output'
+    assert cache.stats()['misses'] == 1
+
+    assert DiagramService.render_diagram(FAKE_DIAGRAM_CODE, 1, 'png') == b'png output'
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses']) == (1, 1)
+
+    # Another format reuses the cached layout: a hit, not a miss plus a hit
+    assert DiagramService.render_diagram(FAKE_DIAGRAM_CODE, 1, 'svg') == b'svg from layout'
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses']) == (2, 1)
+    assert cache.graphviz_runs == [['dot', 'png']]
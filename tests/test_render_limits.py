@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+import pytest
+from app.config import Config
+from app.services.diagram_service import DiagramService
+from app.services.render_limits import limit_process, resource
+
+needs_prlimit = pytest.mark.skipif(not hasattr(resource, 'prlimit'), reason="resource.prlimit is Linux only")
+
+
+@needs_prlimit
+def test_limits_are_applied_to_the_child_not_this_process(monkeypatch):
+    monkeypatch.setattr(Config, 'RENDER_MAX_MEMORY_MB', 256)
+    monkeypatch.setattr(Config, 'RENDER_MAX_CPU_SECONDS', 7)
+    own = resource.getrlimit(resource.RLIMIT_AS)
+    with subprocess.Popen([sys.executable, '-c', 'import sys; sys.stdin.read()'], stdin=subprocess.PIPE) as process:
+        limit_process(process.pid)
+        assert resource.prlimit(process.pid, resource.RLIMIT_AS)[0] == 256 * 1024 * 1024
+        assert resource.prlimit(process.pid, resource.RLIMIT_CPU)[0] == 7
+        process.communicate(b'')
+    assert resource.getrlimit(resource.RLIMIT_AS) == own
+
+
+def test_finished_process_is_ignored():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    limit_process(process.pid)
+
+
+@needs_prlimit
+def test_memory_cap_stops_a_runaway_script(monkeypatch):
+    monkeypatch.setattr(Config, 'RENDER_MAX_MEMORY_MB', 256)
+    result = DiagramService._run_limited([sys.executable, '-c', 'x = bytearray(1024 ** 3)'], input=b'')
+    assert result.returncode != 0
+    assert b'MemoryError' in result.stderr
+
+
+def test_run_limited_times_out(monkeypatch):
+    monkeypatch.setattr(Config, 'RENDERER_JOB_TIMEOUT', 0.2)
+    with pytest.raises(subprocess.TimeoutExpired):
+        DiagramService._run_limited([sys.executable, '-c', 'import time; time.sleep(5)'])
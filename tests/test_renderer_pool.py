@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from app.services.renderer_pool import RendererPool
+
+
+@pytest.fixture
+def pool():
+    pools = []
+
+    def make(**options):
+        pools.append(RendererPool(1, job_timeout=30, **options))
+        return pools[-1]
+    yield make
+    for made in pools:
+        made.close()
+
+
+def script(tmp_path, body):
+    path = tmp_path / 'job.py'
+    path.write_text("import os\nopen('pid', 'w').write(str(os.getpid()))\n" + body)
+    return str(path)
+
+
+def run(pool, tmp_path, body='', timeout=None):
+    pool.run(script(tmp_path, body), str(tmp_path), timeout=timeout)
+    return int((tmp_path / 'pid').read_text())
+
+
+def test_crash_is_isolated_and_the_worker_replaced(pool, tmp_path):
+    renderers = pool()
+    first = run(renderers, tmp_path)
+    with pytest.raises(Exception, match='crashed'):
+        run(renderers, tmp_path, 'os._exit(3)')
+    assert run(renderers, tmp_path) != first
+
+
+def test_script_errors_keep_the_worker(pool, tmp_path):
+    renderers = pool()
+    first = run(renderers, tmp_path)
+    with pytest.raises(Exception, match='ZeroDivisionError'):
+        run(renderers, tmp_path, '1 / 0')
+    assert run(renderers, tmp_path) == first
+
+
+def test_timeout_kills_the_worker(pool, tmp_path):
+    renderers = pool()
+    with pytest.raises(Exception, match='timed out'):
+        run(renderers, tmp_path, 'import time\ntime.sleep(30)', timeout=1)
+    hung = int((tmp_path / 'pid').read_text())
+    with pytest.raises(ProcessLookupError):
+        os.kill(hung, 0)
+    assert run(renderers, tmp_path) != hung
+
+
+def test_workers_are_recycled_after_max_jobs(pool, tmp_path):
+    renderers = pool(max_jobs=2)
+    pids = [run(renderers, tmp_path) for _ in range(3)]
+    assert pids[0] == pids[1] != pids[2]
+
+
+def test_failed_respawn_does_not_return_the_dead_worker(pool, tmp_path, monkeypatch):
+    renderers = pool()
+
+    def no_spawn():
+        raise OSError("cannot start a renderer")
+    monkeypatch.setattr(renderers, '_spawn', no_spawn)
+    with pytest.raises(OSError):
+        run(renderers, tmp_path, 'os._exit(3)')
+    assert renderers._idle.empty() and not renderers._workers
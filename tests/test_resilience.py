@@ -0,0 +1,127 @@
+import time
+
+import pytest
+from app.config import hedge_after
+from app.services.llm_clients import FakeGenerativeModel
+from app.services.resilience import CircuitBreaker, CircuitOpenError, LLMCallError, LLMTimeout, ResilientModel
+
+
+class FlakyModel:
+    """Fails the first ``failures`` calls, then answers."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("unavailable")
+        return "ok"
+
+
+class StallingStream:
+    """Streams ``chunks`` and then hangs for ``stall`` seconds before the next one."""
+
+    def __init__(self, chunks, stall, first_delay=0.0):
+        self.chunks = chunks
+        self.stall = stall
+        self.first_delay = first_delay
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        time.sleep(self.first_delay)
+        yield from self.chunks
+        time.sleep(self.stall)
+        yield 'late'
+
+
+def test_breaker_opens_after_consecutive_failures_and_half_opens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('app.services.resilience.time.monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    now[0] = 31
+    assert breaker.allow() and breaker.state == 'half_open'
+    # Only one trial per reset window
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    now[0] = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_retries_until_success():
+    model = FlakyModel(failures=2)
+    resilient = ResilientModel(model, max_retries=2, backoff_base=0, breaker=CircuitBreaker(10, 30))
+    assert resilient.generate_content("p") == "ok"
+    assert model.calls == 3
+
+
+def test_open_circuit_fails_fast():
+    model = FlakyModel(failures=10)
+    resilient = ResilientModel(model, max_retries=0, breaker=CircuitBreaker(1, 30))
+    with pytest.raises(LLMCallError):
+        resilient.generate_content("p")
+    with pytest.raises(CircuitOpenError):
+        resilient.generate_content("p")
+    assert model.calls == 1
+
+
+def test_call_timeout():
+    model = FakeGenerativeModel(latency=0.5)
+    resilient = ResilientModel(model, timeout=0.05, max_retries=0)
+    with pytest.raises(LLMTimeout):
+        resilient.generate_content("p")
+
+
+def test_stream_passes_chunks_through():
+    resilient = ResilientModel(FakeGenerativeModel(chunk_size=10), timeout=5)
+    text = ''.join(chunk.text for chunk in resilient.generate_content("p", stream=True))
+    assert text == FakeGenerativeModel().text
+
+
+def test_stream_times_out_between_chunks():
+    resilient = ResilientModel(StallingStream(['a', 'b'], stall=0.5), timeout=0.1)
+    received = []
+    with pytest.raises(LLMTimeout):
+        for chunk in resilient.generate_content("p", stream=True):
+            received.append(chunk)
+    assert received == ['a', 'b']
+
+
+def test_stream_times_out_waiting_for_the_first_chunk():
+    resilient = ResilientModel(StallingStream(['a'], stall=0, first_delay=0.5), timeout=0.1)
+    with pytest.raises(LLMTimeout):
+        next(resilient.generate_content("p", stream=True))
+
+
+def test_slow_consumer_does_not_count_against_the_stream():
+    resilient = ResilientModel(FakeGenerativeModel(chunk_size=40), timeout=0.05)
+    for chunk in resilient.generate_content("p", stream=True):
+        time.sleep(0.06)
+
+
+@pytest.mark.parametrize('value, expected', [('', ''), ('P95', 'p95'), ('0.5', '0.5')])
+def test_hedge_after_accepts(value, expected):
+    assert hedge_after(value) == expected
+
+
+@pytest.mark.parametrize('value', ['p99', 'soon', '0', '-1', 'nan'])
+def test_hedge_after_rejects(value):
+    with pytest.raises(ValueError):
+        hedge_after(value)
+    with pytest.raises(ValueError):
+        ResilientModel(FakeGenerativeModel(), hedge_after=value)
+
+
+def test_hedge_delay():
+    assert ResilientModel(FakeGenerativeModel(), hedge_after='0.5').hedge_delay() == 0.5
+    # p95 needs enough samples first
+    assert ResilientModel(FakeGenerativeModel(), hedge_after='p95').hedge_delay() is None
@@ -0,0 +1,30 @@
+import pytest
+from app import db
+from app.models.diagram import DiagramRequest
+
+
+def add_row(app, **values):
+    with app.app_context():
+        row = DiagramRequest(prompt='web server', **values)
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+
+@pytest.mark.parametrize('values, status', [
+    ({'status': 'completed', 'diagram_code': 'code', 'image_format': 'png'}, 200),
+    ({'status': 'failed', 'error_message': 'boom'}, 500),
+    ({'status': 'pending'}, 202),
+])
+def test_result_without_waiting_leaves_the_job_queue_alone(app, client, values, status):
+    diagram_id = add_row(app, **values)
+    response = client.get(f'/api/diagrams/{diagram_id}/result')
+    assert response.status_code == status
+    assert 'diagram_jobs' not in app.extensions
+
+
+def test_waiting_on_a_running_row_uses_the_job_queue(app, client):
+    diagram_id = add_row(app, status='processing')
+    response = client.get(f'/api/diagrams/{diagram_id}/result?wait=0.05')
+    assert response.status_code == 202
+    assert 'diagram_jobs' in app.extensions
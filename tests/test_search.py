@@ -0,0 +1,82 @@
+import os
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app, db
+from app.config import Config, _engine_options
+from app.models.diagram import DiagramRequest
+from app.services.search import DiagramSearch
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    """An app context on a SQLite file brought up to date by the migrations."""
+    uri = f"sqlite:///{tmp_path / 'migrated.db'}"
+
+    class MigratedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = _engine_options(uri)
+
+    app = create_app(MigratedConfig)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        yield
+        db.session.remove()
+
+
+def add(prompt, code='', **fields):
+    fields.setdefault('status', 'completed')
+    row = DiagramRequest(prompt=prompt, diagram_code=code, **fields)
+    db.session.add(row)
+    db.session.commit()
+    return row
+
+
+def test_migrations_create_the_index(migrated):
+    assert DiagramSearch.available()
+
+
+def test_prompt_matches_outrank_code_matches(migrated):
+    in_code = add('web service behind a proxy', code='redis = ElastiCache("redis")')
+    in_prompt = add('redis cache in front of postgres', code='db = RDS("postgres")')
+    results, has_more = DiagramSearch().search('redis', limit=10)
+    assert [item['id'] for item in results] == [in_prompt.id, in_code.id]
+    assert results[0]['score'] > results[1]['score']
+    assert '[redis]' in results[0]['snippet']
+    assert not has_more
+
+
+def test_search_pages(migrated):
+    for i in range(3):
+        add(f'queue worker {i}')
+    first, has_more = DiagramSearch().search('queue', limit=2)
+    rest, more_after = DiagramSearch().search('queue', limit=2, offset=2)
+    assert len(first) == 2 and has_more
+    assert len(rest) == 1 and not more_after
+
+
+def test_like_fallback_matches_wildcards_literally(migrated, monkeypatch):
+    monkeypatch.setattr(DiagramSearch, 'available', staticmethod(lambda: False))
+    exact = add('db_primary with a replica')
+    add('dbXprimary with a replica')
+    results, _ = DiagramSearch().search('db_primary', limit=10)
+    assert [item['id'] for item in results] == [exact.id]
+    assert results[0]['score'] is None and results[0]['snippet'] is None
+
+
+def test_reuse_needs_the_similarity_threshold(migrated):
+    earlier = add('web app with load balancer and database', image_sha256='a' * 64, image_format='png')
+    search = DiagramSearch(reuse_threshold=0.8)
+    found, similarity = search.find_reusable('Create a web app with a database and load balancer')
+    assert found.id == earlier.id and similarity == 1.0
+    # 5 of 7 terms in common
+    assert search.find_reusable('web app with load balancer, database, cache and queue') is None
+    assert search.find_reusable('web app with load balancer and database', image_format='svg') is None
+
+
+def test_reuse_skips_unfinished_diagrams(migrated):
+    add('queue with workers', status='failed', image_sha256='a' * 64)
+    assert DiagramSearch().find_reusable('queue with workers') is None
@@ -0,0 +1,29 @@
+import time
+
+from app import create_app
+from app.config import Config
+from app.routes import diagram_routes
+from app.services import gemini_service
+
+
+def test_create_app_does_not_build_the_pipeline(monkeypatch):
+    built = []
+    monkeypatch.setattr(gemini_service, 'create_model', lambda *args, **kwargs: built.append(args) or None)
+    monkeypatch.setattr(diagram_routes, '_pipeline', None)
+    monkeypatch.setattr(Config, 'PREWARM', False)
+
+    start = time.perf_counter()
+    create_app()
+    elapsed = time.perf_counter() - start
+
+    assert diagram_routes._pipeline is None
+    assert built == []
+    # Loose bound: importing the LLM SDK or building clients would show up here
+    assert elapsed < 2
+
+
+def test_prewarm_builds_the_pipeline_up_front(monkeypatch):
+    monkeypatch.setattr(diagram_routes, '_pipeline', None)
+    monkeypatch.setattr(Config, 'PREWARM', True)
+    create_app()
+    assert diagram_routes._pipeline is not None
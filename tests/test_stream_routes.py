@@ -0,0 +1,48 @@
+import json
+
+from app import db
+from app.models.diagram import DiagramRequest
+
+STREAM_URL = '/api/diagrams/generate/stream'
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        for block in chunk.decode().split('\n\n'):
+            if block.strip():
+                event, data = block.split('\n')
+                events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_stream_reports_each_stage_in_order(app, client):
+    response = client.post(STREAM_URL, json={'prompt': 'something only the model can draw', 'backend': 'mermaid'})
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.response)
+    names = [name for name, _ in events]
+
+    assert names[0] == 'persisted' and names[1] == 'token'
+    # The fake model closes its code block before the reply ends, so the render starts early
+    assert names.index('render_started') < names.index('validated') < names.index('image')
+    assert names[-1] == 'image'
+    assert events[-1][1]['status'] == 'completed'
+    streamed = ''.join(data['text'] for name, data in events if name == 'token')
+    assert events[names.index('validated')][1]['diagram_code'] in streamed
+
+    with app.app_context():
+        assert db.session.get(DiagramRequest, events[0][1]['id']).status == 'completed'
+
+
+def test_closing_the_stream_early_fails_the_row(app, client):
+    # A prompt of its own, so the code cannot come from the LLM cache in one piece
+    response = client.post(STREAM_URL, json={'prompt': 'another thing only the model can draw', 'backend': 'mermaid'})
+    chunks = iter(response.response)
+    persisted, token = parse_events([next(chunks), next(chunks)])
+    assert (persisted[0], token[0]) == ('persisted', 'token')
+    response.close()
+
+    with app.app_context():
+        row = db.session.get(DiagramRequest, persisted[1]['id'])
+        assert row.status == 'failed'
+        assert 'closed' in row.error_message
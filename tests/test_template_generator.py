@@ -0,0 +1,81 @@
+import pytest
+from app.services.diagram_model import parse_diagram_code
+from app.services.template_generator import TemplateDiagramGenerator
+
+
+@pytest.fixture
+def generator():
+    return TemplateDiagramGenerator()
+
+
+@pytest.mark.parametrize('prompt, expected', [
+    ("ALB, 2 EC2, RDS", {'ALB': 1, 'EC2': 2, 'RDS': 1}),
+    ("Create a load balancer with two web servers and a database", {'ELB': 1, 'EC2': 2, 'RDS': 1}),
+    ("three EC2 instances behind an application load balancer", {'EC2': 3, 'ALB': 1}),
+    ("an ALB connected to 4 app servers and a postgres database", {'ALB': 1, 'EC2': 4, 'RDS': 1}),
+    ("2 x ec2 and an rds database in a private subnet", {'EC2': 2, 'RDS': 1}),
+    # A database server is the database, not another EC2 box
+    ("ALB, 2 web servers and a database server", {'ALB': 1, 'EC2': 2, 'RDS': 1}),
+    ("load balancer with 2 instances and 1 db instance", {'ELB': 1, 'EC2': 2, 'RDS': 1}),
+    ("elb, 3 servers, 2 database instances", {'ELB': 1, 'EC2': 3, 'RDS': 2}),
+])
+def test_parse_counts_components(generator, prompt, expected):
+    assert generator.parse(prompt) == expected
+
+
+@pytest.mark.parametrize('prompt', [
+    "3 tier web app with load balancer and database",  # count before a non-component, bare 'web app'
+    "2 tier architecture with RDS",
+    "0 ec2",
+    "ec2 2",  # trailing count
+    "2 3 ec2",
+    "2 private subnets with ec2",
+    "web app with a database",
+    "11 ec2 instances",  # over MAX_COUNT
+    "ec2 with a redis cache",  # unknown word
+    "create an aws architecture diagram",  # no components at all
+    "ALB and ELB",  # two load balancers
+    "2 load balancers with 4 ec2",
+    "alb with ec2 and a mysql server",  # is the server the database or another EC2?
+    "elb with rds instances servers",
+])
+def test_parse_leaves_unsupported_prompts_to_the_model(generator, prompt):
+    assert generator.parse(prompt) is None
+
+
+def test_generated_code_parses_back_to_the_same_components(generator):
+    code = generator.try_generate("ALB, 3 EC2, RDS")
+    model = parse_diagram_code(code)
+    kinds = sorted(node.kind for node in model.nodes.values())
+    assert kinds == ['ALB', 'EC2', 'EC2', 'EC2', 'RDS']
+    # ALB fans out to every EC2, and every EC2 connects to the database
+    assert len(model.edges) == 6
+
+
+def test_stats_count_hits_and_misses(generator):
+    generator.try_generate("ALB, 2 EC2, RDS")
+    generator.try_generate("kafka cluster")
+    stats = generator.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['hit_ratio'] == 0.5
+
+
+@pytest.mark.parametrize('prompt, kinds', [
+    ("ALB, 2 web servers and a database server", ['ALB', 'EC2', 'EC2', 'RDS']),
+    ("load balancer with 2 instances and 1 db instance", ['EC2', 'EC2', 'ELB', 'RDS']),
+    ("two ec2 and a postgres database", ['EC2', 'EC2', 'RDS']),
+])
+def test_try_generate_draws_exactly_the_requested_components(generator, prompt, kinds):
+    model = parse_diagram_code(generator.try_generate(prompt))
+    assert sorted(node.kind for node in model.nodes.values()) == kinds
+
+
+@pytest.mark.parametrize('prompt', [
+    "ALB and ELB",
+    "alb with ec2 and a mysql server",
+    "3 tier web app with load balancer and database",
+    "ec2 with a redis cache",
+])
+def test_try_generate_declines_what_it_cannot_draw(generator, prompt):
+    assert generator.try_generate(prompt) is None
+    assert generator.stats()['misses'] == 1